@@ -1,15 +1,28 @@
+import functools
+
+import password_pool
 from api.models.user import User
-from utils import json_response, read_json_body, hash_password, check_password, create_jwt_token, jwt_required
+from password_pool import PoolBusy
+from utils import json_response, read_json_body, create_jwt_token, jwt_required, token_cache
+
+def busy_response(handler, error):
+    return json_response(handler, 503, {"message": "Server is busy, try again later"},
+                         headers={'Retry-After': str(error.retry_after)})
 
 def handle_register(handler):
     data = read_json_body(handler)
     if User.get_by_email(data.get('email')):
         return json_response(handler, 403, {"message": "User already exists"})
-    
+
+    try:
+        hashed_password = password_pool.pool.hash(data.get('password'))
+    except PoolBusy as error:
+        return busy_response(handler, error)
+
     user_id = User.create(
         name=data.get('name'),
         email=data.get('email'),
-        hashed_password=hash_password(data.get('password')),
+        hashed_password=hashed_password,
         role=data.get('role', 'USER'),
         balance=data.get('balance', 0.0)
     )
@@ -22,8 +35,16 @@ def handle_register(handler):
 def handle_login(handler):
     data = read_json_body(handler)
     user = User.get_by_email(data.get('email'))
-    
-    if user and check_password(data.get('password'), user.password):
+
+    try:
+        valid = user and password_pool.pool.check(data.get('password'), user.password)
+    except PoolBusy as error:
+        return busy_response(handler, error)
+
+    if valid:
+        # Bring the stored hash to the configured cost without making this login wait
+        password_pool.pool.rehash_later(data.get('password'), user.password,
+                                        functools.partial(User.set_password, user.id, expected=user.password))
         token = create_jwt_token(user.id, user.role)
         return json_response(handler, 200, {"access_token": token})
     
@@ -31,8 +52,9 @@ def handle_login(handler):
 
 @jwt_required
 def handle_logout(handler):
-    from database import blocked_tokens
+    import database
     token = handler.headers.get('Authorization', '').replace('Bearer ', '')
     if token:
-        blocked_tokens.add(token)
+        database.block_token(handler.token_id, handler.token_expires)
+        token_cache.discard(token)
     return json_response(handler, 200, {"message": "Logged out successfully"})
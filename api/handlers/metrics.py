@@ -0,0 +1,18 @@
+import json_codec
+import password_pool
+from dsa.helper import sms_templates
+from utils import json_response, jwt_required, token_cache
+
+
+@jwt_required
+def handle_get_metrics(handler):
+    """GET /metrics - Internal counters, Admins only"""
+    if getattr(handler, 'user_role', 'USER') != 'ADMIN':
+        return json_response(handler, 403, {"message": "Only Admins can view metrics"})
+
+    return json_response(handler, 200, {
+        "sms_templates": sms_templates.stats(),
+        "jwt_cache": token_cache.stats(),
+        "password_pool": password_pool.pool.stats(),
+        "json": json_codec.stats(),
+    })
@@ -1,5 +1,11 @@
-from api.models.transaction import Transaction
-from utils import json_response, read_json_body, jwt_required
+from api.models.transaction import TRANSACTION_TYPES, Transaction
+from dsa.transaction_record import ME, UserView
+from utils import etag, json_response, json_stream_response, not_modified, read_json_body, jwt_required, parse_query
+
+PAGE_PARAMS = ('limit', 'cursor', 'type', 'min_amount', 'max_amount', 'created_from', 'created_to')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BATCH_SIZE = 10000
 
 @jwt_required
 def handle_add_transaction(handler):
@@ -16,24 +22,111 @@ def handle_add_transaction(handler):
         return json_response(handler, 201, {"id": transaction_id, "message": "Transaction successful"})
     return json_response(handler, 400, {"message": error or "Transaction failed"})
 
+def parse_batch_transfer(item):
+    """One transfer of a POST /transactions/batch body as a (sender, receiver, amount, type) tuple"""
+    if not isinstance(item, dict):
+        raise ValueError("must be an object")
+    sender_id, receiver_id, amount = item.get('senderId'), item.get('receiverId'), item.get('amount')
+    if not all(isinstance(user_id, int) and not isinstance(user_id, bool) for user_id in (sender_id, receiver_id)):
+        raise ValueError("senderId and receiverId must be integers")
+    if not isinstance(amount, (int, float)) or isinstance(amount, bool) or amount <= 0:
+        raise ValueError("amount must be a positive number")
+    transaction_type = item.get('type', 'transfer')
+    if transaction_type not in TRANSACTION_TYPES:
+        raise ValueError(f"type must be one of: {', '.join(TRANSACTION_TYPES)}")
+    return sender_id, receiver_id, amount, transaction_type
+
+@jwt_required
+def handle_add_transaction_batch(handler):
+    """POST /transactions/batch - Create many transactions in one request, all or nothing unless atomic is false"""
+    data = read_json_body(handler)
+    items = data.get('transfers') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not 1 <= len(items) <= MAX_BATCH_SIZE:
+        return json_response(handler, 400, {"message": f"transfers must be a list of 1 to {MAX_BATCH_SIZE} transfers"})
+
+    transfers = []
+    for index, item in enumerate(items):
+        try:
+            transfers.append(parse_batch_transfer(item))
+        except ValueError as error:
+            return json_response(handler, 400, {"message": f"transfers[{index}]: {error}"})
+
+    atomic = data.get('atomic', True) is not False
+    results = Transaction.create_batch(transfers, atomic=atomic)
+
+    if not atomic:
+        return json_response(handler, 200, {
+            "results": [{"id": transaction_id} if transaction_id else {"message": error}
+                        for transaction_id, error in results],
+            "successful": sum(1 for transaction_id, _ in results if transaction_id),
+        })
+
+    errors = [{"index": index, "message": error} for index, (_, error) in enumerate(results) if error]
+    if errors:
+        return json_response(handler, 400, {"message": "No transactions were made", "errors": errors})
+    return json_response(handler, 201, {"ids": [transaction_id for transaction_id, _ in results],
+                                        "message": "Transactions successful"})
+
 def format_transaction_response(transaction, user_name):
     """Replace 'Me' with the user's actual name in transaction record"""
     if not transaction:
         return transaction
-    
-    formatted = transaction.copy()
-    if formatted.get('sender') == 'Me':
-        formatted['sender'] = user_name
-    if formatted.get('receiver') == 'Me':
-        formatted['receiver'] = user_name
-    return formatted
+    if transaction.get('sender') != ME and transaction.get('receiver') != ME:
+        return transaction
+    # A view rather than a copy, so the record's JSON still comes from the fragment cache
+    return UserView(transaction, user_name)
+
+def listing_etag(handler):
+    """ETag of a transaction listing: it stays the same until some transaction changes"""
+    return etag(Transaction.version(), handler.path, handler.user_id, handler.user_name)
+
+def parse_page_options(params):
+    """Validate the paging and filter parameters of GET /transactions/"""
+    options = {'limit': DEFAULT_PAGE_SIZE}
+    if 'limit' in params:
+        try:
+            options['limit'] = int(params['limit'])
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if not 1 <= options['limit'] <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    for name in ('min_amount', 'max_amount'):
+        if name in params:
+            try:
+                options[name] = float(params[name])
+            except ValueError:
+                raise ValueError(f"{name} must be a number")
+
+    for name in ('cursor', 'type', 'created_from', 'created_to'):
+        if name in params:
+            options[name] = params[name]
+    return options
 
 @jwt_required
 def handle_get_transactions(handler):
-    """GET /transactions/ - Get all transactions"""
-    transactions = Transaction.get_all()
+    """GET /transactions/ - Get all transactions, or one page of them when paging or filter parameters are given"""
+    tag = listing_etag(handler)
+    if not_modified(handler, tag):
+        return
+
+    params = parse_query(handler)
+    if not any(name in params for name in PAGE_PARAMS):
+        # Full listing: streamed so memory stays flat however big the ledger is
+        transactions = Transaction.iter_all()
+        formatted_transactions = (format_transaction_response(transaction, handler.user_name) for transaction in transactions)
+        return json_stream_response(handler, 200, formatted_transactions, headers={'ETag': tag})
+
+    try:
+        transactions, next_cursor = Transaction.query(**parse_page_options(params))
+    except ValueError as error:
+        return json_response(handler, 400, {"message": str(error)})
+
     formatted_transactions = [format_transaction_response(transaction, handler.user_name) for transaction in transactions]
-    return json_response(handler, 200, formatted_transactions)
+    headers = {'ETag': tag}
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return json_response(handler, 200, formatted_transactions, headers)
 
 @jwt_required
 def handle_get_transaction_by_id(handler, transaction_id):
@@ -58,10 +151,14 @@ def handle_get_transaction_by_id_indexed(handler, transaction_id):
 @jwt_required
 def handle_get_my_transactions(handler):
     """GET /transactions/me - Get current user's transactions"""
-    transactions = Transaction.get_by_user()
+    tag = listing_etag(handler)
+    if not_modified(handler, tag):
+        return
+
+    transactions = Transaction.get_by_user(handler.user_id)
     formatted_transactions = [format_transaction_response(transaction, handler.user_name) for transaction in transactions]
 
-    return json_response(handler, 200, formatted_transactions)
+    return json_response(handler, 200, formatted_transactions, {'ETag': tag})
 
 @jwt_required
 def handle_update_transaction(handler, transaction_id):
@@ -1,65 +1,94 @@
 import database
 import datetime
+import json_codec
+
+from storage.base import decode_cursor, encode_cursor, page_order
 
 TRANSACTION_TYPES = ['transfer', 'payment', 'withdrawal', 'deposit']
+INVALID_TYPE = f"Invalid transaction type. Must be one of: {', '.join(TRANSACTION_TYPES)}"
 
 class Transaction:
     @staticmethod
     def create(sender_id, receiver_id, amount, transaction_type='transfer'):
-        sender = database.users.get(sender_id)
-        receiver = database.users.get(receiver_id)
-        
-        if not sender or not receiver:
-            return None, "Invalid sender or receiver"
-        
-        if sender['balance'] < amount:
-            return None, "Insufficient balance"
-        
-      
-        sender['balance'] -= amount
-        receiver['balance'] += amount
-        
-       
-        transaction_id = database.transaction_id_counter
-        database.transaction_id_counter += 1
-        
-        transaction = {
-            'id': transaction_id,
-            'sender_id': sender_id,
-            'receiver_id': receiver_id,
-            'amount': amount,
-            'type': transaction_type,
-            'created_at': datetime.datetime.utcnow().isoformat()
-        }
-        database.transactions.append(transaction)
-        database.transactions_dictionary[transaction_id] = transaction
-        
-        return transaction_id, None
+        if transaction_type not in TRANSACTION_TYPES:
+            return None, INVALID_TYPE
+        transaction_id, error = database.store.transfer(sender_id, receiver_id, amount, transaction_type,
+                                                        datetime.datetime.utcnow().isoformat())
+        if transaction_id is not None:
+            database.transactions_changed()
+        return transaction_id, error
+
+    @staticmethod
+    def create_batch(transfers, atomic=True):
+        """
+        Make a batch of (sender_id, receiver_id, amount, transaction_type) transfers in
+        order, each seeing the balances left by the ones before it, in one commit.
+        Returns a (transaction_id, error) pair per transfer. With `atomic`, nothing
+        is made unless every transfer succeeds; otherwise failing transfers are skipped.
+        """
+        type_errors = [None if transfer[3] in TRANSACTION_TYPES else INVALID_TYPE for transfer in transfers]
+        if any(type_errors):
+            if atomic:
+                return [(None, error) for error in type_errors]
+            valid = [transfer for transfer, error in zip(transfers, type_errors) if error is None]
+            made = iter(Transaction.create_batch(valid, atomic=False) if valid else [])
+            return [(None, error) if error else next(made) for error in type_errors]
+
+        results = database.store.transfer_batch(transfers, datetime.datetime.utcnow().isoformat(), atomic)
+        if any(transaction_id is not None for transaction_id, _ in results):
+            database.transactions_changed()
+        return results
+
+    @staticmethod
+    def version():
+        """A number that changes whenever any transaction is added, changed or removed"""
+        return database.transactions_version
 
     @staticmethod
     def get_all():
-        return database.transactions.copy()
+        return database.store.all_transactions()
+
+    @staticmethod
+    def iter_all(batch_size=1000):
+        """Iterate over every transaction in ledger order, reading the store one page at a time"""
+        cursor = None
+        while True:
+            page, cursor = Transaction.query(batch_size, cursor)
+            yield from page
+            if cursor is None:
+                return
 
     @staticmethod
     def get_by_id(transaction_id):
-        for transaction in database.transactions:
-            if transaction['id'] == transaction_id:
-                return transaction
-        return None
+        return database.store.get_transaction(transaction_id)
 
     @staticmethod
     def get_by_id_indexed(transaction_id):
-        """Get transaction by ID using the dictionary index"""
-        return database.transactions_dictionary.get(transaction_id)
+        """Same as get_by_id, kept for the /indexed_transactions/<id> route"""
+        return Transaction.get_by_id(transaction_id)
+
+    @staticmethod
+    def query(limit, cursor=None, type=None, min_amount=None, max_amount=None, created_from=None, created_to=None):
+        """
+        One page of transactions matching the filters.
+        The page is read from a sorted index: created_at order when a created_at range is given,
+        amount order when an amount range is given, ledger order otherwise.
+        Returns (transactions, next_cursor); next_cursor is None on the last page.
+        Raises ValueError for a cursor that wasn't issued for the same kind of query.
+        """
+        order = page_order(type, min_amount, max_amount, created_from, created_to)
+        after = decode_cursor(cursor, order) if cursor else None
+
+        rows = database.store.query_transactions(limit, after, type=type, min_amount=min_amount, max_amount=max_amount,
+                                                 created_from=created_from, created_to=created_to)
+        page = [transaction for transaction, _ in rows[:limit]]
+        next_cursor = encode_cursor(order, rows[limit - 1][1]) if len(rows) > limit else None
+        return page, next_cursor
 
     @staticmethod
-    def get_by_user():
-        """Get all transactions where user is sender or receiver"""
-        my_transactions = []
-        for transaction in database.transactions:
-            if transaction['sender'] == "Me" or transaction['receiver'] == "Me":
-                my_transactions.append(transaction)
-        return my_transactions
+    def get_by_user(user_id=None, name="Me"):
+        """Get all transactions where user is sender or receiver, by user id or by name in imported records"""
+        return database.store.transactions_for_party(user_id, name)
 
     @staticmethod
     def update(transaction_id, user_id, role, **kwargs):
@@ -67,20 +96,22 @@ class Transaction:
         if role != 'ADMIN':
             return None, "Only Admins can update transactions"
 
-        for i, transaction in enumerate(database.transactions):
-            if transaction['id'] == transaction_id:
-                
-                allowed_fields = ['type']
-                for key, value in kwargs.items():
-                    if key in allowed_fields:
-                        if key == 'type' and value not in TRANSACTION_TYPES:
-                            return None, f"Invalid transaction type. Must be one of: {', '.join(TRANSACTION_TYPES)}"
-                        database.transactions[i][key] = value
-              
-                database.transactions_dictionary[transaction_id] = database.transactions[i]
-                
-                return database.transactions[i], None
-        return None, "Transaction not found"
+        transaction_type = kwargs.get('type')
+        if transaction_type is None:
+            transaction = database.store.get_transaction(transaction_id)
+            return (transaction, None) if transaction is not None else (None, "Transaction not found")
+
+        if transaction_type not in TRANSACTION_TYPES:
+            if database.store.get_transaction(transaction_id) is None:
+                return None, "Transaction not found"
+            return None, INVALID_TYPE
+
+        transaction = database.store.update_transaction_type(transaction_id, transaction_type)
+        if transaction is None:
+            return None, "Transaction not found"
+        json_codec.fragments.discard(transaction_id)
+        database.transactions_changed()
+        return transaction, None
 
     @staticmethod
     def delete(transaction_id, user_id, role):
@@ -88,11 +119,9 @@ class Transaction:
         if role != "ADMIN":
             return False, "Only Admins can delete transactions"
 
-        for i, transaction in enumerate(database.transactions):
-            if transaction['id'] == transaction_id:
-                deleted_transaction = database.transactions.pop(i)
-              
-                if transaction_id in database.transactions_dictionary:
-                    del database.transactions_dictionary[transaction_id]
-                return True, deleted_transaction
-        return False, "Transaction not found"
\ No newline at end of file
+        deleted_transaction = database.store.delete_transaction(transaction_id)
+        if deleted_transaction is None:
+            return False, "Transaction not found"
+        json_codec.fragments.discard(transaction_id)
+        database.transactions_changed()
+        return True, deleted_transaction
\ No newline at end of file
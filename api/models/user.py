@@ -12,39 +12,26 @@ class User:
 
     @staticmethod
     def get_by_email(email):
-        for user_data in database.users.values():
-            if user_data['email'] == email:
-                return User(**user_data)
+        user_data = database.store.get_user_by_email(email)
+        if user_data:
+            return User(**user_data)
         return None
 
     @staticmethod
     def get_by_id(user_id):
-        user_data = database.users.get(user_id)
+        user_data = database.store.get_user(user_id)
         if user_data:
             return User(**user_data)
         return None
 
     @staticmethod
     def create(name, email, hashed_password, role='USER', balance=0.0):
-      
-        for user_data in database.users.values():
-            if user_data['email'] == email:
-                return None
-        
-        user_id = database.user_id_counter
-        database.user_id_counter += 1
-        
-        user_data = {
-            'id': user_id,
-            'name': name,
-            'email': email,
-            'password': hashed_password,
-            'balance': balance,
-            'role': role
-        }
-        
-        database.users[user_id] = user_data
-        return user_id
+        return database.store.create_user(name, email, hashed_password, role, balance)
+
+    @staticmethod
+    def set_password(user_id, hashed_password, expected):
+        """Store a new hash unless the password changed since `expected` was read"""
+        return database.store.set_password(user_id, hashed_password, expected)
 
     def to_dict(self):
         return {
@@ -0,0 +1,79 @@
+from urllib.parse import urlsplit
+
+# Types a path parameter can be declared with, as in {transaction_id:int}
+CONVERTERS = {
+    'int': int,
+    'str': str,
+}
+
+
+def split_path(path):
+    """Path segments, ignoring the query string and empty segments: '/transactions/5/?x=1' -> ['transactions', '5']"""
+    return [segment for segment in urlsplit(path).path.split('/') if segment]
+
+
+class RouteNode:
+    __slots__ = ('children', 'param', 'handlers')
+
+    def __init__(self):
+        self.children = {}  # literal segment -> RouteNode
+        self.param = None  # (name, converter, RouteNode) for a {name:type} segment
+        self.handlers = {}  # HTTP method -> handler function
+
+
+class Router:
+    """
+    Route table as a trie of path segments, built once when the routes are
+    added. Matching walks one node per segment, so it costs the same however
+    many routes there are. A literal segment wins over a parameter at the same
+    position (/transactions/me before /transactions/{transaction_id:int}), and
+    a segment that doesn't convert to the parameter's type doesn't match.
+    """
+
+    def __init__(self):
+        self.root = RouteNode()
+
+    def add(self, method, pattern, handler):
+        node = self.root
+        for segment in split_path(pattern):
+            if segment.startswith('{') and segment.endswith('}'):
+                name, _, type_name = segment[1:-1].partition(':')
+                converter = CONVERTERS[type_name or 'str']
+                if node.param is None:
+                    node.param = (name, converter, RouteNode())
+                elif node.param[:2] != (name, converter):
+                    raise ValueError(f"{pattern}: {segment} conflicts with another route's parameter")
+                node = node.param[2]
+            else:
+                node = node.children.setdefault(segment, RouteNode())
+        if method in node.handlers:
+            raise ValueError(f"{method} {pattern} is already routed")
+        node.handlers[method] = handler
+
+    def route(self, method, pattern):
+        """Decorator form of add()"""
+        def register(handler):
+            self.add(method, pattern, handler)
+            return handler
+        return register
+
+    def match(self, path):
+        """
+        The handlers by method of the route `path` matches, and its converted
+        parameters by name; (None, None) if no route matches.
+        """
+        node, params = self.root, {}
+        for segment in split_path(path):
+            child = node.children.get(segment)
+            if child is None:
+                if node.param is None:
+                    return None, None
+                name, converter, child = node.param
+                try:
+                    params[name] = converter(segment)
+                except ValueError:
+                    return None, None
+            node = child
+        if not node.handlers:
+            return None, None
+        return node.handlers, params
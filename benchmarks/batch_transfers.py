@@ -0,0 +1,90 @@
+"""
+Transfers per second made one POST /transactions/ at a time versus one
+POST /transactions/batch, through the handlers (JWT check, JSON parse and
+response included), on each storage backend.
+
+    python benchmarks/batch_transfers.py --transfers 1000 5000
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-for-the-momo-api")
+
+import database
+from api.handlers.transactions import handle_add_transaction, handle_add_transaction_batch
+from api.models.user import User
+from storage.base import BACKENDS
+from utils import create_jwt_token
+
+
+class PostHandler:
+    request_version = 'HTTP/1.1'
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, body, token):
+        payload = json.dumps(body).encode('utf-8')
+        self.rfile = io.BytesIO(payload)
+        self.wfile = io.BytesIO()
+        self.headers = {'Content-Length': str(len(payload)), 'Authorization': f"Bearer {token}"}
+
+    def send_response(self, code):
+        self.status_code = code
+
+    def send_header(self, keyword, value):
+        pass
+
+    def end_headers(self):
+        pass
+
+
+def seed(run):
+    sender = User.create("A", f"a{run}@example.com", "", balance=10 ** 12)
+    receiver = User.create("B", f"b{run}@example.com", "", balance=0)
+    return sender, receiver, create_jwt_token(sender, "USER")
+
+
+def one_by_one(transfers, sender, receiver, token):
+    start = time.perf_counter()
+    for _ in range(transfers):
+        handler = PostHandler({'senderId': sender, 'receiverId': receiver, 'amount': 1}, token)
+        handle_add_transaction(handler)
+        assert handler.status_code == 201
+    return transfers / (time.perf_counter() - start)
+
+
+def batched(transfers, sender, receiver, token):
+    body = {'transfers': [{'senderId': sender, 'receiverId': receiver, 'amount': 1}] * transfers}
+    start = time.perf_counter()
+    handler = PostHandler(body, token)
+    handle_add_transaction_batch(handler)
+    assert handler.status_code == 201
+    return transfers / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transfers', type=int, nargs='+', default=[1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'backend':>8} {'transfers':>10} {'one by one':>11} {'batch':>11}   (transfers/s)")
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in BACKENDS:
+            for transfers in args.transfers:
+                store = database.open_store(backend, os.path.join(directory, f"{backend}-{transfers}.db"))
+                database.use_store(store)
+                accounts = seed(transfers)
+                single_rate = one_by_one(transfers, *accounts)
+                batch_rate = batched(transfers, *accounts)
+                print(f"{backend:>8} {transfers:>10} {single_rate:>11.0f} {batch_rate:>11.0f}")
+                store.close()
+
+
+if __name__ == '__main__':
+    main()
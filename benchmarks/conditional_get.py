@@ -0,0 +1,79 @@
+"""
+Cost of polling GET /transactions/?limit=N through the handler: bytes sent and
+time per request, uncompressed, gzip-compressed, and answered 304 Not Modified
+because nothing changed since the client's last poll.
+
+    python benchmarks/conditional_get.py --transactions 1000
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-for-the-momo-api")
+
+import database
+from api.handlers.transactions import handle_get_transactions
+from api.models.transaction import Transaction
+from utils import create_jwt_token
+
+
+class GetHandler:
+    request_version = 'HTTP/1.1'
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, path, headers):
+        self.path = path
+        self.headers = headers
+        self.wfile = io.BytesIO()
+        self.response_headers = {}
+
+    def send_response(self, code):
+        self.status_code = code
+
+    def send_header(self, keyword, value):
+        self.response_headers[keyword] = value
+
+    def end_headers(self):
+        pass
+
+
+def poll(path, headers, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        handler = GetHandler(path, headers)
+        handle_get_transactions(handler)
+    return (time.perf_counter() - start) / requests * 1e6, len(handler.wfile.getvalue()), handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    database.users[1] = {'id': 1, 'name': "A", 'email': "a@example.com", 'password': "", 'balance': 10 ** 12,
+                         'role': 'USER'}
+    database.users[2] = {'id': 2, 'name': "B", 'email': "b@example.com", 'password': "", 'balance': 0,
+                         'role': 'USER'}
+    for amount in range(1, args.transactions + 1):
+        Transaction.create(1, 2, amount)
+    auth = {'Authorization': f"Bearer {create_jwt_token(1, 'USER')}"}
+    path = f"/transactions/?limit={args.transactions}"
+
+    print(f"{'response':>9} {'us/request':>11} {'bytes':>9}")
+    plain_us, plain_bytes, handler = poll(path, auth, args.requests)
+    print(f"{'plain':>9} {plain_us:>11.0f} {plain_bytes:>9}")
+    gzip_us, gzip_bytes, _ = poll(path, {**auth, 'Accept-Encoding': 'gzip'}, args.requests)
+    print(f"{'gzip':>9} {gzip_us:>11.0f} {gzip_bytes:>9}")
+    etag = {**auth, 'If-None-Match': handler.response_headers['ETag']}
+    cached_us, cached_bytes, handler = poll(path, etag, args.requests)
+    assert handler.status_code == 304
+    print(f"{'304':>9} {cached_us:>11.0f} {cached_bytes:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Encoding a page of transactions (what GET /transactions/?limit=N writes) and
+decoding a batch request body, with each JSON backend, with and without the
+cache of encoded records. --personal uses records like the imported SMS
+backup instead, each with a 'Me' party that is served as the user's name.
+
+    python benchmarks/json_encoding.py --records 1000 [--personal]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json_codec
+from dsa.transaction_record import TransactionRecord, UserView
+
+
+def best_of(func, rounds=20):
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--personal', action='store_true')
+    args = parser.parse_args()
+
+    if args.personal:
+        records = [UserView(TransactionRecord(id=i, amount=i * 1.5, type='payment', created_at='2024-05-10 16:31:39',
+                                              sender='Me', receiver='Jane Smith'), 'Alice')
+                   for i in range(args.records)]
+    else:
+        records = [TransactionRecord(id=i, amount=i * 1.5, type='transfer', created_at='2024-05-10T12:00:00.000000',
+                                     sender_id=1, receiver_id=2) for i in range(args.records)]
+    body = json.dumps({'transfers': [{'senderId': 1, 'receiverId': 2, 'amount': 1}] * args.records}).encode('utf-8')
+
+    print(f"{'backend':>8} {'encode':>9} {'cached':>9} {'decode':>9}   (us per {args.records} records)")
+    for name in json_codec.BACKENDS:
+        json_codec.use_backend(name)
+        # One dumps() of the whole page, as every listing did before the cache
+        uncached = best_of(lambda: json_codec.dumps(records))
+        json_codec.encode(records)
+        cached = best_of(lambda: json_codec.encode(records))
+        decode = best_of(lambda: json_codec.loads(body))
+        print(f"{name:>8} {uncached * 1e6:>9.0f} {cached * 1e6:>9.0f} {decode * 1e6:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
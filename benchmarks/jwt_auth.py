@@ -0,0 +1,66 @@
+"""
+Authentication overhead per request: jwt_required around a handler that does
+nothing, with one token reused for every request, with the verified-token cache
+and without it.
+
+    python benchmarks/jwt_auth.py --requests 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret-key-for-the-momo-api")
+
+import database
+import utils
+from utils import create_jwt_token, jwt_required
+
+
+class RequestHandler:
+    def __init__(self, token):
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+
+@jwt_required
+def noop(handler):
+    return handler.user_id
+
+
+def microseconds_per_request(requests, token, rounds=3):
+    handler = RequestHandler(token)
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(requests):
+            noop(handler)
+        best = min(best, time.perf_counter() - start)
+    return best / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    database.users[1] = {'id': 1, 'name': "A", 'email': "a@example.com", 'password': "", 'balance': 0, 'role': 'USER'}
+    token = create_jwt_token(1, "USER")
+
+    maxsize = utils.token_cache.maxsize
+    utils.token_cache.maxsize = 0
+    utils.token_cache.clear()
+    uncached = microseconds_per_request(args.requests, token)
+
+    utils.token_cache.maxsize = maxsize
+    utils.token_cache.clear()
+    cached = microseconds_per_request(args.requests, token)
+
+    print(f"{'':>9} {'us/request':>11}")
+    print(f"{'no cache':>9} {uncached:>11.2f}")
+    print(f"{'cache':>9} {cached:>11.2f}   hit rate {utils.token_cache.stats()['hit_rate']:.4f}")
+
+
+if __name__ == '__main__':
+    main()
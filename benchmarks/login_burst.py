@@ -0,0 +1,108 @@
+"""
+Latency of cheap authenticated requests (GET /transactions/me) while a burst of
+logins hits the same threadpool server, with bcrypt on the request threads and
+in the password-hashing process pool. Also counts logins turned away with 503.
+
+    python benchmarks/login_burst.py --logins 200 --clients 16 --rounds 10
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JWT_SECRET_KEY", "load-test-secret-key-for-the-momo-api")
+
+import database
+import password_pool
+from engines.threadpool import PooledHTTPServer
+from password_pool import PasswordPool
+from server import APIRRequestHandler
+from utils import create_jwt_token, hash_password
+
+EMAIL = "load@example.com"
+PASSWORD = "password123"
+
+
+class QuietHandler(APIRRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def seed(rounds):
+    database.users[1] = {'id': 1, 'name': "Load Test", 'email': EMAIL, 'password': hash_password(PASSWORD, rounds),
+                         'balance': 0.0, 'role': 'USER'}
+    database.users_by_email[EMAIL] = 1
+    database.user_id_counter = 2
+
+
+def request(port, method, path, body=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+def measure(processes, logins, clients):
+    pool = PasswordPool(processes, queue_size=clients)
+    password_pool.use_pool(pool)
+    pool.start()
+    httpd = PooledHTTPServer(('127.0.0.1', 0), QuietHandler, workers=clients + 1,
+                             queue_size=clients * 2, backlog=clients * 2)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    port = httpd.server_address[1]
+    token = create_jwt_token(1, "USER")
+    body = json.dumps({"email": EMAIL, "password": PASSWORD})
+
+    done = threading.Event()
+    latencies = []
+
+    def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            request(port, 'GET', '/transactions/me', token=token)
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        statuses = list(executor.map(lambda _: request(port, 'POST', '/auth/login', body), range(logins)))
+    done.set()
+    prober.join()
+
+    httpd.shutdown()
+    httpd.server_close()
+    pool.close()
+    latencies.sort()
+    return (statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99)] * 1000,
+            statuses.count(503))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=10, help="bcrypt cost of the seeded password")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="hashing processes of the pool run")
+    args = parser.parse_args()
+
+    seed(args.rounds)
+    print(f"{'bcrypt':>8} {'p50 ms':>8} {'p99 ms':>8} {'503s':>5}   (GET /transactions/me during logins)")
+    for label, processes in (('inline', 0), (f"{args.processes} proc", args.processes)):
+        p50, p99, rejected = measure(processes, args.logins, args.clients)
+        print(f"{label:>8} {p50:>8.2f} {p99:>8.2f} {rejected:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Cost of the revocation check every authenticated request makes, for a token
+that was not revoked, and how many revocations are kept over a day of logouts.
+
+    python benchmarks/revocation_check.py --revoked 10000 --checks 100000
+"""
+import argparse
+import os
+import secrets
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dsa.revocation_store import RevocationStore
+from storage.sqlite import SELECT_REVOKED_TOKEN, SqliteStore
+
+
+def microseconds_per_check(is_revoked, token_ids):
+    start = time.perf_counter()
+    for token_id in token_ids:
+        is_revoked(token_id)
+    return (time.perf_counter() - start) / len(token_ids) * 1e6
+
+
+def kept_over_a_day(logouts_per_hour, lifetime=3600):
+    """Revocations held at the end of a day of steady logouts, with and without purging"""
+    clock_time = [0.0]
+    revoked = RevocationStore(clock=lambda: clock_time[0])
+    step = 3600 / logouts_per_hour
+    for i in range(24 * logouts_per_hour):
+        clock_time[0] = i * step
+        revoked.revoke(secrets.token_urlsafe(12), clock_time[0] + lifetime)
+    return len(revoked), 24 * logouts_per_hour
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--revoked', type=int, default=10000)
+    parser.add_argument('--checks', type=int, default=100000)
+    args = parser.parse_args()
+
+    exp = time.time() + 3600
+    revoked_ids = [secrets.token_urlsafe(12) for _ in range(args.revoked)]
+    checked_ids = [secrets.token_urlsafe(12) for _ in range(args.checks)]
+
+    memory = RevocationStore()
+    for token_id in revoked_ids:
+        memory.revoke(token_id, exp)
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite = SqliteStore(os.path.join(directory, "momo.db"))
+        for token_id in revoked_ids:
+            sqlite.block_token(token_id, exp)
+
+        def sqlite_query_only(token_id):
+            with sqlite.pool.connection() as connection:
+                return connection.execute(SELECT_REVOKED_TOKEN, (token_id, time.time())).fetchone() is not None
+
+        print(f"{'check':>24} {'us/check':>9}")
+        print(f"{'memory':>24} {microseconds_per_check(memory.is_revoked, checked_ids):>9.2f}")
+        print(f"{'sqlite, no filter':>24} {microseconds_per_check(sqlite_query_only, checked_ids):>9.2f}")
+        print(f"{'sqlite, bloom filter':>24} {microseconds_per_check(sqlite.is_token_blocked, checked_ids):>9.2f}")
+        sqlite.close()
+
+    kept, total = kept_over_a_day(logouts_per_hour=max(1, args.revoked // 24))
+    print(f"\n{total} logouts over a day: {kept} revocations kept (a set would keep {total})")
+
+
+if __name__ == '__main__':
+    main()
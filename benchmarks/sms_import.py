@@ -0,0 +1,55 @@
+"""
+Messages per second for a bulk SMS import with 1, 2, 4 ... parsing processes.
+The backup is built by repeating the messages of dsa/modified_sms_v2.xml.
+
+    python benchmarks/sms_import.py --copies 100 --processes 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import database
+from dsa.xml_parser import parse_xml_file
+
+SEED_FILE = os.path.join(ROOT, 'dsa', 'modified_sms_v2.xml')
+
+
+def build_backup(copies):
+    messages = [ET.tostring(sms, encoding='unicode') for sms in ET.parse(SEED_FILE).getroot().iter('sms')]
+    handle, path = tempfile.mkstemp(suffix='.xml')
+    with os.fdopen(handle, 'w', encoding='utf-8') as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<smses>\n")
+        for _ in range(copies):
+            f.writelines(messages)
+        f.write("</smses>\n")
+    return path, len(messages) * copies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, default=50)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    path, messages = build_backup(args.copies)
+    try:
+        print(f"{messages} messages, {os.path.getsize(path) / 2**20:.1f} MB, {os.cpu_count()} CPUs")
+        print(f"{'processes':>9} {'seconds':>8} {'msgs/s':>9}")
+        for processes in args.processes:
+            database.transactions = {}
+            start = time.perf_counter()
+            parse_xml_file(path, processes=processes)
+            elapsed = time.perf_counter() - start
+            print(f"{processes:>9} {elapsed:>8.2f} {messages / elapsed:>9.0f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
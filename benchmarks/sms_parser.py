@@ -0,0 +1,57 @@
+"""
+Messages per second for parse_sms_body (the compiled template registry) and
+parse_sms_body_reference (the original branch-by-branch parser) over the
+messages in dsa/modified_sms_v2.xml, followed by the registry's per-template
+counters.
+
+    python benchmarks/sms_parser.py --rounds 20
+"""
+import argparse
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from dsa.helper import parse_sms_body, parse_sms_body_reference, sms_templates
+
+SEED_FILE = os.path.join(ROOT, 'dsa', 'modified_sms_v2.xml')
+
+
+def rate(parse, bodies, rounds):
+    """Best of `rounds` passes over the messages, which filters out scheduler noise"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for body in bodies:
+            parse(body)
+        best = min(best, time.perf_counter() - start)
+    return len(bodies) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    bodies = [sms.get('body', '') for sms in ET.parse(SEED_FILE).getroot().iter('sms')]
+    mismatches = sum(parse_sms_body(body) != parse_sms_body_reference(body) for body in bodies)
+    print(f"{len(bodies)} messages, {mismatches} parsed differently")
+
+    reference = rate(parse_sms_body_reference, bodies, args.rounds)
+    compiled = rate(parse_sms_body, bodies, args.rounds)
+    print(f"{'parser':>10} {'msgs/s':>9}")
+    print(f"{'reference':>10} {reference:>9.0f}")
+    print(f"{'compiled':>10} {compiled:>9.0f}  ({compiled / reference:.2f}x)")
+
+    stats = sms_templates.stats()
+    print(f"\n{stats['parsed']} parsed, {stats['unmatched']} left to the reference parser")
+    print(f"{'template':>13} {'hits':>8} {'misses':>8} {'mean us':>8} {'total ms':>9}")
+    for row in stats['templates']:
+        print(f"{row['template']:>13} {row['hits']:>8} {row['misses']:>8} {row['mean_us']:>8.2f} {row['estimated_total_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
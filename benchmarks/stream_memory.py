@@ -0,0 +1,87 @@
+"""
+Peak memory of GET /transactions/ with a buffered body versus the streamed one.
+
+    python benchmarks/stream_memory.py --rows 10000 100000 500000
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from api.handlers.transactions import format_transaction_response
+from api.models.transaction import Transaction
+from utils import json_response, json_stream_response
+
+
+class CountingWriter:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+class SinkHandler:
+    request_version = 'HTTP/1.1'
+    protocol_version = 'HTTP/1.1'
+    headers = {}  # no Accept-Encoding, so the body is written uncompressed
+
+    def __init__(self):
+        self.wfile = CountingWriter()
+
+    def send_response(self, code):
+        pass
+
+    def send_header(self, keyword, value):
+        pass
+
+    def end_headers(self):
+        pass
+
+
+def seed(rows):
+    database.users[1] = {'id': 1, 'name': "A", 'email': "a@example.com", 'password': "", 'balance': 10 ** 12, 'role': 'USER'}
+    database.users[2] = {'id': 2, 'name': "B", 'email': "b@example.com", 'password': "", 'balance': 0, 'role': 'USER'}
+    for i in range(rows):
+        Transaction.create(1, 2, i % 5000 + 1)
+
+
+def buffered(handler):
+    transactions = Transaction.get_all()
+    json_response(handler, 200, [format_transaction_response(t, "A") for t in transactions])
+
+
+def streamed(handler):
+    transactions = Transaction.iter_all()
+    json_stream_response(handler, 200, (format_transaction_response(t, "A") for t in transactions))
+
+
+def peak(write_response):
+    handler = SinkHandler()
+    tracemalloc.start()
+    write_response(handler)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_bytes, handler.wfile.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000, 200000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'body MB':>9} {'buffered peak MB':>17} {'streamed peak MB':>17}")
+    seeded = 0
+    for rows in sorted(args.rows):
+        seed(rows - seeded)
+        seeded = rows
+        buffered_peak, size = peak(buffered)
+        streamed_peak, _ = peak(streamed)
+        print(f"{rows:>9} {size / 2**20:>9.1f} {buffered_peak / 2**20:>17.1f} {streamed_peak / 2**20:>17.2f}")
+
+
+if __name__ == '__main__':
+    main()
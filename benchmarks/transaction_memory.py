@@ -0,0 +1,79 @@
+"""
+Resident bytes per stored transaction: the plain dicts the store used to keep
+versus TransactionRecord, for API transfers and for the SMS import.
+
+    python benchmarks/transaction_memory.py --rows 100000 1000000
+"""
+import argparse
+import datetime
+import os
+import sys
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dsa.transaction_record import TransactionRecord
+
+TYPES = ['transfer', 'payment', 'withdrawal', 'deposit']
+NAMES = ['Me', 'Jane Smith', 'Samuel Carter', 'Alex Doe', 'Bank Deposit', 'Airtime']
+START = datetime.datetime(2024, 1, 1)
+
+
+def transfer_fields(i):
+    # Fresh strings per row, the way values arrive from JSON bodies and the XML parser
+    return dict(
+        id=i,
+        sender_id=i % 1000 + 1,
+        receiver_id=(i + 1) % 1000 + 1,
+        amount=i % 5000 + 1,
+        type=''.join(TYPES[i % 4]),
+        created_at=(START + datetime.timedelta(seconds=i)).isoformat(),
+    )
+
+
+def sms_fields(i):
+    return dict(
+        id=i,
+        sender=''.join(NAMES[i % 6]),
+        receiver=''.join(NAMES[(i + 1) % 6]),
+        amount=i % 5000 + 1,
+        type=''.join(TYPES[i % 4]),
+        created_at=(START + datetime.timedelta(seconds=i)).isoformat(),
+    )
+
+
+def as_dict(fields):
+    return fields
+
+
+def as_record(fields):
+    return TransactionRecord(**fields)
+
+
+def bytes_per_row(rows, make_fields, store):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    transactions = {}
+    for i in range(1, rows + 1):
+        transactions[i] = store(make_fields(i))
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'source':>9} {'dict B/row':>11} {'record B/row':>13} {'saved':>7}")
+    for rows in args.rows:
+        for source, make_fields in (('api', transfer_fields), ('sms', sms_fields)):
+            dict_bytes = bytes_per_row(rows, make_fields, as_dict)
+            record_bytes = bytes_per_row(rows, make_fields, as_record)
+            saved = 1 - record_bytes / dict_bytes
+            print(f"{rows:>9} {source:>9} {dict_bytes:>11.0f} {record_bytes:>13.0f} {saved:>7.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Transfers per second through Transaction.create with the write-ahead log under
+each fsync policy, against no log at all.
+
+    python benchmarks/wal_throughput.py --transfers 5000 --threads 1 16
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import wal
+from api.models.transaction import Transaction
+
+
+def seed():
+    database.users[1] = {'id': 1, 'name': "A", 'email': "a@example.com", 'password': "", 'balance': 10 ** 12, 'role': 'USER'}
+    database.users[2] = {'id': 2, 'name': "B", 'email': "b@example.com", 'password': "", 'balance': 10 ** 12, 'role': 'USER'}
+
+
+def transfers_per_second(transfers, threads):
+    def transfer(i):
+        Transaction.create(*((1, 2) if i % 2 else (2, 1)), 1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(transfer, range(transfers)))
+    return transfers / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transfers', type=int, default=3000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('--dir', default=None, help="directory for the log, to benchmark a particular disk")
+    args = parser.parse_args()
+
+    seed()
+    directory = tempfile.mkdtemp(dir=args.dir)
+    try:
+        print(f"{'policy':>9}" + ''.join(f" {f'{n} threads':>11}" for n in args.threads) + "   (transfers/s)")
+        for policy in ('no wal',) + wal.FSYNC_POLICIES:
+            rates = []
+            for threads in args.threads:
+                if policy != 'no wal':
+                    wal.attach(os.path.join(directory, f"{policy}-{threads}.wal"), fsync=policy)
+                rates.append(transfers_per_second(args.transfers, threads))
+                wal.detach()
+            print(f"{policy:>9}" + ''.join(f" {rate:>11.0f}" for rate in rates))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Startup time: seeding the store by parsing an SMS backup versus loading a
+snapshot of the same store. The backup repeats dsa/modified_sms_v2.xml.
+
+    python benchmarks/warm_start.py --copies 1 10 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import snapshot
+from benchmarks.sms_import import build_backup
+from dsa.xml_parser import parse_xml_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--copies', type=int, nargs='+', default=[1, 10, 50])
+    args = parser.parse_args()
+
+    print(f"{'messages':>9} {'transactions':>13} {'snapshot MB':>12} {'XML parse s':>12} {'snapshot load s':>16}")
+    for copies in args.copies:
+        backup, messages = build_backup(copies)
+        snapshot_path = os.path.join(tempfile.mkdtemp(), 'momo.snapshot')
+        try:
+            start = time.perf_counter()
+            parse_xml_file(backup)
+            parse_seconds = time.perf_counter() - start
+
+            snapshot.save(snapshot_path)
+            start = time.perf_counter()
+            snapshot.load(snapshot_path)
+            load_seconds = time.perf_counter() - start
+
+            size = os.path.getsize(snapshot_path)
+            print(f"{messages:>9} {len(database.transactions):>13} {size / 2**20:>12.1f} "
+                  f"{parse_seconds:>12.3f} {load_seconds:>16.3f}")
+        finally:
+            os.remove(backup)
+            os.remove(snapshot_path)
+            os.rmdir(os.path.dirname(snapshot_path))
+
+
+if __name__ == '__main__':
+    main()
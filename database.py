@@ -1,10 +1,211 @@
+import contextlib
+import threading
+
+import json_codec
+from dsa.id_allocator import IdAllocator
+from dsa.revocation_store import RevocationStore
+from dsa.sorted_index import SortedIndex
+
 users = {} 
-transactions = []  
-transactions_dictionary = {} 
+users_by_email = {}  # normalised email -> user id, unique
+transactions = {}  # id -> TransactionRecord, in insertion (ledger) order
+
+# Secondary indexes: party -> {transaction id: insertion sequence}.
+# A party is the user id for transfers made through the API and the
+# counterparty name ("Me", "Jane Smith", ...) for transactions imported from SMS.
+transactions_by_sender = {}
+transactions_by_receiver = {}
+transaction_sequence = 0  # last insertion sequence, also kept on each record
+
+# Sorted indexes for paging and range filters, entries are (key, sequence, id)
+transactions_by_sequence = SortedIndex()
+transactions_by_type = {}  # type -> SortedIndex keyed by sequence
+transactions_by_amount = SortedIndex()
+transactions_by_created_at = SortedIndex()
 
 # Auto-increment counters
 user_id_counter = 1
-transaction_id_counter = 1
+transaction_ids = IdAllocator()
+
+# Bumped by every change to the transactions, so listings can tell clients
+# whether their copy is current (ETags)
+transactions_version = 0
+version_lock = threading.Lock()
+
+# Security: ids of logged-out tokens, kept until the tokens expire
+revoked_tokens = RevocationStore()
+
+# Durability: the write-ahead log (wal.WriteAheadLog) when one is attached, and
+# the sequence number of the last logged change reflected in the data above
+wal = None
+applied_lsn = 0
+
+# Guards the shared state above when requests are served concurrently
+lock = threading.RLock()
+
+# One lock per user id, held by transfers from checking balances until the
+# change is applied. Always taken before `lock`, never while holding it.
+account_locks = {}
+
+# The backend the models read and write through (storage/base.py), set below
+store = None
+
+
+@contextlib.contextmanager
+def locked_accounts(user_ids):
+    """
+    Hold the account locks of `user_ids`. They are taken in id order, so two
+    transfers over the same accounts can't each wait on a lock the other holds.
+    """
+    # setdefault is atomic, so racing callers end up with the same lock
+    locks = [account_locks.get(user_id) or account_locks.setdefault(user_id, threading.Lock())
+             for user_id in sorted(set(user_ids))]
+    for account_lock in locks:
+        account_lock.acquire()
+    try:
+        yield
+    finally:
+        for account_lock in reversed(locks):
+            account_lock.release()
+
+
+def get_user(user_id):
+    return store.get_user(user_id)
+
+
+def normalize_email(email):
+    return email.strip().lower() if isinstance(email, str) else email
+
+
+def log_change(kind, *args):
+    """Append a change to the WAL; call under `lock`, right after making it"""
+    global applied_lsn
+    if wal is None:
+        return 0
+    applied_lsn = wal.append(kind, *args)
+    return applied_lsn
+
+
+def wait_durable(lsn):
+    """Wait, outside `lock`, until a logged change is as durable as the fsync policy promises"""
+    if wal is not None and lsn:
+        wal.commit(lsn)
+
+
+def transactions_changed():
+    """Call after adding, changing or removing transactions"""
+    global transactions_version
+    with version_lock:
+        transactions_version += 1
+
+
+def block_token(token_id, exp):
+    """Revoke the token with this id (see utils.token_id) until it expires at `exp`"""
+    store.block_token(token_id, exp)
+
+
+def is_token_blocked(token_id):
+    return store.is_token_blocked(token_id)
+
+
+def use_store(new_store):
+    """Point the models at another storage backend; returns the previous one"""
+    global store
+    previous, store = store, new_store
+    # Transaction ids restart in another store, so cached JSON by id no longer applies
+    json_codec.fragments.clear()
+    return previous
+
+
+def open_store(backend='memory', path=None):
+    """A storage backend by name: 'memory' (the data above) or 'sqlite' (the database file at `path`)"""
+    if backend == 'sqlite':
+        from storage.sqlite import SqliteStore
+        return SqliteStore(path)
+    return MemoryStore()
+
+
+def party_key(transaction, side):
+    """Index key for the 'sender' or 'receiver' side of a transaction."""
+    user_id = transaction.get(f'{side}_id')
+    return user_id if user_id is not None else transaction.get(side)
+
+
+def index_transaction(transaction):
+    global transaction_sequence
+    # Looked up first: a type that can't be a key fails here, before any index is touched
+    type_index = transactions_by_type.get(transaction['type'])
+    transaction_sequence += 1
+    sequence = transaction_sequence
+    transaction_id = transaction['id']
+    transaction.sequence = sequence
+
+    for index, side in ((transactions_by_sender, 'sender'), (transactions_by_receiver, 'receiver')):
+        key = party_key(transaction, side)
+        if key is not None:
+            index.setdefault(key, {})[transaction_id] = sequence
+
+    transactions_by_sequence.add(sequence, sequence, transaction_id)
+    if type_index is None:
+        type_index = transactions_by_type[transaction['type']] = SortedIndex()
+    type_index.add(sequence, sequence, transaction_id)
+    transactions_by_amount.add(transaction['amount'], sequence, transaction_id)
+    transactions_by_created_at.add(transaction['created_at'], sequence, transaction_id)
+
+
+def add_transactions(new_transactions):
+    """
+    Store and index new transactions, all or none: if one can't be indexed, the
+    ones added before it are taken out again and the error is raised. Call under
+    `lock`, before moving any balance, so a failure leaves nothing applied.
+    """
+    added = []
+    try:
+        for transaction in new_transactions:
+            index_transaction(transaction)
+            transactions[transaction.id] = transaction
+            added.append(transaction)
+    except Exception:
+        for transaction in reversed(added):
+            del transactions[transaction.id]
+            unindex_transaction(transaction)
+        raise
+
+
+def unindex_transaction(transaction):
+    transaction_id = transaction['id']
+    sequence = transaction.sequence
+
+    for index, side in ((transactions_by_sender, 'sender'), (transactions_by_receiver, 'receiver')):
+        key = party_key(transaction, side)
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(transaction_id, None)
+            if not bucket:
+                del index[key]
+
+    transactions_by_sequence.remove(sequence, sequence, transaction_id)
+    remove_from_type_index(transaction['type'], sequence, transaction_id)
+    transactions_by_amount.remove(transaction['amount'], sequence, transaction_id)
+    transactions_by_created_at.remove(transaction['created_at'], sequence, transaction_id)
+
+
+def reindex_type(transaction, old_type):
+    transaction_id = transaction['id']
+    sequence = transaction.sequence
+    remove_from_type_index(old_type, sequence, transaction_id)
+    transactions_by_type.setdefault(transaction['type'], SortedIndex()).add(sequence, sequence, transaction_id)
+
+
+def remove_from_type_index(transaction_type, sequence, transaction_id):
+    index = transactions_by_type.get(transaction_type)
+    if index is not None:
+        index.remove(sequence, sequence, transaction_id)
+        if not index:
+            del transactions_by_type[transaction_type]
+
+
+# Imported last, since storage.memory works on this module
+from storage.memory import MemoryStore  # noqa: E402
 
-# Security
-blocked_tokens = set()
+store = MemoryStore()
@@ -0,0 +1,38 @@
+import math
+
+
+class BloomFilter:
+    """
+    Set membership in about 10 bits per key at a 1% error rate: `key in filter`
+    is never False for a key that was added, and True for about `error_rate`
+    of the keys that weren't. Keys can't be removed; rebuild the filter instead.
+    Positions come from Python's hash(), which is salted per process, so a
+    filter is only meaningful in the process that filled it.
+    """
+
+    def __init__(self, capacity=1024, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        # Double hashing: k positions from the two halves of one hash
+        h = hash(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key):
+        bits = self.bits
+        for position in self.positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self.positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
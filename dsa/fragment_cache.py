@@ -0,0 +1,98 @@
+import threading
+
+from dsa.transaction_record import ME, UserView
+
+# Stands in for a 'Me' party in a cached fragment and is replaced by the
+# user's encoded name when the fragment is served
+PLACEHOLDER = '\x00Me\x00'
+
+
+class FragmentCache:
+    """
+    Encoded JSON of transaction records by id, so listings join stored bytes
+    instead of encoding every record on every request. Each entry remembers the
+    record's type, the one field that changes once a record is stored, and a
+    record whose type no longer matches is encoded again; that keeps pre-fork
+    workers right even though updates are made (and invalidated) in the store
+    process. A record with a 'Me' party is stored split around the party, and
+    joined with the name of whoever it is served to. When full, the oldest
+    entry is dropped. `maxsize` 0 disables it.
+    """
+
+    def __init__(self, encode, maxsize=100000):
+        self.encode = encode
+        self.maxsize = maxsize
+        # transaction id -> (type, encoded bytes, or a tuple of the bytes around
+        # each 'Me' party), oldest first
+        self.entries = {}
+        self.lock = threading.Lock()  # taken to add entries; lookups don't need it
+        self.hits = 0
+        self.misses = 0
+        # The last name joined into a fragment and its encoding; a listing joins the same one into every record
+        self.last_name = (None, b'null')
+
+    def get(self, record):
+        """
+        `record` (a TransactionRecord or a UserView of one) encoded, from the
+        cache when it holds the same version of it
+        """
+        user_name = ME
+        if isinstance(record, UserView):
+            record, user_name = record.record, record.user_name
+        entry = self.entries.get(record.id)
+        if entry is not None and entry[0] == record.type:
+            self.hits += 1
+            pieces = entry[1]
+        else:
+            self.misses += 1
+            # The entry is keyed on the type in the copy that was encoded: reading
+            # record.type again could see an update made meanwhile
+            data = record.copy()
+            pieces = self.split(data)
+            if pieces is None:
+                return self.encode(UserView(record, user_name).copy())
+            if self.maxsize > 0:
+                with self.lock:
+                    self.entries[record.id] = (data['type'], pieces)
+                    while len(self.entries) > self.maxsize:
+                        del self.entries[next(iter(self.entries))]
+        if isinstance(pieces, bytes):
+            return pieces
+        name = self.last_name
+        if name[0] != user_name:
+            name = self.last_name = (user_name, self.encode(user_name))
+        return name[1].join(pieces)
+
+    def split(self, data):
+        """
+        The encoding of the record `data`: bytes, or the bytes around its 'Me'
+        parties when it has any (None in the unlikely case that the
+        placeholder can't be told apart from the rest of the record)
+        """
+        sides = [side for side in ('sender', 'receiver') if data.get(side) == ME]
+        if not sides:
+            return self.encode(data)
+        for side in sides:
+            data[side] = PLACEHOLDER
+        pieces = tuple(self.encode(data).split(self.encode(PLACEHOLDER)))
+        return pieces if len(pieces) == len(sides) + 1 else None
+
+    def discard(self, transaction_id):
+        with self.lock:
+            self.entries.pop(transaction_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+            self.last_name = (None, b'null')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
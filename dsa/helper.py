@@ -1,3 +1,6 @@
+from dsa.template_registry import TemplateRegistry
+
+
 def parse_amount(text):
     """Extract amount from text"""
     cleaned = text.replace(',', '').replace('RWF', '').strip()
@@ -59,7 +62,11 @@ def extract_transaction_id(body):
     return None
 
 
-def parse_sms_body(body):
+def parse_sms_body_reference(body):
+    """
+    Original branch-by-branch parser. parse_sms_body must agree with it on the
+    known message templates, and falls back to it for anything else.
+    """
 
     if 'one-time password' in body.lower():
         return None
@@ -186,3 +193,123 @@ def parse_sms_body(body):
         return result
     
     return None
+
+
+
+# Every known money message, declared once. parse_sms_body tries the templates
+# most-hit first and falls back to parse_sms_body_reference for anything else.
+sms_templates = TemplateRegistry(fallback=parse_sms_body_reference)
+
+
+def financial_transaction_id(body, start):
+    """ID from the 'Financial Transaction Id: ...' trailer after `start`, if there is one"""
+    transaction_id = extract_between(body[start:], 'Financial Transaction Id: ', '.')
+    return transaction_id if transaction_id and transaction_id.isdigit() else None
+
+
+def merchant_name(text):
+    """'Jane Smith 12845' -> 'Jane Smith': a trailing merchant code is dropped"""
+    name = text.strip()
+    parts = name.rsplit(' ', 1)
+    if len(parts) == 2 and parts[1].isdigit():
+        name = parts[0]
+    return extract_name(name)
+
+
+def transaction_fields(transaction_id, amount, transaction_type, sender, receiver, created_at):
+    created_at = created_at.strip()
+    if not created_at:
+        return None
+    return {
+        'id': int(transaction_id) if transaction_id else None,
+        'amount': parse_amount(amount),
+        'type': transaction_type,
+        'sender': sender,
+        'receiver': receiver,
+        'created_at': created_at,
+    }
+
+
+@sms_templates.template('received',
+    r"You have received (?P<amount>[\d,]+) RWF from (?P<sender>[^(]*?) \([^)]*\) "
+    r"on your mobile money account at (?P<at>[^.]+)\. Message")
+def received_fields(match, body):
+    return transaction_fields(financial_transaction_id(body, match.end()), match['amount'], 'received',
+                              extract_name(match['sender']), 'Me', match['at'])
+
+
+@sms_templates.template('payment',
+    r"TxId: (?P<id>\d+)\. Your payment of (?P<amount>[\d,]+) RWF to (?P<receiver>.*?) "
+    r"has been completed at (?P<at>[^.]+)\. Your")
+def payment_fields(match, body):
+    if 'Airtime' in body or 'Cash Power' in body:
+        return None
+    return transaction_fields(match['id'], match['amount'], 'payment', 'Me', merchant_name(match['receiver']), match['at'])
+
+
+@sms_templates.template('ussd_payment',
+    r"\*162\*TxId:(?P<id>\d+)\*S\*Your payment of (?P<amount>[\d,]+) RWF to (?P<receiver>.*?) "
+    r"has been completed at (?P<at>.*?)\. Your")
+def ussd_payment_fields(match, body):
+    # Bundles and other *162* purchases; created_at runs to '. Your' like the reference parser
+    if 'Airtime' in body or 'Cash Power' in body or 'TxId: ' in body:
+        return None
+    return transaction_fields(match['id'], match['amount'], 'payment', 'Me', merchant_name(match['receiver']), match['at'])
+
+
+@sms_templates.template('transfer',
+    r"\*165\*S\*(?P<amount>[\d,]+) RWF transferred to (?P<receiver>[^(]*?) \([^)]*\) from (?P<at>.*?) \. Fee")
+def transfer_fields(match, body):
+    created_at = match['at'].strip()
+    if ' at ' in created_at:
+        created_at = created_at.split(' at ', 1)[1]
+    return transaction_fields(None, match['amount'], 'transfer', 'Me', extract_name(match['receiver']), created_at)
+
+
+@sms_templates.template('deposit',
+    r"\*113\*R\*A bank deposit of (?P<amount>[\d,]+) RWF has been added to your "
+    r"mobile money account at (?P<at>[^.]+)\. Your")
+def deposit_fields(match, body):
+    return transaction_fields(None, match['amount'], 'deposit', 'Bank Deposit', 'Me', match['at'])
+
+
+@sms_templates.template('airtime',
+    r"\*162\*TxId:(?P<id>\d+)\*S\*Your payment of (?P<amount>[\d,]+) RWF to Airtime "
+    r"with token .*? has been completed at (?P<at>[^.]+)\. Fee")
+def airtime_fields(match, body):
+    return transaction_fields(match['id'], match['amount'], 'airtime', 'Me', 'Airtime', match['at'])
+
+
+@sms_templates.template('withdrawal',
+    r"You [^(]*? \([^)]*\) have via agent: (?P<agent>[^(]*?) \([^)]*\), withdrawn (?P<amount>[\d,]+) RWF "
+    r"from your mobile money account: (?P<at>.*?) at ")
+def withdrawal_fields(match, body):
+    # created_at is what follows 'account: ', as in parse_sms_body_reference
+    return transaction_fields(financial_transaction_id(body, match.end()), match['amount'], 'withdrawal',
+                              'Me', extract_name(match['agent']), match['at'])
+
+
+@sms_templates.template('cash_power',
+    r"\*162\*TxId:(?P<id>\d+)\*S\*Your payment of (?P<amount>[\d,]+) RWF to MTN Cash Power "
+    r"with token .*? has been completed at (?P<at>[^.]+)\. Fee")
+def cash_power_fields(match, body):
+    if 'Airtime' in body:
+        return None
+    return transaction_fields(match['id'], match['amount'], 'cash_power', 'Me', 'MTN Cash Power', match['at'])
+
+
+@sms_templates.template('direct_debit',
+    r"\*164\*S\*Y'ello,A transaction of (?P<amount>[\d,]+) RWF by (?P<receiver>.*?) "
+    r"on your MOMO account was successfully completed at (?P<at>[^.]+)\. Message")
+def direct_debit_fields(match, body):
+    return transaction_fields(financial_transaction_id(body, match.end()), match['amount'], 'direct_debit',
+                              'Me', extract_name(match['receiver']), match['at'])
+
+
+def parse_sms_body(body):
+    """
+    Parse an MTN MoMo SMS into a transaction dict, or None when it is not a
+    money movement. Known formats go through the sms_templates registry,
+    anything else through parse_sms_body_reference.
+    """
+    return sms_templates.parse(body)
@@ -0,0 +1,43 @@
+import threading
+
+
+class IdAllocator:
+    """
+    Increasing ids, handed out from any thread without a caller-held lock. Each
+    allocate() gets its own block of ids, so concurrent callers never share one.
+    """
+
+    def __init__(self, next_id=1):
+        self._next_id = next_id
+        self._lock = threading.Lock()
+
+    @property
+    def next_id(self):
+        """The id the next allocate() returns"""
+        return self._next_id
+
+    def allocate(self, count=1):
+        """Take `count` consecutive ids and return the first"""
+        with self._lock:
+            first = self._next_id
+            self._next_id += count
+            return first
+
+    def reset(self, next_id):
+        with self._lock:
+            self._next_id = next_id
+
+    def advance_past(self, used_id):
+        """Make sure `used_id`, already taken elsewhere, is never handed out"""
+        with self._lock:
+            self._next_id = max(self._next_id, used_id + 1)
+
+    # The lock isn't pickled, so snapshots hold just the next id
+    def __getstate__(self):
+        return {'next_id': self._next_id}
+
+    def __setstate__(self, state):
+        self.__init__(state['next_id'])
+
+    def __repr__(self):
+        return f"IdAllocator(next_id={self._next_id})"
@@ -0,0 +1,58 @@
+import bisect
+import threading
+
+# Bucket upper bounds in milliseconds; anything slower lands in the last, open bucket
+BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """
+    Counts of observed durations in fixed buckets, cheap enough to update on
+    every call. Percentiles are read back as the upper bound of the bucket they
+    fall in, so they are only as precise as the buckets.
+    """
+
+    def __init__(self, bounds=BOUNDS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0  # seconds
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        bucket = bisect.bisect_left(self.bounds, seconds * 1000)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.total += seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def mean(self):
+        """Mean duration in seconds, 0.0 before anything is observed"""
+        count = self.count
+        return self.total / count if count else 0.0
+
+    def percentile(self, fraction):
+        """Upper bound in milliseconds of the bucket holding the `fraction` quantile, None if it is the open bucket"""
+        count = self.count
+        if not count:
+            return 0
+        rank = fraction * count
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return None
+
+    def stats(self):
+        labels = [f"<={bound}ms" for bound in self.bounds] + [f">{self.bounds[-1]}ms"]
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean() * 1000, 3),
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'buckets': dict(zip(labels, self.counts)),
+        }
@@ -0,0 +1,58 @@
+import heapq
+import threading
+import time
+
+
+class RevocationStore:
+    """
+    Revoked token ids (the `jti` claim), each kept only until its token expires:
+    after that the token is rejected as expired anyway. A min-heap on expiry
+    makes the purge cheap; it runs as a side effect of revoke() and of the first
+    check after the earliest entry expires, so memory tracks the tokens revoked
+    within the last token lifetime rather than growing forever.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.expiry = {}  # token id -> exp
+        self.heap = []  # (exp, token id), earliest expiry first
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.expiry)
+
+    def revoke(self, token_id, exp):
+        now = self.clock()
+        with self.lock:
+            self.purge(now)
+            if exp <= now:
+                return
+            self.expiry[token_id] = max(exp, self.expiry.get(token_id, exp))
+            heapq.heappush(self.heap, (exp, token_id))
+
+    def is_revoked(self, token_id):
+        now = self.clock()
+        if self.heap and self.heap[0][0] <= now:
+            with self.lock:
+                self.purge(now)
+        exp = self.expiry.get(token_id)
+        return exp is not None and exp > now
+
+    def purge(self, now):
+        """Drop every entry whose token has expired by `now`; call under `lock`"""
+        heap, expiry = self.heap, self.expiry
+        while heap and heap[0][0] <= now:
+            exp, token_id = heapq.heappop(heap)
+            # A token revoked twice keeps its latest expiry
+            if expiry.get(token_id) == exp:
+                del expiry[token_id]
+
+    # Snapshots hold the ids and expiries; the heap is rebuilt on load
+    def __getstate__(self):
+        return {'expiry': self.expiry}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.expiry = dict(state['expiry'])
+        self.heap = [(exp, token_id) for token_id, exp in self.expiry.items()]
+        heapq.heapify(self.heap)
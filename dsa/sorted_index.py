@@ -0,0 +1,117 @@
+from bisect import bisect_left, bisect_right, insort
+
+# Entries per chunk: a chunk is split in two at twice this many, and merged
+# with its neighbour below half of it
+CHUNK_SIZE = 1000
+
+
+class SortedIndex:
+    """
+    Sorted list of (key, sequence, id) entries.
+    The insertion sequence breaks ties between equal keys, so entries with the
+    same key stay in ledger order and every entry is unique.
+
+    Entries are kept in sorted chunks of up to 2 * CHUNK_SIZE, with the last
+    entry of each chunk in `maxes` to find the chunk an entry belongs in. An
+    insert or delete only shifts the entries of one chunk (and, when a chunk is
+    split or merged, the short list of chunks), instead of every entry after
+    it in one flat list.
+    """
+
+    def __init__(self, entries=()):
+        self.chunks = []
+        self.maxes = []
+        entries = sorted(entries)
+        for i in range(0, len(entries), CHUNK_SIZE):
+            self.chunks.append(entries[i:i + CHUNK_SIZE])
+            self.maxes.append(self.chunks[-1][-1])
+        self.size = len(entries)
+
+    def __setstate__(self, state):
+        # Snapshots taken before the chunks hold one flat `entries` list
+        if 'entries' in state:
+            self.__init__(state['entries'])
+        else:
+            self.__dict__.update(state)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def add(self, key, sequence, item_id):
+        entry = (key, sequence, item_id)
+        if not self.chunks:
+            self.chunks.append([entry])
+            self.maxes.append(entry)
+        else:
+            i = bisect_left(self.maxes, entry)
+            if i == len(self.maxes):
+                # Past the end, which is where the ledger and new dates go
+                i -= 1
+                self.chunks[i].append(entry)
+                self.maxes[i] = entry
+            else:
+                insort(self.chunks[i], entry)
+            if len(self.chunks[i]) > 2 * CHUNK_SIZE:
+                chunk = self.chunks[i]
+                self.chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+                self.maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+        self.size += 1
+
+    def remove(self, key, sequence, item_id):
+        entry = (key, sequence, item_id)
+        i = bisect_left(self.maxes, entry)
+        if i == len(self.maxes):
+            return
+        chunk = self.chunks[i]
+        j = bisect_left(chunk, entry)
+        if chunk[j] != entry:
+            return
+        del chunk[j]
+        self.size -= 1
+        if not chunk:
+            del self.chunks[i]
+            del self.maxes[i]
+            return
+        self.maxes[i] = chunk[-1]
+        if len(chunk) < CHUNK_SIZE // 2 and len(self.chunks) > 1:
+            self._merge(i if i + 1 < len(self.chunks) else i - 1)
+
+    def _merge(self, i):
+        """Join chunk i and the one after it, splitting the result again if it is too long"""
+        merged = self.chunks[i] + self.chunks[i + 1]
+        if len(merged) > 2 * CHUNK_SIZE:
+            half = len(merged) // 2
+            self.chunks[i:i + 2] = [merged[:half], merged[half:]]
+            self.maxes[i:i + 2] = [merged[half - 1], merged[-1]]
+        else:
+            self.chunks[i:i + 2] = [merged]
+            self.maxes[i:i + 2] = [merged[-1]]
+
+    def _position(self, bound, find):
+        """(chunk, offset) of the first entry at or past `bound`, `find` being bisect_left or bisect_right"""
+        i = find(self.maxes, bound)
+        if i == len(self.maxes):
+            return i, 0
+        return i, find(self.chunks[i], bound)
+
+    def scan(self, low=None, high=None, after=None):
+        """Yield entries with low <= key <= high in order, starting after the `after` entry."""
+        start = (0, 0)
+        if low is not None:
+            start = self._position((low,), bisect_left)
+        if after is not None:
+            start = max(start, self._position(tuple(after), bisect_right))
+
+        i, j = start
+        while i < len(self.chunks):
+            chunk = self.chunks[i]
+            for k in range(j, len(chunk)):
+                entry = chunk[k]
+                if high is not None and entry[0] > high:
+                    return
+                yield entry
+            i, j = i + 1, 0
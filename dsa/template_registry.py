@@ -0,0 +1,117 @@
+import re
+import time
+
+
+class MessageTemplate:
+    """One message format: an anchored pattern, a field builder and its counters."""
+
+    __slots__ = ('name', 'pattern', 'build', 'hits', 'misses', 'timed', 'seconds')
+
+    def __init__(self, name, pattern, build):
+        self.name = name
+        self.pattern = pattern
+        self.build = build
+        self.hits = 0
+        self.misses = 0
+        self.timed = 0  # attempts that were timed
+        self.seconds = 0.0  # time spent in those attempts
+
+    def stats(self):
+        mean = self.seconds / self.timed if self.timed else 0.0
+        return {
+            'template': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'mean_us': round(mean * 1e6, 3),
+            'estimated_total_ms': round(mean * (self.hits + self.misses) * 1000, 3),
+        }
+
+
+class TemplateRegistry:
+    """
+    Message templates, each declared once with the `template` decorator and
+    compiled to a pattern matched at the start of a message. `parse` tries them
+    most-hit first: every `reorder_every` parses the order is recomputed from the
+    hit counters. Hits and misses are counted on every parse; latency is timed on
+    one parse in `time_every`, since reading the clock around each attempt costs
+    about as much as the match itself. Counters are per process and updated
+    without a lock, so under concurrent use they are close approximations.
+    """
+
+    def __init__(self, fallback=None, reorder_every=1024, time_every=16):
+        self.fallback = fallback
+        self.reorder_every = reorder_every
+        self.time_every = time_every
+        self.templates = {}
+        self.order = []
+        self.parsed = 0
+        self.unmatched = 0
+
+    def template(self, name, pattern, flags=re.DOTALL):
+        """Register the decorated `build(match, message)` as the template `name`.
+        `build` may return None to reject a match, in which case the next
+        templates are tried."""
+        def register(build):
+            if name in self.templates:
+                raise ValueError(f"Template {name} is already registered")
+            template = MessageTemplate(name, re.compile(pattern, flags), build)
+            self.templates[name] = template
+            self.order = self.order + [template]
+            return build
+        return register
+
+    def parse(self, message):
+        self.parsed += 1
+        if self.parsed % self.reorder_every == 0:
+            self.reorder()
+        if self.parsed % self.time_every == 0:
+            return self.parse_timed(message)
+
+        for template in self.order:
+            match = template.pattern.match(message)
+            if match:
+                result = template.build(match, message)
+                if result is not None:
+                    template.hits += 1
+                    return result
+            template.misses += 1
+
+        return self.unmatched_message(message)
+
+    def parse_timed(self, message):
+        clock = time.perf_counter
+        for template in self.order:
+            started = clock()
+            match = template.pattern.match(message)
+            result = template.build(match, message) if match else None
+            template.seconds += clock() - started
+            template.timed += 1
+            if result is not None:
+                template.hits += 1
+                return result
+            template.misses += 1
+
+        return self.unmatched_message(message)
+
+    def unmatched_message(self, message):
+        self.unmatched += 1
+        return self.fallback(message) if self.fallback else None
+
+    def reorder(self):
+        # A new list is bound so parses already iterating keep a consistent order
+        self.order = sorted(self.order, key=lambda template: template.hits, reverse=True)
+
+    def stats(self):
+        """Counters for every template, most-hit first"""
+        return {
+            'parsed': self.parsed,
+            'unmatched': self.unmatched,
+            'templates': [template.stats() for template in
+                          sorted(self.templates.values(), key=lambda template: template.hits, reverse=True)],
+        }
+
+    def reset_stats(self):
+        self.parsed = self.unmatched = 0
+        for template in self.templates.values():
+            template.hits = template.misses = template.timed = 0
+            template.seconds = 0.0
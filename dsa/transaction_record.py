@@ -0,0 +1,115 @@
+import sys
+
+# Public fields in the order they are serialised. Party fields that are None are
+# left out, so API transfers show sender_id/receiver_id and imported SMS records
+# show sender/receiver, exactly like the dicts these records replace.
+FIELDS = ('id', 'sender', 'receiver', 'sender_id', 'receiver_id', 'amount', 'type', 'created_at')
+PARTY_FIELDS = frozenset(('sender', 'receiver', 'sender_id', 'receiver_id'))
+# How imported SMS records name the account holder as a party
+ME = 'Me'
+_FIELD_SET = frozenset(FIELDS)
+
+
+def intern_text(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class TransactionRecord:
+    """
+    Compact stored form of a transaction: a __slots__ object instead of a
+    six-key dict, with the type and party names interned so repeated values
+    share one string. Reads like a dict (record['type'], .get, .copy, dict(record))
+    so models and handlers don't need to know the difference.
+    `sequence` is the ledger position used by the indexes and is never serialised.
+    """
+
+    __slots__ = FIELDS + ('sequence',)
+
+    def __init__(self, id, amount, type, created_at, sender=None, receiver=None,
+                 sender_id=None, receiver_id=None):
+        self.id = id
+        self.sender = intern_text(sender)
+        self.receiver = intern_text(receiver)
+        self.sender_id = sender_id
+        self.receiver_id = receiver_id
+        self.amount = amount
+        self.type = intern_text(type)
+        self.created_at = created_at
+        self.sequence = None
+
+    def keys(self):
+        return [field for field in FIELDS
+                if field not in PARTY_FIELDS or getattr(self, field) is not None]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, key):
+        return key in _FIELD_SET and (key not in PARTY_FIELDS or getattr(self, key) is not None)
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        setattr(self, key, intern_text(value) if key in ('type', 'sender', 'receiver') else value)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def copy(self):
+        """Plain dict of the public fields"""
+        return {field: getattr(self, field) for field in self.keys()}
+
+    to_dict = copy
+
+    def __eq__(self, other):
+        if isinstance(other, (TransactionRecord, dict)):
+            return self.copy() == dict(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"TransactionRecord({self.copy()!r})"
+
+
+class UserView:
+    """
+    A stored record as the signed-in user sees it: a sender or receiver of 'Me'
+    reads as `user_name`. The record itself is left alone, so its encoded JSON
+    is cached once and shared by every user (see FragmentCache).
+    """
+
+    __slots__ = ('record', 'user_name')
+
+    def __init__(self, record, user_name):
+        self.record = record
+        self.user_name = user_name
+
+    def __getitem__(self, key):
+        return self.copy()[key]
+
+    def get(self, key, default=None):
+        return self.copy().get(key, default)
+
+    def copy(self):
+        data = self.record.copy()
+        for side in ('sender', 'receiver'):
+            if data.get(side) == ME:
+                data[side] = self.user_name
+        return data
+
+    to_dict = copy
+
+    def __eq__(self, other):
+        if isinstance(other, (UserView, TransactionRecord, dict)):
+            return self.copy() == dict(other.copy() if isinstance(other, UserView) else other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"UserView({self.copy()!r})"
@@ -1,4 +1,8 @@
 import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import itertools
 import sys
 import os
 
@@ -6,49 +10,124 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import database
 
-from parsers.helper import parse_sms_body
+from dsa.helper import parse_sms_body
+from dsa.transaction_record import TransactionRecord
 
 
-def parse_xml_file(file_path):
+BATCH_SIZE = 1000
+CHUNK_SIZE = 2000  # messages sent to a worker process at a time
+
+
+def iter_sms_bodies(file_path):
     """
-    Parse the SMS backup XML file and add transactions to the database.
-    Transactions with IDs in XML keep those IDs.
-    Transactions without IDs get auto-incremented IDs starting from 1.
-    Updates transaction_id_counter for future transactions.
+    Yield the body of each <sms> element without building the whole tree.
+    Elements are cleared as soon as they are read and detached from the root,
+    so memory stays flat however large the backup is.
     """
-    tree = ET.parse(file_path)
-    root = tree.getroot()
+    with open(file_path, 'rb') as source:
+        events = ET.iterparse(source, events=('start', 'end'))
+        _, root = next(events)
+        for event, element in events:
+            if event == 'end' and element.tag == 'sms':
+                yield element.get('body', ''), source.tell()
+                element.clear()
+                root.clear()
 
-    auto_id = 1  # Counter for transactions without IDs
-    count = 0
 
-    for sms in root.findall('sms'):
-        body = sms.get('body', '')
+def parse_chunk(bodies):
+    return [parse_sms_body(body) for body in bodies]
 
-        parsed = parse_sms_body(body)
 
+def iter_parsed(file_path, processes=1, chunk_size=CHUNK_SIZE):
+    """
+    Yield (parse_sms_body result, bytes read) for each <sms>, in file order.
+    With several processes, chunks of bodies are parsed in a process pool. At
+    most two chunks per process are in flight and results are taken back in
+    submission order, so the output is the same as a serial run.
+    """
+    if processes <= 1:
+        for body, position in iter_sms_bodies(file_path):
+            yield parse_sms_body(body), position
+        return
+
+    messages = iter_sms_bodies(file_path)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        while True:
+            while len(pending) < 2 * processes:
+                chunk = list(itertools.islice(messages, chunk_size))
+                if not chunk:
+                    break
+                bodies = [body for body, _ in chunk]
+                pending.append((pool.submit(parse_chunk, bodies), chunk[-1][1]))
+            if not pending:
+                break
+            future, position = pending.popleft()
+            for parsed in future.result():
+                yield parsed, position
+
+
+def iter_transactions(file_path, auto_ids, processes=1):
+    """
+    Yield (transaction, bytes read) for each money movement in the backup.
+    Transactions without an ID in the SMS take the next ID from `auto_ids`.
+    """
+    for parsed, position in iter_parsed(file_path, processes):
         if parsed and parsed['amount'] > 0:
             transaction_id = parsed['id']
 
             # If no ID from XML, assign auto-incremented ID
             if transaction_id is None:
-                transaction_id = auto_id
-                auto_id += 1
+                transaction_id = next(auto_ids)
+
+            yield TransactionRecord(
+                id=transaction_id,
+                sender=parsed['sender'],
+                receiver=parsed['receiver'],
+                amount=parsed['amount'],
+                type=parsed['type'],
+                created_at=parsed['created_at'] or ''
+            ), position
+
 
-            transaction = {
-                'id': transaction_id,
-                'sender': parsed['sender'],
-                'receiver': parsed['receiver'],
-                'amount': parsed['amount'],
-                'type': parsed['type'],
-                'created_at': parsed['created_at'] or ''
-            }
+def store_batch(batch):
+    # A message imported twice replaces the earlier copy
+    database.store.import_transactions(batch)
+    database.transactions_changed()
 
-            database.transactions.append(transaction)
-            database.transactions_dictionary[transaction_id] = transaction
-            count += 1
 
-    database.transaction_id_counter = auto_id
+def parse_xml_file(file_path, batch_size=BATCH_SIZE, progress=None, processes=1):
+    """
+    Parse the SMS backup XML file and add transactions to the database.
+    Transactions with IDs in XML keep those IDs.
+    Transactions without IDs get auto-incremented IDs starting from 1.
+    Sets the next transaction ID for future transactions.
+
+    The file is read incrementally and transactions are stored `batch_size` at a
+    time. `progress(count, bytes_read, total_bytes)` is called after each batch.
+    `processes` > 1 parses the messages in that many worker processes; IDs
+    and order are the same as with a single process.
+    """
+    total_bytes = os.path.getsize(file_path)
+    auto_ids = itertools.count(1)  # Counter for transactions without IDs
+    count = 0
+    batch = []
+
+    def flush(position):
+        nonlocal count
+        store_batch(batch)
+        count += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(count, position, total_bytes)
+
+    for transaction, position in iter_transactions(file_path, auto_ids, processes):
+        batch.append(transaction)
+        if len(batch) >= batch_size:
+            flush(position)
+    flush(total_bytes)
+
+    database.store.set_next_transaction_id(next(auto_ids))
 
     return count
 
@@ -56,20 +135,34 @@ def parse_xml_file(file_path):
 def print_transactions():
     """Print all transactions in a readable format."""
     print(f"\n{'='*80}")
-    print(f"Total Transactions: {len(database.transactions)}")
-    print(f"Transaction ID Counter: {database.transaction_id_counter}")
+    print(f"Total Transactions: {database.store.transaction_count()}")
     print(f"{'='*80}\n")
 
-    for transaction in database.transactions[:15]:
+    for transaction, _ in database.store.query_transactions(15)[:15]:
         print(transaction)
         print()
 
 
+def print_progress(count, bytes_read, total_bytes):
+    percent = 100 * bytes_read / total_bytes if total_bytes else 100
+    print(f"\r{count} transactions, {bytes_read / 2**20:.1f}/{total_bytes / 2**20:.1f} MB ({percent:.0f}%)",
+          end='', file=sys.stderr, flush=True)
+
+
 if __name__ == '__main__':
-    xml_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modified_sms_v2.xml')
+    parser = argparse.ArgumentParser(description="Import an SMS backup into the in-memory store")
+    parser.add_argument('xml_file', nargs='?',
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modified_sms_v2.xml'))
+    parser.add_argument('--processes', type=int, default=1,
+                        help='worker processes used to parse messages (default: 1)')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    xml_file = args.xml_file
 
     print(f"Parsing {xml_file}...")
-    count = parse_xml_file(xml_file)
+    count = parse_xml_file(xml_file, batch_size=args.batch_size, progress=print_progress,
+                           processes=args.processes)
+    print(file=sys.stderr)
     print(f"Successfully parsed {count} transactions!")
 
     print_transactions()
@@ -0,0 +1,140 @@
+import asyncio
+import io
+import socket
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class AsyncRequestAdapter:
+    """
+    Stands in for the socket side of BaseHTTPRequestHandler so the handlers in
+    api/handlers/ run unchanged: the request bytes read by the event loop are
+    served through `rfile` and the response goes to `wfile`, which is the
+    connection's TransportWriter when served, or a buffer when none is given.
+    Combined with a handler class by make_adapter_class().
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, data, client_address, server, wfile=None):
+        self.client_address = client_address
+        self.server = server
+        self.rfile = io.BytesIO(data)
+        self.wfile = wfile if wfile is not None else io.BytesIO()
+        self.close_connection = True
+
+    def parse(self):
+        """Read the request line and headers; False if an error response was sent."""
+        self.raw_requestline = self.rfile.readline(65537)
+        return self.parse_request()
+
+    def dispatch(self):
+        method = getattr(self, 'do_' + self.command, None)
+        if method is None:
+            self.send_error(501, f"Unsupported method ({self.command!r})")
+            return
+        method()
+
+    def handle(self):
+        """Serve the request; returns whether the connection should be closed."""
+        if self.parse():
+            self.dispatch()
+        return self.close_connection
+
+
+class TransportWriter:
+    """File-like writer used from a handler thread; waits until the loop has flushed each write."""
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+
+    def write(self, data):
+        asyncio.run_coroutine_threadsafe(self._write(bytes(data)), self.loop).result()
+        return len(data)
+
+    async def _write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def flush(self):
+        pass
+
+
+def make_adapter_class(handler_class):
+    return type(f"Async{handler_class.__name__}", (AsyncRequestAdapter, handler_class), {})
+
+
+def content_length(head):
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length':
+            return int(value.strip() or 0)
+    return 0
+
+
+class AsyncHTTPServer:
+    """
+    asyncio engine with the same surface as HTTPServer (serve_forever, shutdown,
+    server_close). Connections are coroutines, so idle keep-alive clients cost no
+    thread; each parsed request is handled on a thread pool, which is where
+    bcrypt, JWT and JSON work happen.
+    """
+
+    def __init__(self, server_address, handler_class, workers=8, backlog=128, keep_alive=5.0):
+        self.socket = socket.create_server(server_address, backlog=backlog)
+        self.server_address = self.socket.getsockname()
+        self.adapter_class = make_adapter_class(handler_class)
+        self.keep_alive = keep_alive
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='handler')
+        self._loop = None
+        self._stopped = None
+
+    def serve_forever(self):
+        asyncio.run(self._serve())
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        server = await asyncio.start_server(self._handle_connection, sock=self.socket, limit=MAX_HEADER_BYTES)
+        async with server:
+            await self._stopped.wait()
+
+    def shutdown(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def server_close(self):
+        self.socket.close()
+        self.executor.shutdown(wait=True)
+
+    async def _handle_connection(self, reader, writer):
+        client_address = writer.get_extra_info('peername')
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=self.keep_alive)
+                    length = content_length(head)
+                    body = await reader.readexactly(length) if length else b''
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+                    break
+
+                wfile = TransportWriter(loop, writer)
+                try:
+                    close = await loop.run_in_executor(
+                        self.executor, self._handle_request, head + body, client_address, wfile)
+                except Exception:
+                    traceback.print_exc()
+                    break
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _handle_request(self, data, client_address, wfile):
+        return self.adapter_class(data, client_address, self, wfile).handle()
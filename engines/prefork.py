@@ -0,0 +1,144 @@
+import functools
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from multiprocessing.managers import BaseManager
+
+import database
+import snapshot
+from api.models.transaction import Transaction
+from api.models.user import User
+from engines.threadpool import PooledHTTPServer
+
+# Everything that reads or writes the data in database.py. In pre-fork mode the
+# store process runs these and the workers call them over IPC.
+SHARED_OPERATIONS = [
+    (User, 'get_by_email'),
+    (User, 'get_by_id'),
+    (User, 'create'),
+    (User, 'set_password'),
+    (Transaction, 'create'),
+    (Transaction, 'create_batch'),
+    (Transaction, 'get_all'),
+    (Transaction, 'query'),
+    (Transaction, 'get_by_id'),
+    (Transaction, 'get_by_id_indexed'),
+    (Transaction, 'get_by_user'),
+    (Transaction, 'update'),
+    (Transaction, 'delete'),
+    (Transaction, 'version'),
+    (database, 'get_user'),
+    (database, 'block_token'),
+    (database, 'is_token_blocked'),
+    (snapshot, 'stop_active'),
+]
+
+
+def operation_name(owner, attr):
+    return f"{owner.__name__}.{attr}"
+
+
+class SharedStore:
+    """Owns users, transactions and blocked tokens on behalf of every worker."""
+
+    def __init__(self):
+        self.operations = {operation_name(owner, attr): getattr(owner, attr) for owner, attr in SHARED_OPERATIONS}
+
+    def call(self, operation, /, *args, **kwargs):
+        # Positional-only, so an operation's own `name` keyword (User.create) passes through
+        return self.operations[operation](*args, **kwargs)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = SharedStore()
+    return _store
+
+
+class StoreManager(BaseManager):
+    pass
+
+
+StoreManager.register('store', callable=get_store)
+
+
+def bind_to_store(store):
+    """Point the models and database helpers of this process at the shared store."""
+    for owner, attr in SHARED_OPERATIONS:
+        remote = functools.partial(store.call, operation_name(owner, attr))
+        setattr(owner, attr, staticmethod(remote) if isinstance(owner, type) else remote)
+
+
+def serve_worker(listen_socket, handler_class, store_address, authkey, options):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    manager = StoreManager(address=store_address, authkey=authkey)
+    manager.connect()
+    bind_to_store(manager.store())
+
+    httpd = PooledHTTPServer(listen_socket.getsockname(), handler_class, bind_and_activate=False, **options)
+    httpd.socket.close()
+    httpd.socket = listen_socket
+    httpd.serve_forever()
+
+
+class PreforkServer:
+    """
+    Pre-fork engine: N worker processes accept on one listening socket, each
+    serving with its own thread pool, so bcrypt and JSON work spread over cores.
+    Users, transactions and blocked tokens live in a single store process that
+    every worker talks to, so they all see the same data and a logout on one
+    worker is seen by all of them. A `snapshotter` runs in the store process,
+    since that is where the data lives, and is stopped there on close.
+    """
+
+    def __init__(self, server_address, handler_class, processes=None, workers=8, queue_size=64,
+                 backlog=128, keep_alive=5.0, snapshotter=None):
+        self.socket = socket.create_server(server_address, backlog=backlog)
+        # Workers race for each connection; losers get EAGAIN instead of blocking in accept()
+        self.socket.setblocking(False)
+        self.server_address = self.socket.getsockname()
+        self.handler_class = handler_class
+        self.processes = processes or os.cpu_count() or 1
+        self.worker_options = {'workers': workers, 'queue_size': queue_size, 'keep_alive': keep_alive}
+        self._context = multiprocessing.get_context('fork')
+        self._stopped = threading.Event()
+        self._workers = []
+        self.authkey = os.urandom(16)
+        self.manager = None
+        self.snapshotter = snapshotter
+
+    def serve_forever(self):
+        # Forked after the seed data is loaded, so the store process starts with it
+        self.manager = StoreManager(authkey=self.authkey, ctx=self._context)
+        self.manager.start(initializer=self.snapshotter.start if self.snapshotter else None)
+
+        for _ in range(self.processes):
+            worker = self._context.Process(
+                target=serve_worker,
+                args=(self.socket, self.handler_class, self.manager.address, self.authkey, self.worker_options),
+                daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+        self._stopped.wait()
+
+    def shutdown(self):
+        self._stopped.set()
+
+    def server_close(self):
+        for worker in self._workers:
+            worker.terminate()
+        for worker in self._workers:
+            worker.join()
+        if self.manager is not None:
+            if self.snapshotter is not None:
+                self.manager.store().call(operation_name(snapshot, 'stop_active'))
+            self.manager.shutdown()
+        self.socket.close()
@@ -0,0 +1,75 @@
+import queue
+import threading
+from http.server import HTTPServer
+
+REJECTED_BODY = b'{"message": "Server is overloaded"}'
+REJECTED_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: " + str(len(REJECTED_BODY)).encode('ascii') + b"\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n"
+    b"\r\n" + REJECTED_BODY
+)
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer that hands accepted connections to a fixed pool of worker threads.
+    Connections wait in a bounded queue; when the queue is full the connection
+    is answered with 503 straight away instead of piling up.
+    Keep-alive is enabled by serving HTTP/1.1 with an idle timeout per connection.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class, workers=8, queue_size=64,
+                 backlog=128, keep_alive=5.0, bind_and_activate=True):
+        # listen() backlog, read by server_activate()
+        self.request_queue_size = backlog
+        handler_class = type(handler_class.__name__, (handler_class,), {
+            'protocol_version': 'HTTP/1.1',
+            'timeout': keep_alive,
+        })
+        super().__init__(server_address, handler_class, bind_and_activate)
+
+        self.workers = workers
+        self._requests = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._serve_worker, name=f"worker-{i}", daemon=self.daemon_threads)
+            thread.start()
+            self._threads.append(thread)
+
+    def process_request(self, request, client_address):
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            self._reject(request)
+
+    def _reject(self, request):
+        try:
+            request.sendall(REJECTED_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _serve_worker(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._threads:
+            self._requests.put(None)
+        for thread in self._threads:
+            thread.join()
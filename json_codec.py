@@ -0,0 +1,78 @@
+import json
+
+from dsa.fragment_cache import FragmentCache
+from dsa.transaction_record import TransactionRecord, UserView
+
+try:
+    import orjson
+except ImportError:  # optional: the standard library is used without it
+    orjson = None
+
+
+def json_default(value):
+    """Lets the encoders serialise stored records such as TransactionRecord"""
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def stdlib_dumps(data):
+    return json.dumps(data, default=json_default, separators=(',', ':')).encode('utf-8')
+
+
+def orjson_dumps(data):
+    return orjson.dumps(data, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+# name -> (dumps to bytes, loads from bytes or str); both write compact JSON
+BACKENDS = {'json': (stdlib_dumps, json.loads)}
+if orjson is not None:
+    BACKENDS['orjson'] = (orjson_dumps, orjson.loads)
+
+# The fastest backend installed, unless use_backend() picks another
+backend = 'orjson' if 'orjson' in BACKENDS else 'json'
+_dumps, _loads = BACKENDS[backend]
+
+
+def dumps(data):
+    return _dumps(data)
+
+
+def loads(data):
+    """Parse JSON; malformed input raises a ValueError (json.JSONDecodeError) whatever the backend"""
+    return _loads(data)
+
+
+fragments = FragmentCache(dumps)
+
+
+def is_record(data):
+    """Whether `data` is encoded through `fragments`: a stored record, or a UserView of one"""
+    return isinstance(data, TransactionRecord) or (isinstance(data, UserView)
+                                                   and isinstance(data.record, TransactionRecord))
+
+
+def use_backend(name):
+    """Encode and decode with backend `name` from now on and return the previous backend's name"""
+    global backend, _dumps, _loads
+    previous = backend
+    backend = name
+    _dumps, _loads = BACKENDS[name]
+    fragments.clear()
+    return previous
+
+
+def encode(data):
+    """
+    `data` as JSON bytes. Transaction records (or UserViews of them), on their
+    own or as the items of a list, are served from `fragments`.
+    """
+    if is_record(data):
+        return fragments.get(data)
+    if isinstance(data, list) and data and is_record(data[0]):
+        return b'[' + b','.join(fragments.get(item) if is_record(item) else _dumps(item) for item in data) + b']'
+    return _dumps(data)
+
+
+def stats():
+    return {'backend': backend, 'fragments': fragments.stats()}
@@ -0,0 +1,197 @@
+import argparse
+import math
+import multiprocessing
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import utils
+from dsa.latency_histogram import LatencyHistogram
+
+OPERATIONS = ('hash', 'check')
+# Costs bcrypt accepts
+MIN_ROUNDS, MAX_ROUNDS = 4, 31
+
+
+class PoolBusy(Exception):
+    """Raised instead of queueing when the pool already has as much work as it accepts"""
+
+    def __init__(self, retry_after):
+        super().__init__("Password hashing pool is full")
+        self.retry_after = retry_after
+
+
+class PasswordPool:
+    """
+    Runs bcrypt off the request threads, in worker processes so hashes really
+    run in parallel and a burst of logins can't hold the GIL away from other
+    requests. At most `processes + queue_size` operations are admitted at once;
+    past that hash() and check() raise PoolBusy straight away rather than queue.
+    `processes` 0 runs bcrypt on the calling thread, still admission-controlled,
+    which suits the pre-fork engine where every worker is its own process.
+    New hashes use cost `rounds`; checks use whatever cost the hash was made with.
+    """
+
+    def __init__(self, processes=None, queue_size=32, rounds=12):
+        self.processes = os.cpu_count() if processes is None else processes
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self.histograms = {operation: LatencyHistogram() for operation in OPERATIONS}
+        self.rejected = 0
+        self.rehashed = 0
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max(self.processes + self.queue_size, 1))
+        self._pending = 0
+
+    def _check_pid(self):
+        # A forked child can't use the parent's worker processes; it starts its own
+        if self._pid != os.getpid():
+            self._reset()
+
+    def start(self):
+        """Start the worker processes now rather than on the first request"""
+        self._check_pid()
+        with self._lock:
+            if self._executor is None and self.processes:
+                # spawn, not fork: the server has threads running and a forked
+                # worker could inherit a lock one of them held
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def hash(self, password):
+        return self._run('hash', utils.hash_password, password, self.rounds)
+
+    def check(self, password, hashed_password):
+        return self._run('check', utils.check_password, password, hashed_password)
+
+    def rehash_later(self, password, hashed_password, save):
+        """
+        If `hashed_password` was made with a cost other than `rounds`, hash
+        `password` again at `rounds` on a background thread and pass the new hash
+        to `save`, which returns whether it was stored. Skipped while the pool is
+        busy, since the next login tries again. Returns the thread, or None.
+        """
+        if utils.password_rounds(hashed_password) == self.rounds or not self._admit():
+            return None
+        thread = threading.Thread(target=self._rehash, args=(password, save), name="rehash", daemon=True)
+        thread.start()
+        return thread
+
+    def _rehash(self, password, save):
+        if save(self._execute('hash', utils.hash_password, password, self.rounds)):
+            with self._lock:
+                self.rehashed += 1
+
+    def _run(self, operation, func, *args):
+        if not self._admit():
+            with self._lock:
+                self.rejected += 1
+            raise PoolBusy(self.retry_after())
+        return self._execute(operation, func, *args)
+
+    def _admit(self):
+        """Take a slot for one operation, False when there is none"""
+        self._check_pid()
+        if not self._slots.acquire(blocking=False):
+            return False
+        with self._lock:
+            self._pending += 1
+        return True
+
+    def _execute(self, operation, func, *args):
+        """Run an admitted operation and give its slot back"""
+        start = time.perf_counter()
+        try:
+            executor = self.start()
+            if executor is None:
+                return func(*args)
+            return executor.submit(func, *args).result()
+        finally:
+            self.histograms[operation].observe(time.perf_counter() - start)
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def retry_after(self):
+        """Seconds until the admitted work should have drained, at least 1"""
+        durations = [histogram.mean() for histogram in self.histograms.values() if histogram.count]
+        per_operation = max(durations) if durations else 0.0
+        return max(1, math.ceil(per_operation * self._pending / max(self.processes, 1)))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+    def stats(self):
+        stats = {
+            'processes': self.processes,
+            'queue_size': self.queue_size,
+            'rounds': self.rounds,
+            'pending': self._pending,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed,
+        }
+        for operation, histogram in self.histograms.items():
+            stats[operation] = histogram.stats()
+        return stats
+
+
+def time_hash(rounds, samples=3):
+    """Median seconds to hash a password at cost `rounds` on this host"""
+    durations = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        utils.hash_password("calibration password", rounds)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def calibrate(budget_ms, min_rounds=MIN_ROUNDS, max_rounds=MAX_ROUNDS, samples=3):
+    """
+    The highest bcrypt cost whose hash takes at most `budget_ms` on this host,
+    or `min_rounds` if none does, with the milliseconds measured per cost. Each
+    cost doubles the work, so measuring stops at the first one over budget.
+    """
+    timings = {}
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        timings[rounds] = time_hash(rounds, samples) * 1000
+        if timings[rounds] > budget_ms:
+            break
+        chosen = rounds
+    return chosen, timings
+
+
+# The pool the auth handlers use; server.run() replaces it with the configured one
+pool = PasswordPool(processes=0)
+
+
+def use_pool(new_pool):
+    """Make `new_pool` the pool the handlers use and return the previous one"""
+    global pool
+    previous, pool = pool, new_pool
+    return previous
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Pick the bcrypt cost for --bcrypt-rounds: the highest one that hashes within the budget here")
+    parser.add_argument('--budget-ms', type=float, default=250.0, help="longest acceptable time for one hash")
+    parser.add_argument('--max-rounds', type=int, default=16)
+    parser.add_argument('--samples', type=int, default=3, help="hashes timed per cost, the median is used")
+    args = parser.parse_args()
+
+    rounds, timings = calibrate(args.budget_ms, max_rounds=args.max_rounds, samples=args.samples)
+    print(f"{'rounds':>6} {'ms/hash':>9}")
+    for cost, milliseconds in timings.items():
+        print(f"{cost:>6} {milliseconds:>9.1f}")
+    print(f"Use --bcrypt-rounds {rounds} for hashes within {args.budget_ms:g} ms")
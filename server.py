@@ -1,13 +1,17 @@
 from http.server import HTTPServer, BaseHTTPRequestHandler
+import argparse
 import sys
 import os
 
 # Ensure we import from the current directory
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from api.router import Router
 from api.handlers.auth import handle_register, handle_login, handle_logout
+from api.handlers.metrics import handle_get_metrics
 from api.handlers.transactions import (
     handle_add_transaction, 
+    handle_add_transaction_batch,
     handle_get_transactions,
     handle_get_transaction_by_id,
     handle_get_transaction_by_id_indexed,
@@ -16,72 +20,186 @@ from api.handlers.transactions import (
     handle_delete_transaction
 )
 from dsa.xml_parser import parse_xml_file
+from utils import json_response
+import database
+import json_codec
+import password_pool
+import snapshot
+import wal
+from storage.base import BACKENDS
+from engines.threadpool import PooledHTTPServer
+from engines.asyncio_engine import AsyncHTTPServer
+from engines.prefork import PreforkServer
 
-def parse_transaction_path(path):
-    """Extract route type and ID from path like /transactions/123 or /indexed_transactions/123"""
-    parts = path.strip('/').split('/')
-    if len(parts) == 2:
-        route_type = parts[0]
-        if route_type in ['transactions', 'indexed_transactions']:
-            try:
-                return route_type, int(parts[1])
-            except ValueError:
-                return route_type, None
-    return None, None
+# Every endpoint; paths match with or without a trailing slash and query string
+routes = Router()
+routes.add('POST', '/auth/register', handle_register)
+routes.add('POST', '/auth/login', handle_login)
+routes.add('POST', '/auth/logout', handle_logout)
+routes.add('GET', '/transactions/', handle_get_transactions)
+routes.add('POST', '/transactions/', handle_add_transaction)
+routes.add('POST', '/transactions/batch', handle_add_transaction_batch)
+routes.add('GET', '/transactions/me', handle_get_my_transactions)
+routes.add('GET', '/transactions/{transaction_id:int}', handle_get_transaction_by_id)
+routes.add('PUT', '/transactions/{transaction_id:int}', handle_update_transaction)
+routes.add('DELETE', '/transactions/{transaction_id:int}', handle_delete_transaction)
+routes.add('GET', '/indexed_transactions/{transaction_id:int}', handle_get_transaction_by_id_indexed)
+routes.add('GET', '/metrics', handle_get_metrics)
 
 class APIRRequestHandler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        if self.path == '/auth/register':
-            handle_register(self)
-        elif self.path == '/auth/login':
-            handle_login(self)
-        elif self.path == '/auth/logout':
-            handle_logout(self)
-        elif self.path == '/transactions/':
-            handle_add_transaction(self)
-        else:
-            self.send_error(404, "Not Found")
+    router = routes
 
-    def do_GET(self):
-        if self.path == '/transactions/':
-            handle_get_transactions(self)
-        elif self.path == '/transactions/me':
-            handle_get_my_transactions(self)
-        else:
-            route_type, txn_id = parse_transaction_path(self.path)
-            if txn_id is not None:
-                if route_type == 'transactions':
-                    handle_get_transaction_by_id(self, txn_id)
-                elif route_type == 'indexed_transactions':
-                    handle_get_transaction_by_id_indexed(self, txn_id)
-            else:
-                self.send_error(404, "Not Found")
+    def dispatch(self):
+        handlers, params = self.router.match(self.path)
+        if handlers is None:
+            return self.send_error(404, "Not Found")
+        handler_func = handlers.get(self.command)
+        if handler_func is None:
+            return json_response(self, 405, {"message": "Method Not Allowed"},
+                                 headers={'Allow': ', '.join(sorted(handlers))})
+        handler_func(self, **params)
 
-    def do_PUT(self):
-        route_type, txn_id = parse_transaction_path(self.path)
-        if txn_id is not None and route_type == 'transactions':
-            handle_update_transaction(self, txn_id)
-        else:
-            self.send_error(404, "Not Found")
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = dispatch
+
+def load_data(snapshot_path=None, wal_path=None):
+    """
+    Warm start from the snapshot when there is a valid one, otherwise seed from
+    XML, then replay the changes logged in the WAL since. A store that already
+    holds data (a SQLite database from an earlier run) is used as it is.
+    """
+    if snapshot_path and snapshot.load(snapshot_path):
+        print(f"Loaded {database.store.user_count()} users and {database.store.transaction_count()} transactions "
+              f"from {snapshot_path}")
+    elif database.store.transaction_count():
+        print(f"Using {database.store.user_count()} users and {database.store.transaction_count()} transactions "
+              f"from the {database.store.name} store")
+    else:
+        # Load seed data from XML
+        xml_file = os.path.join(os.path.dirname(__file__), 'dsa', 'modified_sms_v2.xml')
+        if os.path.exists(xml_file):
+            count = parse_xml_file(xml_file)
+            print(f"Loaded {count} seed transactions from xml file")
 
-    def do_DELETE(self):
-        route_type, txn_id = parse_transaction_path(self.path)
-        if txn_id is not None and route_type == 'transactions':
-            handle_delete_transaction(self, txn_id)
+    if wal_path:
+        try:
+            replayed = wal.recover(wal_path)
+        except wal.LogMismatch as e:
+            print(f"Not replaying {wal_path}: {e}")
         else:
-            self.send_error(404, "Not Found")
+            if replayed:
+                print(f"Replayed {replayed} changes from {wal_path}")
+
+def run(server_class=PooledHTTPServer, handler_class=APIRRequestHandler, port=5000,
+        storage_backend='memory', database_path=None,
+        snapshot_path=None, snapshot_interval=None, wal_path=None, fsync='group', fsync_interval=0.05,
+        hash_processes=None, hash_queue_size=32, bcrypt_rounds=12, bcrypt_budget_ms=None, json_backend=None,
+        **server_options):
+    if json_backend:
+        json_codec.use_backend(json_backend)
+    if storage_backend != 'memory':
+        # Snapshots and the WAL are for the in-memory store; SQLite keeps its own file and journal
+        database.use_store(database.open_store(storage_backend, database_path))
+        snapshot_path = wal_path = None
+    # The WAL only holds changes since the last snapshot, so it needs snapshots
+    wal_path = wal_path if snapshot_path else None
+    load_data(snapshot_path, wal_path)
+    snapshotter = None
+    if snapshot_path:
+        snapshotter = snapshot.Snapshotter(snapshot_path, snapshot_interval, wal_path=wal_path,
+                                           fsync=fsync, fsync_interval=fsync_interval)
+    if snapshotter and server_class is PreforkServer:
+        # The data lives in the store process, which takes the snapshots
+        server_options['snapshotter'] = snapshotter
+        snapshotter = None
+
+    if hash_processes is None and server_class is PreforkServer:
+        # Every pre-fork worker is already a process of its own, so bcrypt runs in the workers
+        hash_processes = 0
+    if bcrypt_budget_ms:
+        bcrypt_rounds, _ = password_pool.calibrate(bcrypt_budget_ms)
+        print(f"bcrypt cost {bcrypt_rounds} hashes within {bcrypt_budget_ms:g} ms here")
+    hashing = password_pool.PasswordPool(hash_processes, hash_queue_size, bcrypt_rounds)
+    password_pool.use_pool(hashing)
+    hashing.start()
 
-def run(server_class=HTTPServer, handler_class=APIRRequestHandler, port=5000):
-    # Load seed data from XML
-    xml_file = os.path.join(os.path.dirname(__file__), 'dsa', 'modified_sms_v2.xml')
-    if os.path.exists(xml_file):
-        count = parse_xml_file(xml_file)
-        print(f"Loaded {count} seed transactions from xml file")
-    
     server_address = ('', port)
-    httpd = server_class(server_address, handler_class)
+    httpd = server_class(server_address, handler_class, **server_options)
     print(f"Starting server on port {port}...")
-    httpd.serve_forever()
+    if snapshotter:
+        snapshotter.start()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        if snapshotter:
+            snapshotter.stop()
+        hashing.close()
+        database.store.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Momo REST API server")
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--engine', choices=['single', 'threadpool', 'asyncio', 'prefork'], default='threadpool',
+                        help="single: one request at a time, threadpool: bounded pool of worker threads, "
+                             "asyncio: event loop for connections, thread pool for handlers, "
+                             "prefork: worker processes sharing one socket and one data store")
+    parser.add_argument('--workers', type=int, default=8, help="worker threads (per process with prefork)")
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help="worker processes (prefork engine)")
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help="accepted connections waiting for a worker before new ones get 503")
+    parser.add_argument('--backlog', type=int, default=128, help="listen() backlog")
+    parser.add_argument('--keep-alive', type=float, default=5.0,
+                        help="seconds an idle keep-alive connection may hold a worker")
+    parser.add_argument('--storage', choices=BACKENDS, default='memory',
+                        help="memory: dicts in this process, with snapshots and a WAL; "
+                             "sqlite: the --database file, for data that doesn't fit in memory")
+    parser.add_argument('--database', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'momo.db'),
+                        help="SQLite database file used with --storage sqlite")
+    parser.add_argument('--snapshot', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'momo.snapshot'),
+                        help="snapshot file loaded at startup and written on shutdown")
+    parser.add_argument('--no-snapshot', dest='snapshot', action='store_const', const=None,
+                        help="always seed from the XML file and never write a snapshot")
+    parser.add_argument('--snapshot-interval', type=float, default=300.0,
+                        help="seconds between background snapshots, 0 to only snapshot on shutdown")
+    parser.add_argument('--wal', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'momo.wal'),
+                        help="write-ahead log of changes since the last snapshot, replayed at startup")
+    parser.add_argument('--no-wal', dest='wal', action='store_const', const=None,
+                        help="don't log changes; anything after the last snapshot is lost on a crash")
+    parser.add_argument('--fsync', choices=wal.FSYNC_POLICIES, default='group',
+                        help="always: fsync every change, group: changes waiting together share one fsync, "
+                             "interval: fsync every --fsync-interval seconds, off: leave it to the OS")
+    parser.add_argument('--fsync-interval', type=float, default=0.05)
+    parser.add_argument('--hash-processes', type=int, default=None,
+                        help="processes that run bcrypt for register and login, 0 to run it on the request thread; "
+                             "defaults to one per CPU, or 0 with prefork")
+    parser.add_argument('--hash-queue-size', type=int, default=32,
+                        help="bcrypt operations waiting for a process before new ones get 503")
+    parser.add_argument('--bcrypt-rounds', type=int, default=12,
+                        help="bcrypt cost of new hashes; stored hashes of another cost are redone on login")
+    parser.add_argument('--bcrypt-budget-ms', type=float, default=None,
+                        help="instead of --bcrypt-rounds, use the highest cost that hashes within this many ms here")
+    parser.add_argument('--json-backend', choices=list(json_codec.BACKENDS), default=json_codec.backend,
+                        help="JSON encoder/decoder; defaults to the fastest one installed")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    run()
+    args = parse_args()
+    options = {'storage_backend': args.storage, 'database_path': args.database,
+               'snapshot_path': args.snapshot, 'snapshot_interval': args.snapshot_interval,
+               'wal_path': args.wal, 'fsync': args.fsync, 'fsync_interval': args.fsync_interval,
+               'hash_processes': args.hash_processes, 'hash_queue_size': args.hash_queue_size,
+               'bcrypt_rounds': args.bcrypt_rounds, 'bcrypt_budget_ms': args.bcrypt_budget_ms,
+               'json_backend': args.json_backend}
+    if args.engine == 'single':
+        run(HTTPServer, port=args.port, **options)
+    elif args.engine == 'prefork':
+        run(PreforkServer, port=args.port, processes=args.processes, workers=args.workers,
+            queue_size=args.queue_size, backlog=args.backlog, keep_alive=args.keep_alive, **options)
+    elif args.engine == 'asyncio':
+        run(AsyncHTTPServer, port=args.port, workers=args.workers, backlog=args.backlog, keep_alive=args.keep_alive,
+            **options)
+    else:
+        run(PooledHTTPServer, port=args.port, workers=args.workers, queue_size=args.queue_size,
+            backlog=args.backlog, keep_alive=args.keep_alive, **options)
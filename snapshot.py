@@ -0,0 +1,201 @@
+import mmap
+import os
+import pickle
+import struct
+import threading
+import traceback
+import zlib
+
+import database
+import wal
+
+# Everything in database.py that makes up the store: data, indexes and counters
+STATE = [
+    'users',
+    'users_by_email',
+    'transactions',
+    'transactions_by_sender',
+    'transactions_by_receiver',
+    'transaction_sequence',
+    'transactions_by_sequence',
+    'transactions_by_type',
+    'transactions_by_amount',
+    'transactions_by_created_at',
+    'user_id_counter',
+    'transaction_ids',
+    'revoked_tokens',
+    'applied_lsn',
+]
+
+MAGIC = b'MOMOSNAP'
+VERSION = 4
+# magic, format version, payload length, CRC-32 of the payload
+HEADER = struct.Struct('<8sHQI')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+# One save at a time, so WAL compaction follows the snapshot it belongs to
+_save_lock = threading.Lock()
+
+
+def dump_state():
+    """
+    Pickle the store. Run it where nothing changes the store meanwhile: under
+    database.lock, or in the forked child of write_snapshot(), whose copy of
+    the store no other thread touches.
+    """
+    state = {name: getattr(database, name) for name in STATE}
+    return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def save(path):
+    """
+    Write a snapshot of the store to `path`. The file is written next to the
+    target, flushed to disk and renamed over it, so a crash mid-write leaves the
+    previous snapshot intact. Once it is on disk the WAL entries it covers are
+    dropped. Returns the number of bytes written.
+    """
+    with _save_lock:
+        return write_snapshot(path)
+
+
+def write_file(path, payload):
+    header = HEADER.pack(MAGIC, VERSION, len(payload), zlib.crc32(payload))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    return HEADER.size + len(payload)
+
+
+def write_snapshot(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+
+    # Where fork() is available the lock is only held while forking: the child
+    # gets a copy-on-write image of the store as of the WAL position, and
+    # pickles and writes it while transfers and reads go on in this process.
+    with database.lock:
+        wal_position = database.wal.position() if database.wal is not None else None
+        if not hasattr(os, 'fork'):
+            size = write_file(temp_path, dump_state())
+        else:
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    write_file(temp_path, dump_state())
+                    status = 0
+                except BaseException:
+                    traceback.print_exc()
+                finally:
+                    os._exit(status)
+    if hasattr(os, 'fork'):
+        _, status = os.waitpid(pid, 0)
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise SnapshotError(f"Writing {temp_path} failed")
+        size = os.path.getsize(temp_path)
+    os.replace(temp_path, path)
+
+    if wal_position is not None and database.wal is not None:
+        database.wal.compact(wal_position)
+    return size
+
+
+def read_state(path):
+    """Map the snapshot file, check its header and checksum and unpickle the state."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise SnapshotError("Snapshot is truncated")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, length, checksum = HEADER.unpack_from(mapped)
+            if magic != MAGIC:
+                raise SnapshotError("Not a snapshot file")
+            if version != VERSION:
+                raise SnapshotError(f"Unsupported snapshot version {version}")
+            if len(mapped) != HEADER.size + length:
+                raise SnapshotError("Snapshot is truncated")
+
+            with memoryview(mapped)[HEADER.size:] as payload:
+                if zlib.crc32(payload) != checksum:
+                    raise SnapshotError("Snapshot checksum does not match")
+                state = pickle.loads(payload)
+
+    missing = [name for name in STATE if name not in state]
+    if missing:
+        raise SnapshotError(f"Snapshot is missing {', '.join(missing)}")
+    return state
+
+
+def load(path):
+    """
+    Replace the store with the snapshot at `path`. Returns True when it was
+    loaded, False when there is no usable snapshot (missing or failing a check),
+    in which case the store is left untouched.
+    """
+    try:
+        state = read_state(path)
+    except FileNotFoundError:
+        return False
+    except (SnapshotError, pickle.UnpicklingError, EOFError, ValueError) as e:
+        print(f"Ignoring snapshot {path}: {e}")
+        return False
+
+    with database.lock:
+        for name in STATE:
+            setattr(database, name, state[name])
+    return True
+
+
+_active = None
+
+
+class Snapshotter:
+    """
+    Writes a snapshot every `interval` seconds (if set) from a background
+    thread, and a final one on stop(). With a `wal_path`, changes between
+    snapshots are logged there (see wal.py) from start() to stop().
+    start() and stop() run in the process that owns the data.
+    """
+
+    def __init__(self, path, interval=None, wal_path=None, fsync='group', fsync_interval=0.05):
+        self.path = path
+        self.interval = interval
+        self.wal_path = wal_path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        global _active
+        _active = self
+        if self.wal_path:
+            wal.attach(self.wal_path, fsync=self.fsync, interval=self.fsync_interval)
+        if self.interval:
+            self._thread = threading.Thread(target=self._run, name='snapshotter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            save(self.path)
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        save(self.path)
+        wal.detach()
+
+
+def stop_active():
+    """Stop the Snapshotter started in this process, if any"""
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
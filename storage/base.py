@@ -0,0 +1,173 @@
+import base64
+import json
+
+BACKENDS = ('memory', 'sqlite')
+
+
+def encode_cursor(order, entry):
+    """Opaque page cursor: the index the page was read from and its last entry"""
+    raw = json.dumps([order, *entry], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# order -> check of the key in that order's cursor entries
+CURSOR_KEYS = {
+    'ledger': is_int,
+    'amount': lambda key: is_int(key) or isinstance(key, float),
+    'created_at': lambda key: isinstance(key, str),
+}
+
+
+def decode_cursor(cursor, order):
+    """The cursor entry of encode_cursor(order, entry); ValueError unless it is one, of the right types"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_order, *entry = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_order != order or len(entry) != 3:
+        raise ValueError("Invalid cursor")
+    key, sequence, transaction_id = entry
+    if not (CURSOR_KEYS[order](key) and is_int(sequence) and is_int(transaction_id)):
+        raise ValueError("Invalid cursor")
+    return tuple(entry)
+
+
+def page_order(type=None, min_amount=None, max_amount=None, created_from=None, created_to=None):
+    """
+    Which order a page of transactions is read in: created_at when a created_at
+    range is given, amount when an amount range is given, ledger otherwise.
+    Cursor entries are (key, sequence, id), the key being the sequence for ledger order.
+    """
+    if created_from is not None or created_to is not None:
+        return 'created_at'
+    if min_amount is not None or max_amount is not None:
+        return 'amount'
+    return 'ledger'
+
+
+def plan_transfers(transfers, balance_of):
+    """
+    Check a batch of (sender id, receiver id, amount, type) transfers in one pass,
+    in order, each seeing the balances left by the ones before it; a failing
+    transfer changes nothing. `balance_of(user_id)` gives a starting balance, None
+    for no such user. Returns the error message (or None) for each transfer and
+    the resulting balance of every user involved.
+    """
+    balances, errors = {}, []
+    for sender_id, receiver_id, amount, _ in transfers:
+        for user_id in (sender_id, receiver_id):
+            if user_id not in balances:
+                balances[user_id] = balance_of(user_id)
+        if balances[sender_id] is None or balances[receiver_id] is None:
+            errors.append("Invalid sender or receiver")
+        elif balances[sender_id] < amount:
+            errors.append("Insufficient balance")
+        else:
+            balances[sender_id] -= amount
+            balances[receiver_id] += amount
+            errors.append(None)
+    return errors, balances
+
+
+def created_to_bound(created_to):
+    # created_to is inclusive, so '2024-05-10' covers the whole day
+    return None if created_to is None else created_to + '\uffff'
+
+
+class Store:
+    """
+    Where users, transactions and revoked tokens are kept. The models in
+    api/models call these methods and never touch the data directly, so a
+    backend can be swapped with `database.use_store`. Users are returned as
+    dicts and transactions as TransactionRecords, whatever the backend.
+    """
+
+    name = None
+
+    # Users
+
+    def get_user(self, user_id):
+        raise NotImplementedError
+
+    def get_user_by_email(self, email):
+        raise NotImplementedError
+
+    def create_user(self, name, email, password, role, balance):
+        """Returns the new user id, or None when the email is taken"""
+        raise NotImplementedError
+
+    def user_count(self):
+        raise NotImplementedError
+
+    def set_password(self, user_id, password, expected):
+        """Replace a user's password hash if it is still `expected`. Returns whether it was replaced."""
+        raise NotImplementedError
+
+    # Transactions
+
+    def transfer(self, sender_id, receiver_id, amount, transaction_type, created_at):
+        """Move `amount` between two users and record it. Returns (transaction id, error message)."""
+        raise NotImplementedError
+
+    def transfer_batch(self, transfers, created_at, atomic=True):
+        """
+        Make (sender id, receiver id, amount, type) transfers in order, as checked by
+        `plan_transfers`, in one commit. Returns a (transaction id, error message)
+        pair per transfer. With `atomic`, a batch where any transfer fails makes
+        none of them, and every id is None.
+        """
+        raise NotImplementedError
+
+    def get_transaction(self, transaction_id):
+        raise NotImplementedError
+
+    def all_transactions(self):
+        """Every transaction in ledger order"""
+        raise NotImplementedError
+
+    def transaction_count(self):
+        raise NotImplementedError
+
+    def query_transactions(self, limit, after=None, type=None, min_amount=None, max_amount=None,
+                           created_from=None, created_to=None):
+        """
+        Up to `limit` + 1 (transaction, cursor entry) pairs matching the filters,
+        in `page_order`, starting after the cursor entry `after`.
+        """
+        raise NotImplementedError
+
+    def transactions_for_party(self, user_id=None, name=None):
+        """Transactions sent or received by a user id or, for imported records, a name, in ledger order"""
+        raise NotImplementedError
+
+    def update_transaction_type(self, transaction_id, transaction_type):
+        """Returns the updated transaction, or None if there is no such transaction"""
+        raise NotImplementedError
+
+    def delete_transaction(self, transaction_id):
+        """Returns the deleted transaction, or None if there is no such transaction"""
+        raise NotImplementedError
+
+    def import_transactions(self, transactions):
+        """Store imported records; one with the id of an existing transaction replaces it"""
+        raise NotImplementedError
+
+    def set_next_transaction_id(self, transaction_id):
+        raise NotImplementedError
+
+    # Revoked tokens
+
+    def block_token(self, token_id, exp):
+        """Revoke a token id until `exp` (epoch seconds), when the token expires anyway"""
+        raise NotImplementedError
+
+    def is_token_blocked(self, token_id):
+        raise NotImplementedError
+
+    def close(self):
+        pass
@@ -0,0 +1,236 @@
+import database
+from dsa.transaction_record import TransactionRecord
+from storage.base import Store, created_to_bound, page_order, plan_transfers
+
+
+class MemoryStore(Store):
+    """
+    The in-memory store: the dicts and sorted indexes in database.py, guarded by
+    database.lock. Snapshots (snapshot.py) and the write-ahead log (wal.py)
+    work on this backend.
+    """
+
+    name = 'memory'
+
+    def get_user(self, user_id):
+        return database.users.get(user_id)
+
+    def get_user_by_email(self, email):
+        user_id = database.users_by_email.get(database.normalize_email(email))
+        if user_id is None:
+            return None
+        return database.users.get(user_id)
+
+    def create_user(self, name, email, password, role, balance):
+        email_key = database.normalize_email(email)
+        with database.lock:
+            if email_key in database.users_by_email:
+                return None
+
+            user_id = database.user_id_counter
+            database.user_id_counter += 1
+
+            user_data = {
+                'id': user_id,
+                'name': name,
+                'email': email,
+                'password': password,
+                'balance': balance,
+                'role': role
+            }
+
+            database.users[user_id] = user_data
+            database.users_by_email[email_key] = user_id
+            lsn = database.log_change('user', user_data)
+        database.wait_durable(lsn)
+        return user_id
+
+    def user_count(self):
+        return len(database.users)
+
+    def set_password(self, user_id, password, expected):
+        with database.lock:
+            user_data = database.users.get(user_id)
+            if user_data is None or user_data['password'] != expected:
+                return False
+            user_data['password'] = password
+            lsn = database.log_change('password', user_id, password)
+        database.wait_durable(lsn)
+        return True
+
+    def transfer(self, sender_id, receiver_id, amount, transaction_type, created_at):
+        sender = database.users.get(sender_id)
+        receiver = database.users.get(receiver_id)
+
+        if not sender or not receiver:
+            return None, "Invalid sender or receiver"
+
+        # Transfers between other accounts run meanwhile; only applying the
+        # change takes the store lock
+        with database.locked_accounts((sender_id, receiver_id)):
+            if sender['balance'] < amount:
+                return None, "Insufficient balance"
+
+            transaction = TransactionRecord(
+                id=database.transaction_ids.allocate(),
+                sender_id=sender_id,
+                receiver_id=receiver_id,
+                amount=amount,
+                type=transaction_type,
+                created_at=created_at
+            )
+            with database.lock:
+                database.add_transactions([transaction])
+                sender['balance'] -= amount
+                receiver['balance'] += amount
+                lsn = database.log_change('transfer', transaction.to_dict())
+
+        database.wait_durable(lsn)
+        return transaction.id, None
+
+    def transfer_batch(self, transfers, created_at, atomic=True):
+        def balance_of(user_id):
+            user = database.users.get(user_id)
+            return user['balance'] if user else None
+
+        user_ids = {user_id for sender_id, receiver_id, *_ in transfers for user_id in (sender_id, receiver_id)
+                    if user_id in database.users}
+        with database.locked_accounts(user_ids):
+            errors, balances = plan_transfers(transfers, balance_of)
+            if atomic and any(errors):
+                return [(None, error) for error in errors]
+
+            transaction_id = database.transaction_ids.allocate(errors.count(None))
+            results, made = [], []
+            for (sender_id, receiver_id, amount, transaction_type), error in zip(transfers, errors):
+                if error:
+                    results.append((None, error))
+                    continue
+                made.append(TransactionRecord(
+                    id=transaction_id,
+                    sender_id=sender_id,
+                    receiver_id=receiver_id,
+                    amount=amount,
+                    type=transaction_type,
+                    created_at=created_at
+                ))
+                results.append((transaction_id, None))
+                transaction_id += 1
+
+            lsn = 0
+            with database.lock:
+                database.add_transactions(made)
+                for user_id, balance in balances.items():
+                    if balance is not None:
+                        database.users[user_id]['balance'] = balance
+                for transaction in made:
+                    lsn = database.log_change('transfer', transaction.to_dict())
+
+        # One wait covers the whole batch
+        database.wait_durable(lsn)
+        return results
+
+    def get_transaction(self, transaction_id):
+        return database.transactions.get(transaction_id)
+
+    def all_transactions(self):
+        return list(database.transactions.values())
+
+    def transaction_count(self):
+        return len(database.transactions)
+
+    def query_transactions(self, limit, after=None, type=None, min_amount=None, max_amount=None,
+                           created_from=None, created_to=None):
+        order = page_order(type, min_amount, max_amount, created_from, created_to)
+        if order == 'created_at':
+            index = database.transactions_by_created_at
+            low, high = created_from, created_to_bound(created_to)
+        elif order == 'amount':
+            index = database.transactions_by_amount
+            low, high = min_amount, max_amount
+        elif type is not None:
+            index = database.transactions_by_type.get(type)
+            low = high = None
+        else:
+            index = database.transactions_by_sequence
+            low = high = None
+
+        if index is None:
+            return []
+
+        # The order's bounds drive the scan; the other filters are checked on each entry
+        def matches(transaction):
+            return ((type is None or transaction['type'] == type)
+                    and (min_amount is None or transaction['amount'] >= min_amount)
+                    and (max_amount is None or transaction['amount'] <= max_amount))
+
+        rows = []
+        with database.lock:
+            for entry in index.scan(low, high, after):
+                transaction = database.transactions[entry[2]]
+                if matches(transaction):
+                    rows.append((transaction, entry))
+                    if len(rows) > limit:
+                        break
+        return rows
+
+    def transactions_for_party(self, user_id=None, name=None):
+        matches = {}
+        with database.lock:
+            for key in (user_id, name):
+                if key is None:
+                    continue
+                matches.update(database.transactions_by_sender.get(key, {}))
+                matches.update(database.transactions_by_receiver.get(key, {}))
+            return [database.transactions[i] for i in sorted(matches, key=matches.get)]
+
+    def update_transaction_type(self, transaction_id, transaction_type):
+        with database.lock:
+            transaction = database.transactions.get(transaction_id)
+            if transaction is None:
+                return None
+
+            old_type = transaction['type']
+            transaction['type'] = transaction_type
+            if transaction_type != old_type:
+                database.reindex_type(transaction, old_type)
+                lsn = database.log_change('update', transaction_id, transaction_type)
+            else:
+                lsn = 0
+
+        database.wait_durable(lsn)
+        return transaction
+
+    def delete_transaction(self, transaction_id):
+        with database.lock:
+            transaction = database.transactions.pop(transaction_id, None)
+            if transaction is None:
+                return None
+
+            database.unindex_transaction(transaction)
+            lsn = database.log_change('delete', transaction_id)
+
+        database.wait_durable(lsn)
+        return transaction
+
+    def import_transactions(self, transactions):
+        with database.lock:
+            for transaction in transactions:
+                # A message imported twice replaces the earlier copy
+                previous = database.transactions.get(transaction.id)
+                if previous is not None:
+                    database.unindex_transaction(previous)
+                database.transactions[transaction.id] = transaction
+                database.index_transaction(transaction)
+
+    def set_next_transaction_id(self, transaction_id):
+        database.transaction_ids.reset(transaction_id)
+
+    def block_token(self, token_id, exp):
+        with database.lock:
+            database.revoked_tokens.revoke(token_id, exp)
+            lsn = database.log_change('revoke', token_id, exp)
+        database.wait_durable(lsn)
+
+    def is_token_blocked(self, token_id):
+        return database.revoked_tokens.is_revoked(token_id)
@@ -0,0 +1,400 @@
+import contextlib
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import database
+from dsa.bloom_filter import BloomFilter
+from dsa.transaction_record import TransactionRecord
+from storage.base import Store, created_to_bound, page_order, plan_transfers
+
+# Columns without a declared type keep values as given, so amounts and balances
+# come back as the int or float they were stored as
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    email_key TEXT NOT NULL UNIQUE,
+    password TEXT,
+    balance,
+    role TEXT
+);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    seq INTEGER PRIMARY KEY,
+    id INTEGER NOT NULL UNIQUE,
+    sender TEXT,
+    receiver TEXT,
+    sender_id INTEGER,
+    receiver_id INTEGER,
+    amount,
+    type TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_by_sender_id ON transactions (sender_id, seq);
+CREATE INDEX IF NOT EXISTS transactions_by_receiver_id ON transactions (receiver_id, seq);
+CREATE INDEX IF NOT EXISTS transactions_by_sender ON transactions (sender, seq);
+CREATE INDEX IF NOT EXISTS transactions_by_receiver ON transactions (receiver, seq);
+CREATE INDEX IF NOT EXISTS transactions_by_type ON transactions (type, seq);
+CREATE INDEX IF NOT EXISTS transactions_by_amount ON transactions (amount, seq);
+CREATE INDEX IF NOT EXISTS transactions_by_created_at ON transactions (created_at, seq);
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (token_id TEXT PRIMARY KEY, exp NOT NULL) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS revoked_tokens_by_exp ON revoked_tokens (exp);
+
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+INSERT OR IGNORE INTO counters VALUES ('transaction_id', 1);
+"""
+
+# Every statement is a constant, so each connection prepares it once and
+# reuses it from its statement cache. Statements with RETURNING are read with
+# fetchall(), which runs them to completion so their change is committed.
+USER_COLUMNS = "id, name, email, password, balance, role"
+TRANSACTION_COLUMNS = "seq, id, sender, receiver, sender_id, receiver_id, amount, type, created_at"
+
+SELECT_USER = f"SELECT {USER_COLUMNS} FROM users WHERE id = ?"
+SELECT_USER_BY_EMAIL = f"SELECT {USER_COLUMNS} FROM users WHERE email_key = ?"
+INSERT_USER = "INSERT OR IGNORE INTO users (name, email, email_key, password, balance, role) VALUES (?, ?, ?, ?, ?, ?)"
+COUNT_USERS = "SELECT count(*) FROM users"
+SET_PASSWORD = "UPDATE users SET password = ? WHERE id = ? AND password = ?"
+SELECT_BALANCE = "SELECT balance FROM users WHERE id = ?"
+ADD_TO_BALANCE = "UPDATE users SET balance = balance + ? WHERE id = ?"
+SET_BALANCE = "UPDATE users SET balance = ? WHERE id = ?"
+
+# Takes the next n ids and returns the first of them
+RESERVE_TRANSACTION_IDS = "UPDATE counters SET value = value + ? WHERE name = 'transaction_id' RETURNING value - ?"
+SET_NEXT_TRANSACTION_ID = "UPDATE counters SET value = ? WHERE name = 'transaction_id'"
+INSERT_TRANSACTION = ("INSERT INTO transactions (id, sender_id, receiver_id, amount, type, created_at) "
+                      "VALUES (?, ?, ?, ?, ?, ?)")
+IMPORT_TRANSACTION = ("INSERT OR REPLACE INTO transactions (id, sender, receiver, sender_id, receiver_id, amount, type, "
+                      "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+SELECT_TRANSACTION = f"SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE id = ?"
+SELECT_ALL_TRANSACTIONS = f"SELECT {TRANSACTION_COLUMNS} FROM transactions ORDER BY seq"
+COUNT_TRANSACTIONS = "SELECT count(*) FROM transactions"
+UPDATE_TRANSACTION_TYPE = f"UPDATE transactions SET type = ? WHERE id = ? RETURNING {TRANSACTION_COLUMNS}"
+DELETE_TRANSACTION = f"DELETE FROM transactions WHERE id = ? RETURNING {TRANSACTION_COLUMNS}"
+# One indexed lookup per branch of the OR, merged in ledger order
+SELECT_PARTY_TRANSACTIONS = (f"SELECT {TRANSACTION_COLUMNS} FROM transactions "
+                             "WHERE sender_id = ? OR receiver_id = ? OR sender = ? OR receiver = ? ORDER BY seq")
+
+REVOKE_TOKEN = ("INSERT INTO revoked_tokens VALUES (?, ?) "
+                "ON CONFLICT (token_id) DO UPDATE SET exp = max(exp, excluded.exp)")
+PURGE_REVOKED_TOKENS = "DELETE FROM revoked_tokens WHERE exp <= ?"
+SELECT_REVOKED_TOKEN_IDS = "SELECT token_id FROM revoked_tokens"
+SELECT_REVOKED_TOKEN = "SELECT 1 FROM revoked_tokens WHERE token_id = ? AND exp > ?"
+
+# Page queries: the column the page is ordered by, per page order
+ORDER_KEYS = {'ledger': 'seq', 'amount': 'amount', 'created_at': 'created_at'}
+
+
+def page_statement(order, after, type, min_amount, max_amount, low, high):
+    """
+    The SELECT for one page. Which conditions appear depends only on which
+    filters are set, so there are a few dozen distinct statements, each prepared
+    once per connection.
+    """
+    key = ORDER_KEYS[order]
+    conditions, params = [], []
+    if type is not None:
+        conditions.append("type = ?")
+        params.append(type)
+    if min_amount is not None:
+        conditions.append("amount >= ?")
+        params.append(min_amount)
+    if max_amount is not None:
+        conditions.append("amount <= ?")
+        params.append(max_amount)
+    if order == 'created_at':
+        if low is not None:
+            conditions.append("created_at >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("created_at <= ?")
+            params.append(high)
+    if after is not None:
+        if order == 'ledger':
+            conditions.append("seq > ?")
+            params.append(after[1])
+        else:
+            conditions.append(f"({key}, seq) > (?, ?)")
+            params.extend(after[:2])
+
+    where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+    order_by = "seq" if order == 'ledger' else f"{key}, seq"
+    return f"SELECT {TRANSACTION_COLUMNS} FROM transactions {where}ORDER BY {order_by} LIMIT ?", params
+
+
+def to_user(row):
+    if row is None:
+        return None
+    return dict(zip(('id', 'name', 'email', 'password', 'balance', 'role'), row))
+
+
+def to_transaction(row):
+    if row is None:
+        return None
+    seq, transaction_id, sender, receiver, sender_id, receiver_id, amount, transaction_type, created_at = row
+    transaction = TransactionRecord(id=transaction_id, amount=amount, type=transaction_type, created_at=created_at,
+                                    sender=sender, receiver=receiver, sender_id=sender_id, receiver_id=receiver_id)
+    transaction.sequence = seq
+    return transaction
+
+
+class ConnectionPool:
+    """
+    Up to `size` connections to one database file, opened on first use and
+    handed out one per caller. The pool belongs to the process that opened it:
+    after a fork the child drops the inherited connections and opens its own.
+    """
+
+    def __init__(self, path, size=8, timeout=30.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def open(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                     check_same_thread=False, cached_statements=256)
+        connection.execute("PRAGMA journal_mode = WAL")
+        # With WAL, NORMAL only risks the last commits on power loss, never corruption
+        connection.execute("PRAGMA synchronous = NORMAL")
+        return connection
+
+    def _check_pid(self):
+        # SQLite connections must not be used across a fork. The lock is replaced
+        # too, since another thread may have held it when the process forked.
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._idle = queue.LifoQueue()
+            self._opened = 0
+            self._pid = os.getpid()
+
+    @contextlib.contextmanager
+    def connection(self):
+        self._check_pid()
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._opened < self.size
+                if grow:
+                    self._opened += 1
+            if grow:
+                try:
+                    connection = self.open()
+                except BaseException:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                connection = self._idle.get()
+
+        pid = self._pid
+        try:
+            yield connection
+        finally:
+            if connection.in_transaction:
+                connection.rollback()
+            if pid == self._pid:
+                self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SqliteStore(Store):
+    """
+    SQLite backend: the data lives in a database file, so it can outgrow RAM and
+    survives restarts without snapshots. WAL journal mode lets reads run while a
+    transfer is being written. Every change is its own SQLite transaction; a
+    transfer takes the write lock up front (BEGIN IMMEDIATE) so its balance
+    check and updates can't interleave with another transfer's.
+
+    Revoked token ids are also added to a Bloom filter, so checking a token that
+    was never revoked (nearly every request) doesn't query the database. The
+    filter lives in this process, so a database file is served by one server.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path, pool_size=8):
+        self.path = path
+        self.pool = ConnectionPool(path, size=pool_size)
+        with self.pool.connection() as connection:
+            connection.executescript(SCHEMA)
+        self.revoked_lock = threading.Lock()
+        self.load_revoked_filter()
+
+    def load_revoked_filter(self):
+        """Drop expired revocations and rebuild the filter from the rest, with room to grow"""
+        with self.pool.connection() as connection:
+            connection.execute(PURGE_REVOKED_TOKENS, (time.time(),))
+            token_ids = [token_id for token_id, in connection.execute(SELECT_REVOKED_TOKEN_IDS)]
+        revoked_filter = BloomFilter(capacity=max(1024, 2 * len(token_ids)))
+        for token_id in token_ids:
+            revoked_filter.add(token_id)
+        self.revoked_filter = revoked_filter
+
+    @contextlib.contextmanager
+    def transaction(self):
+        with self.pool.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+            # The body may have rolled back already, to give up without an exception
+            if connection.in_transaction:
+                connection.execute("COMMIT")
+
+    def get_user(self, user_id):
+        with self.pool.connection() as connection:
+            return to_user(connection.execute(SELECT_USER, (user_id,)).fetchone())
+
+    def get_user_by_email(self, email):
+        with self.pool.connection() as connection:
+            return to_user(connection.execute(SELECT_USER_BY_EMAIL, (database.normalize_email(email),)).fetchone())
+
+    def create_user(self, name, email, password, role, balance):
+        with self.pool.connection() as connection:
+            cursor = connection.execute(INSERT_USER, (name, email, database.normalize_email(email), password,
+                                                      balance, role))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def user_count(self):
+        with self.pool.connection() as connection:
+            return connection.execute(COUNT_USERS).fetchone()[0]
+
+    def set_password(self, user_id, password, expected):
+        with self.pool.connection() as connection:
+            return connection.execute(SET_PASSWORD, (password, user_id, expected)).rowcount == 1
+
+    def transfer(self, sender_id, receiver_id, amount, transaction_type, created_at):
+        with self.transaction() as connection:
+            sender = connection.execute(SELECT_BALANCE, (sender_id,)).fetchone()
+            receiver = connection.execute(SELECT_BALANCE, (receiver_id,)).fetchone()
+
+            if not sender or not receiver:
+                connection.rollback()
+                return None, "Invalid sender or receiver"
+
+            if sender[0] < amount:
+                connection.rollback()
+                return None, "Insufficient balance"
+
+            connection.execute(ADD_TO_BALANCE, (-amount, sender_id))
+            connection.execute(ADD_TO_BALANCE, (amount, receiver_id))
+            [(transaction_id,)] = connection.execute(RESERVE_TRANSACTION_IDS, (1, 1)).fetchall()
+            connection.execute(INSERT_TRANSACTION, (transaction_id, sender_id, receiver_id, amount,
+                                                    transaction_type, created_at))
+        return transaction_id, None
+
+    def transfer_batch(self, transfers, created_at, atomic=True):
+        with self.transaction() as connection:
+            def balance_of(user_id):
+                row = connection.execute(SELECT_BALANCE, (user_id,)).fetchone()
+                return row[0] if row else None
+
+            errors, balances = plan_transfers(transfers, balance_of)
+            if atomic and any(errors):
+                connection.rollback()
+                return [(None, error) for error in errors]
+
+            connection.executemany(SET_BALANCE, [(balance, user_id) for user_id, balance in balances.items()
+                                                 if balance is not None])
+            count, first_id = errors.count(None), None
+            if count:
+                [(first_id,)] = connection.execute(RESERVE_TRANSACTION_IDS, (count, count)).fetchall()
+            transaction_ids = itertools.count(first_id)
+
+            results, rows = [], []
+            for (sender_id, receiver_id, amount, transaction_type), error in zip(transfers, errors):
+                if error:
+                    results.append((None, error))
+                    continue
+                transaction_id = next(transaction_ids)
+                rows.append((transaction_id, sender_id, receiver_id, amount, transaction_type, created_at))
+                results.append((transaction_id, None))
+            connection.executemany(INSERT_TRANSACTION, rows)
+        return results
+
+    def get_transaction(self, transaction_id):
+        with self.pool.connection() as connection:
+            return to_transaction(connection.execute(SELECT_TRANSACTION, (transaction_id,)).fetchone())
+
+    def all_transactions(self):
+        with self.pool.connection() as connection:
+            return [to_transaction(row) for row in connection.execute(SELECT_ALL_TRANSACTIONS)]
+
+    def transaction_count(self):
+        with self.pool.connection() as connection:
+            return connection.execute(COUNT_TRANSACTIONS).fetchone()[0]
+
+    def query_transactions(self, limit, after=None, type=None, min_amount=None, max_amount=None,
+                           created_from=None, created_to=None):
+        order = page_order(type, min_amount, max_amount, created_from, created_to)
+        sql, params = page_statement(order, after, type, min_amount, max_amount,
+                                     created_from, created_to_bound(created_to))
+        with self.pool.connection() as connection:
+            rows = connection.execute(sql, (*params, limit + 1)).fetchall()
+
+        page = []
+        for row in rows:
+            transaction = to_transaction(row)
+            key = transaction.sequence if order == 'ledger' else transaction[order]
+            page.append((transaction, (key, transaction.sequence, transaction.id)))
+        return page
+
+    def transactions_for_party(self, user_id=None, name=None):
+        with self.pool.connection() as connection:
+            rows = connection.execute(SELECT_PARTY_TRANSACTIONS, (user_id, user_id, name, name))
+            return [to_transaction(row) for row in rows]
+
+    def update_transaction_type(self, transaction_id, transaction_type):
+        with self.pool.connection() as connection:
+            rows = connection.execute(UPDATE_TRANSACTION_TYPE, (transaction_type, transaction_id)).fetchall()
+        return to_transaction(rows[0]) if rows else None
+
+    def delete_transaction(self, transaction_id):
+        with self.pool.connection() as connection:
+            rows = connection.execute(DELETE_TRANSACTION, (transaction_id,)).fetchall()
+        return to_transaction(rows[0]) if rows else None
+
+    def import_transactions(self, transactions):
+        with self.transaction() as connection:
+            connection.executemany(IMPORT_TRANSACTION, (
+                (t.id, t.sender, t.receiver, t.sender_id, t.receiver_id, t.amount, t.type, t.created_at)
+                for t in transactions))
+
+    def set_next_transaction_id(self, transaction_id):
+        with self.pool.connection() as connection:
+            connection.execute(SET_NEXT_TRANSACTION_ID, (transaction_id,))
+
+    def block_token(self, token_id, exp):
+        with self.revoked_lock:
+            # In the filter before the database, so a check never misses a stored revocation
+            self.revoked_filter.add(token_id)
+            with self.transaction() as connection:
+                connection.execute(PURGE_REVOKED_TOKENS, (time.time(),))
+                connection.execute(REVOKE_TOKEN, (token_id, exp))
+            # Expired ids stay in the filter until it fills up and is rebuilt
+            if self.revoked_filter.count > self.revoked_filter.capacity:
+                self.load_revoked_filter()
+
+    def is_token_blocked(self, token_id):
+        if token_id not in self.revoked_filter:
+            return False
+        with self.pool.connection() as connection:
+            return connection.execute(SELECT_REVOKED_TOKEN, (token_id, time.time())).fetchone() is not None
+
+    def close(self):
+        self.pool.close()
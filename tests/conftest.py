@@ -5,11 +5,20 @@ import io
 import sys
 import os
 
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret-key-for-the-momo-api-suite")
+
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import json_codec
+import utils  # reads JWT_SECRET_KEY, set above
+from dsa.id_allocator import IdAllocator
+from dsa.revocation_store import RevocationStore
+from dsa.sorted_index import SortedIndex
+
 
 class MockHandler:
-    def __init__(self, body=None, headers=None, user_id=None, user_role=None, user_name=None):
+    def __init__(self, body=None, headers=None, user_id=None, user_role=None, user_name=None, path="/"):
+        self.path = path
         self.rfile = io.BytesIO(json.dumps(body).encode(
             'utf-8')) if body else io.BytesIO(b"")
         self.headers = headers or {}
@@ -33,19 +42,80 @@ class MockHandler:
         return json.loads(self.wfile.getvalue().decode('utf-8'))
 
 
+def decode_chunked(payload):
+    body = b""
+    while True:
+        size, _, payload = payload.partition(b"\r\n")
+        size = int(size, 16)
+        if size == 0:
+            return body
+        body += payload[:size]
+        payload = payload[size + 2:]
+
+
+def build_async_handler(body=None, headers=None, user_id=None, user_role=None, user_name=None, path="/"):
+    """Same surface as MockHandler, backed by the asyncio engine's request adapter."""
+    from engines.asyncio_engine import make_adapter_class
+    from server import APIRRequestHandler
+
+    class AsyncMockHandler(make_adapter_class(APIRRequestHandler)):
+        status_code = None
+
+        def send_response(self, code, message=None):
+            self.status_code = code
+            self.response_headers = {}
+            super().send_response(code, message)
+
+        def send_header(self, keyword, value):
+            self.response_headers[keyword] = value
+            super().send_header(keyword, value)
+
+        def log_message(self, format, *args):
+            pass
+
+        def get_response_body(self):
+            _, _, payload = self.wfile.getvalue().partition(b"\r\n\r\n")
+            if self.response_headers.get('Transfer-Encoding') == 'chunked':
+                payload = decode_chunked(payload)
+            return json.loads(payload.decode('utf-8'))
+
+    payload = json.dumps(body).encode('utf-8') if body else b""
+    head = f"GET {path} HTTP/1.1\r\n" + "".join(f"{key}: {value}\r\n" for key, value in (headers or {}).items())
+    handler = AsyncMockHandler(head.encode('latin-1') + b"\r\n" + payload, ('127.0.0.1', 0), None)
+    handler.parse()
+    handler.user_id = user_id
+    handler.user_role = user_role
+    handler.user_name = user_name
+    return handler
+
+
 @pytest.fixture(autouse=True)
 def db_cleanup():
     database.users = {}
-    database.transactions = []
+    database.users_by_email = {}
+    database.transactions = {}
+    database.transactions_by_sender = {}
+    database.transactions_by_receiver = {}
+    database.transaction_sequence = 0
+    database.transactions_by_sequence = SortedIndex()
+    database.transactions_by_type = {}
+    database.transactions_by_amount = SortedIndex()
+    database.transactions_by_created_at = SortedIndex()
     database.user_id_counter = 1
-    database.transaction_id_counter = 1
-    database.blocked_tokens = set()
+    database.transaction_ids = IdAllocator()
+    database.revoked_tokens = RevocationStore()
+    database.wal = None
+    database.applied_lsn = 0
+    utils.token_cache.clear()
+    json_codec.fragments.clear()
     yield
 
 
-@pytest.fixture
-def mock_handler_factory():
-    def _create_handler(body=None, headers=None, user_id=None, user_role=None, user_name=None, token=None):
+@pytest.fixture(params=['mock', 'asyncio'])
+def mock_handler_factory(request):
+    build = MockHandler if request.param == 'mock' else build_async_handler
+
+    def _create_handler(body=None, headers=None, user_id=None, user_role=None, user_name=None, token=None, path="/"):
         headers = headers or {}
         if body and "Content-Length" not in headers:
             headers["Content-Length"] = str(len(json.dumps(body)))
@@ -53,5 +123,5 @@ def mock_handler_factory():
         if token and "Authorization" not in headers:
             headers["Authorization"] = f"Bearer {token}"
 
-        return MockHandler(body, headers, user_id, user_role, user_name)
+        return build(body, headers, user_id, user_role, user_name, path)
     return _create_handler
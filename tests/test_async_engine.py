@@ -0,0 +1,77 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+import database
+from engines.asyncio_engine import AsyncHTTPServer
+from server import APIRRequestHandler
+from utils import create_jwt_token
+
+
+class QuietHandler(APIRRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def async_server():
+    httpd = AsyncHTTPServer(('127.0.0.1', 0), QuietHandler, workers=2, keep_alive=2.0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    thread.join()
+    httpd.server_close()
+
+
+@pytest.fixture
+def token():
+    database.users[1] = {"id": 1, "name": "Sender", "email": "sender@example.com",
+                         "password": "", "role": "USER", "balance": 1000.0}
+    database.users[2] = {"id": 2, "name": "Receiver", "email": "receiver@example.com",
+                         "password": "", "role": "USER", "balance": 0.0}
+    return create_jwt_token(1, "USER")
+
+
+def test_async_engine_reuses_keep_alive_connection(async_server, token):
+    conn = http.client.HTTPConnection('127.0.0.1', async_server, timeout=5)
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    body = json.dumps({"senderId": 1, "receiverId": 2, "amount": 100.0})
+    conn.request('POST', '/transactions/', body=body, headers=headers)
+    response = conn.getresponse()
+    assert response.status == 201
+    assert json.loads(response.read())["message"] == "Transaction successful"
+
+    conn.request('GET', '/transactions/', headers=headers)
+    response = conn.getresponse()
+    assert response.status == 200
+    assert [t["amount"] for t in json.loads(response.read())] == [100.0]
+
+    conn.close()
+    assert database.users[2]["balance"] == 100.0
+
+
+def test_async_engine_unknown_route_returns_404(async_server):
+    conn = http.client.HTTPConnection('127.0.0.1', async_server, timeout=5)
+    conn.request('GET', '/nothing-here')
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 404
+    conn.close()
+
+
+def test_async_engine_idle_connections_do_not_block_requests(async_server, token):
+    # More idle keep-alive connections than handler threads
+    idle = [socket.create_connection(('127.0.0.1', async_server)) for _ in range(50)]
+
+    conn = http.client.HTTPConnection('127.0.0.1', async_server, timeout=5)
+    conn.request('GET', '/transactions/', headers={"Authorization": f"Bearer {token}"})
+    assert conn.getresponse().status == 200
+
+    conn.close()
+    for sock in idle:
+        sock.close()
@@ -1,8 +1,8 @@
 import pytest
 from unittest.mock import MagicMock
-from handlers.auth import handle_register, handle_login, handle_logout
+from api.handlers.auth import handle_register, handle_login, handle_logout
 import database
-from utils import hash_password, create_jwt_token
+from utils import hash_password, create_jwt_token, decode_jwt_token
 
 
 def test_register_success(mock_handler_factory):
@@ -33,6 +33,7 @@ def test_register_duplicate_email(mock_handler_factory):
         "role": "USER",
         "balance": 0.0
     }
+    database.users_by_email["test@example.com"] = 1
 
     body = {
         "name": "Test User",
@@ -61,7 +62,7 @@ def test_login_success(mock_handler_factory, monkeypatch):
     )
     database.users[1] = user
 
-    from models.user import User
+    from api.models.user import User
     monkeypatch.setattr(
         User, "get_by_email", lambda email: user if email == "test@example.com" else None)
 
@@ -79,7 +80,7 @@ def test_login_success(mock_handler_factory, monkeypatch):
 
 
 def test_login_invalid_password(mock_handler_factory, monkeypatch):
-    from models.user import User
+    from api.models.user import User
     user = MagicMock(
         id=1,
         password=hash_password("correct_password")
@@ -109,6 +110,6 @@ def test_logout_success(mock_handler_factory):
     handle_logout(handler)
 
     assert handler.status_code == 200
-    assert token in database.blocked_tokens
+    assert database.is_token_blocked(decode_jwt_token(token)["jti"])
     response = handler.get_response_body()
     assert response["message"] == "Logged out successfully"
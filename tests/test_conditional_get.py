@@ -0,0 +1,151 @@
+import gzip
+import http.client
+import json
+import threading
+import zlib
+
+import pytest
+
+import database
+from conftest import MockHandler
+from api.handlers.transactions import handle_get_my_transactions, handle_get_transactions
+from api.models.transaction import Transaction
+from dsa.xml_parser import parse_xml_file
+from engines.asyncio_engine import AsyncHTTPServer
+from engines.threadpool import PooledHTTPServer
+from server import APIRRequestHandler
+from utils import accepted_encoding, create_jwt_token, json_response
+from test_xml_ingest import write_backup
+
+
+class QuietHandler(APIRRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def token():
+    database.users[1] = {"id": 1, "name": "Sender", "role": "ADMIN", "balance": 10 ** 9}
+    database.users[2] = {"id": 2, "name": "Receiver", "role": "USER", "balance": 0}
+    for amount in range(1, 201):
+        Transaction.create(1, 2, amount)
+    return create_jwt_token(1, "ADMIN")
+
+
+def get(mock_handler_factory, handler_func, token, path, etag=None):
+    headers = {"If-None-Match": etag} if etag else None
+    handler = mock_handler_factory(token=token, path=path, headers=headers)
+    handler_func(handler)
+    return handler
+
+
+@pytest.mark.parametrize("handler_func, path", [
+    (handle_get_my_transactions, "/transactions/me"),
+    (handle_get_transactions, "/transactions/?limit=10"),
+    (handle_get_transactions, "/transactions/"),
+])
+def test_unchanged_listing_gets_304(mock_handler_factory, token, handler_func, path):
+    first = get(mock_handler_factory, handler_func, token, path)
+    tag = first.response_headers["ETag"]
+    assert first.status_code == 200 and tag.startswith('W/"')
+
+    again = get(mock_handler_factory, handler_func, token, path, tag)
+    assert again.status_code == 304
+    assert again.response_headers["ETag"] == tag
+
+    Transaction.create(2, 1, 1)
+    changed = get(mock_handler_factory, handler_func, token, path, tag)
+    assert changed.status_code == 200
+    assert changed.response_headers["ETag"] != tag
+
+
+def test_304_skips_reading_and_encoding(mock_handler_factory, token, monkeypatch):
+    tag = get(mock_handler_factory, handle_get_my_transactions, token, "/transactions/me").response_headers["ETag"]
+    monkeypatch.setattr(Transaction, "get_by_user", lambda *args: pytest.fail("listing was read"))
+
+    handler = get(mock_handler_factory, handle_get_my_transactions, token, "/transactions/me", f'"other", {tag}')
+
+    assert handler.status_code == 304
+
+
+def test_etag_depends_on_query_and_user(mock_handler_factory, token):
+    def tag(path, user_token):
+        return get(mock_handler_factory, handle_get_transactions, user_token, path).response_headers["ETag"]
+
+    first_page = tag("/transactions/?limit=10", token)
+    assert tag("/transactions/?limit=20", token) != first_page
+    assert tag("/transactions/?limit=10", create_jwt_token(2, "USER")) != first_page
+
+
+def test_update_delete_and_import_change_the_version(token, tmp_path):
+    version = Transaction.version()
+    Transaction.update(1, 1, "ADMIN", type="payment")
+    Transaction.delete(2, 1, "ADMIN")
+    Transaction.update(999, 1, "ADMIN", type="payment")
+    assert Transaction.version() == version + 2
+
+    parse_xml_file(write_backup(tmp_path / "sms.xml", 10))
+    assert Transaction.version() > version + 2
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip, deflate", "gzip"),
+    ("deflate", "deflate"),
+    ("gzip;q=0, deflate;q=0.5", "deflate"),
+    ("*", "gzip"),
+    ("gzip;q=0, *", "deflate"),
+    ("gzip;q=0, deflate;q=0, *", None),
+    ("br, identity", None),
+    ("", None),
+])
+def test_encoding_negotiation(accept, expected):
+    assert accepted_encoding(MockHandler(headers={"Accept-Encoding": accept})) == expected
+
+
+@pytest.mark.parametrize("encoding, decompress", [("gzip", gzip.decompress), ("deflate", zlib.decompress)])
+def test_large_responses_are_compressed(encoding, decompress):
+    data = [{"id": i, "type": "transfer"} for i in range(100)]
+    handler = MockHandler(headers={"Accept-Encoding": encoding})
+
+    json_response(handler, 200, data)
+
+    body = handler.wfile.getvalue()
+    assert handler.response_headers["Content-Encoding"] == encoding
+    assert handler.response_headers["Content-Length"] == str(len(body))
+    assert json.loads(decompress(body)) == data
+
+    small = MockHandler(headers={"Accept-Encoding": encoding})
+    json_response(small, 200, {"message": "ok"})
+    assert "Content-Encoding" not in small.response_headers
+    assert small.get_response_body() == {"message": "ok"}
+
+
+@pytest.mark.parametrize("server_class", [PooledHTTPServer, AsyncHTTPServer])
+def test_compressed_stream_and_304_over_keep_alive(server_class, token):
+    httpd = server_class(('127.0.0.1', 0), QuietHandler, workers=2)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=10)
+    headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": "gzip"}
+    try:
+        conn.request('GET', '/transactions/', headers=headers)
+        response = conn.getresponse()
+        assert response.getheader('Content-Encoding') == 'gzip'
+        assert response.getheader('Transfer-Encoding') == 'chunked'
+        ledger = json.loads(gzip.decompress(response.read()))
+        assert [t["amount"] for t in ledger] == list(range(1, 201))
+
+        conn.request('GET', '/transactions/', headers={**headers, "If-None-Match": response.getheader('ETag')})
+        response = conn.getresponse()
+        assert (response.status, response.read()) == (304, b"")
+
+        # The connection is still usable after the bodiless 304
+        conn.request('GET', '/transactions/me', headers={"Authorization": f"Bearer {token}"})
+        response = conn.getresponse()
+        assert response.status == 200
+        assert len(json.loads(response.read())) == 200
+    finally:
+        conn.close()
+        httpd.shutdown()
+        thread.join()
+        httpd.server_close()
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+import database
+import json_codec
+from api.handlers.transactions import handle_get_my_transactions, handle_get_transactions
+from api.models.transaction import Transaction
+from dsa.fragment_cache import FragmentCache
+from dsa.transaction_record import TransactionRecord, UserView
+from utils import create_jwt_token
+
+
+@pytest.fixture(params=list(json_codec.BACKENDS), autouse=True)
+def backend(request):
+    previous = json_codec.use_backend(request.param)
+    yield request.param
+    json_codec.use_backend(previous)
+
+
+@pytest.fixture
+def accounts():
+    database.users[1] = {"id": 1, "name": "A", "email": "a@example.com", "password": "", "balance": 100,
+                         "role": "ADMIN"}
+    database.users[2] = {"id": 2, "name": "B", "email": "b@example.com", "password": "", "balance": 0,
+                         "role": "USER"}
+    return create_jwt_token(1, "ADMIN")
+
+
+def test_round_trip():
+    data = {"message": "ok", "amount": 12.5, "ids": [1, 2], "nested": {"none": None}, 3: "non-string key"}
+
+    encoded = json_codec.dumps(data)
+
+    assert isinstance(encoded, bytes)
+    assert json_codec.loads(encoded) == json.loads(json.dumps(data))
+    assert json_codec.loads(encoded.decode("utf-8"))["ids"] == [1, 2]
+
+
+def test_malformed_json_raises_value_error():
+    with pytest.raises(ValueError):
+        json_codec.loads(b'{"amount": ')
+
+
+def test_records_are_encoded_once():
+    records = [TransactionRecord(id=i, amount=i, type="transfer", created_at="2024-05-10", sender_id=1,
+                                 receiver_id=2) for i in (1, 2)]
+
+    first = json_codec.encode(records)
+    second = json_codec.encode(records + [{"id": 3}])
+
+    assert json.loads(first) == [record.copy() for record in records]
+    assert json.loads(second)[2] == {"id": 3}
+    stats = json_codec.fragments.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (2, 2, 2)
+    assert json_codec.encode(records[0]) == json_codec.dumps(records[0].copy())
+
+
+def test_a_changed_type_is_encoded_again():
+    record = TransactionRecord(id=1, amount=5, type="transfer", created_at="2024-05-10", sender_id=1, receiver_id=2)
+    json_codec.encode(record)
+
+    # As in a pre-fork worker, which doesn't see the store process discard the entry
+    record["type"] = "payment"
+
+    assert json.loads(json_codec.encode(record))["type"] == "payment"
+
+
+def test_an_entry_keeps_the_type_that_was_encoded():
+    record = TransactionRecord(id=1, amount=5, type="transfer", created_at="2024-05-10", sender_id=1, receiver_id=2)
+
+    def update_while_encoding(data):
+        record["type"] = "payment"
+        return json_codec.dumps(data)
+
+    cache = FragmentCache(update_while_encoding)
+    cache.get(record)
+
+    assert cache.entries[1][0] == "transfer"
+    assert json.loads(cache.get(record))["type"] == "payment"
+
+
+def test_cache_drops_the_oldest_entry_when_full():
+    cache = FragmentCache(json_codec.dumps, maxsize=2)
+    for i in (1, 2, 3):
+        cache.get(TransactionRecord(id=i, amount=i, type="transfer", created_at="2024-05-10"))
+
+    assert list(cache.entries) == [2, 3]
+
+
+def test_update_and_delete_invalidate_fragments(accounts, mock_handler_factory):
+    first, _ = Transaction.create(1, 2, 10)
+    second, _ = Transaction.create(1, 2, 20)
+
+    handler = mock_handler_factory(token=accounts, path="/transactions/?limit=10")
+    handle_get_transactions(handler)
+    assert [t["type"] for t in handler.get_response_body()] == ["transfer", "transfer"]
+    assert set(json_codec.fragments.entries) == {first, second}
+
+    Transaction.update(first, 1, "ADMIN", type="payment")
+    Transaction.delete(second, 1, "ADMIN")
+    assert not json_codec.fragments.entries
+
+    handler = mock_handler_factory(token=accounts, path="/transactions/?limit=10")
+    handle_get_transactions(handler)
+    assert [(t["id"], t["type"]) for t in handler.get_response_body()] == [(first, "payment")]
+
+
+def test_records_naming_the_user_are_cached_once_for_every_user(accounts, mock_handler_factory):
+    database.store.import_transactions([
+        TransactionRecord(id=1, amount=5, type="deposit", created_at="2024-05-10", sender="Bank", receiver="Me"),
+        TransactionRecord(id=2, amount=7, type="payment", created_at="2024-05-11", sender="Me", receiver="Me"),
+    ])
+
+    def received(token):
+        handler = mock_handler_factory(token=token)
+        handle_get_my_transactions(handler)
+        return [(t["sender"], t["receiver"]) for t in handler.get_response_body()]
+
+    assert received(accounts) == [("Bank", "A"), ("A", "A")]
+    assert received(create_jwt_token(2, "USER")) == [("Bank", "B"), ("B", "B")]
+    stats = json_codec.fragments.stats()
+    assert (stats["size"], stats["hits"], stats["misses"]) == (2, 2, 2)
+    assert json.loads(json_codec.encode(database.transactions[1]))["receiver"] == "Me"
+
+
+def test_a_name_is_encoded_as_json():
+    record = TransactionRecord(id=1, amount=5, type="deposit", created_at="2024-05-10", sender="Bank", receiver="Me")
+
+    encoded = json_codec.encode([UserView(record, 'Jo "JJ" \u00e9\x00Me\x00')])
+
+    assert json.loads(encoded)[0]["receiver"] == 'Jo "JJ" \u00e9\x00Me\x00'
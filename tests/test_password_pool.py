@@ -0,0 +1,157 @@
+import threading
+
+import pytest
+
+import database
+import password_pool
+import utils
+from api.handlers.auth import handle_login, handle_register
+from api.handlers.metrics import handle_get_metrics
+from dsa.latency_histogram import LatencyHistogram
+from password_pool import PasswordPool, PoolBusy
+from utils import create_jwt_token, hash_password, password_rounds
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = PasswordPool(processes=0, queue_size=1, rounds=4)
+    monkeypatch.setattr(password_pool, "pool", pool)
+    return pool
+
+
+def test_histogram_percentiles_are_bucket_bounds():
+    histogram = LatencyHistogram()
+    for seconds in [0.0005] * 90 + [0.02] * 9 + [10.0]:
+        histogram.observe(seconds)
+
+    stats = histogram.stats()
+    assert (stats["count"], stats["p50_ms"], stats["p95_ms"], stats["p99_ms"]) == (100, 1, 25, 25)
+    assert stats["buckets"]["<=1ms"] == 90
+    assert stats["buckets"][">5000ms"] == 1
+    assert histogram.percentile(1.0) is None
+
+
+def test_inline_pool_hashes_and_checks(pool):
+    hashed = pool.hash("secret")
+
+    assert hashed.startswith("$2b$04$")
+    assert pool.check("secret", hashed)
+    assert not pool.check("wrong", hashed)
+    stats = pool.stats()
+    assert (stats["hash"]["count"], stats["check"]["count"], stats["pending"]) == (1, 2, 0)
+
+
+def test_process_pool_hashes_and_checks():
+    pool = PasswordPool(processes=1, rounds=4)
+    try:
+        hashed = pool.hash("secret")
+        assert pool.check("secret", hashed)
+    finally:
+        pool.close()
+
+
+def test_full_pool_rejects_instead_of_queueing(pool, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    hash_password = utils.hash_password
+
+    def slow_hash(password, rounds):
+        started.set()
+        release.wait()
+        return hash_password(password, rounds)
+
+    monkeypatch.setattr(utils, "hash_password", slow_hash)
+    # processes 0 + queue_size 1: one operation admitted at a time
+    worker = threading.Thread(target=pool.hash, args=("secret",))
+    worker.start()
+    started.wait()
+    try:
+        with pytest.raises(PoolBusy) as raised:
+            pool.check("secret", "")
+        assert raised.value.retry_after >= 1
+        assert pool.stats()["rejected"] == 1
+    finally:
+        release.set()
+        worker.join()
+    assert pool.check("secret", pool.hash("secret"))
+
+
+def test_busy_login_gets_503_with_retry_after(pool, mock_handler_factory, monkeypatch):
+    database.users[1] = {"id": 1, "name": "A", "email": "a@example.com", "password": pool.hash("secret"),
+                         "balance": 0, "role": "USER"}
+    database.users_by_email["a@example.com"] = 1
+
+    def busy(*args):
+        raise PoolBusy(3)
+
+    monkeypatch.setattr(pool, "check", busy)
+    monkeypatch.setattr(pool, "hash", busy)
+    handler = mock_handler_factory(body={"email": "a@example.com", "password": "secret"})
+    handle_login(handler)
+
+    assert handler.status_code == 503
+    assert handler.response_headers["Retry-After"] == "3"
+    assert handler.get_response_body()["message"] == "Server is busy, try again later"
+
+    handler = mock_handler_factory(body={"name": "B", "email": "b@example.com", "password": "secret"})
+    handle_register(handler)
+
+    assert handler.status_code == 503
+    assert "b@example.com" not in database.users_by_email
+
+
+def test_register_and_login_go_through_the_pool(pool, mock_handler_factory):
+    handler = mock_handler_factory(body={"name": "A", "email": "a@example.com", "password": "secret"})
+    handle_register(handler)
+    assert handler.status_code == 201
+
+    handler = mock_handler_factory(body={"email": "a@example.com", "password": "secret"})
+    handle_login(handler)
+    assert handler.status_code == 200
+
+    database.users[1]["role"] = "ADMIN"
+    handler = mock_handler_factory(token=create_jwt_token(1, "ADMIN"))
+    handle_get_metrics(handler)
+    stats = handler.get_response_body()["password_pool"]
+    assert (stats["rounds"], stats["hash"]["count"], stats["check"]["count"]) == (4, 1, 1)
+
+
+def test_calibration_picks_the_highest_cost_within_budget(monkeypatch):
+    monkeypatch.setattr(password_pool, "time_hash", lambda rounds, samples: 2 ** rounds / 10000)
+
+    rounds, timings = password_pool.calibrate(budget_ms=250)
+
+    # 2**11 / 10 = 204.8ms fits, 2**12 / 10 = 409.6ms doesn't, and nothing past it is timed
+    assert rounds == 11
+    assert list(timings) == list(range(4, 13))
+    assert password_pool.calibrate(budget_ms=0.1)[0] == 4
+
+
+def test_login_rehashes_to_the_configured_cost_in_the_background(pool, mock_handler_factory, monkeypatch):
+    database.users[1] = {"id": 1, "name": "A", "email": "a@example.com", "password": hash_password("secret", 5),
+                         "balance": 0, "role": "USER"}
+    database.users_by_email["a@example.com"] = 1
+    threads = []
+    rehash_later = pool.rehash_later
+    monkeypatch.setattr(pool, "rehash_later", lambda *args: threads.append(rehash_later(*args)) or threads[-1])
+
+    handler = mock_handler_factory(body={"email": "a@example.com", "password": "secret"})
+    handle_login(handler)
+    assert handler.status_code == 200
+    threads[0].join()
+
+    assert password_rounds(database.users[1]["password"]) == 4
+    assert pool.stats()["rehashed"] == 1
+
+    # Already at the configured cost: nothing to do
+    handle_login(mock_handler_factory(body={"email": "a@example.com", "password": "secret"}))
+    assert threads[1] is None
+
+
+def test_rehash_is_skipped_when_the_pool_is_busy(pool):
+    hashed = hash_password("secret", 5)
+    assert pool._admit()  # the pool's only slot
+    try:
+        assert pool.rehash_later("secret", hashed, lambda new: True) is None
+    finally:
+        pool._execute("check", lambda: None)
+    assert pool.stats()["rejected"] == 0
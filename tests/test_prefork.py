@@ -0,0 +1,85 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import database
+from engines.prefork import PreforkServer
+from server import APIRRequestHandler
+from utils import create_jwt_token
+
+
+class QuietHandler(APIRRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def prefork_server():
+    database.users[1] = {"id": 1, "name": "Sender", "email": "sender@example.com",
+                         "password": "", "role": "USER", "balance": 1000.0}
+    database.users[2] = {"id": 2, "name": "Receiver", "email": "receiver@example.com",
+                         "password": "", "role": "USER", "balance": 0.0}
+    database.user_id_counter = 3
+
+    httpd = PreforkServer(('127.0.0.1', 0), QuietHandler, processes=3, workers=2, keep_alive=1.0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    thread.join()
+    httpd.server_close()
+
+
+def request(port, method, path, token=None, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    conn.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+    response = conn.getresponse()
+    payload = json.loads(response.read() or b'null')
+    conn.close()
+    return response.status, payload
+
+
+def test_workers_share_transactions(prefork_server):
+    token = create_jwt_token(1, "USER")
+
+    for _ in range(6):
+        status, _ = request(prefork_server, 'POST', '/transactions/', token,
+                            {"senderId": 1, "receiverId": 2, "amount": 10.0})
+        assert status == 201
+
+    # Each new connection may land on a different worker
+    for _ in range(6):
+        status, transactions = request(prefork_server, 'GET', '/transactions/', token)
+        assert status == 200
+        assert len(transactions) == 6
+        assert len({t["id"] for t in transactions}) == 6
+
+
+def test_logout_on_one_worker_blocks_token_on_all(prefork_server):
+    token = create_jwt_token(1, "USER")
+
+    status, _ = request(prefork_server, 'POST', '/auth/logout', token)
+    assert status == 200
+
+    for _ in range(6):
+        status, body = request(prefork_server, 'GET', '/transactions/', token)
+        assert status == 401
+        assert body["message"] == "Token has been blacklisted"
+
+
+def test_register_and_login(prefork_server):
+    user = {"name": "Carol", "email": "carol@example.com", "password": "secret123", "balance": 50.0}
+
+    status, created = request(prefork_server, 'POST', '/auth/register', body=user)
+    assert status == 201
+    assert created["name"] == "Carol" and created["id"] == 3
+
+    status, body = request(prefork_server, 'POST', '/auth/login',
+                           body={"email": "carol@example.com", "password": "secret123"})
+    assert status == 200
+
+    status, transactions = request(prefork_server, 'GET', '/transactions/me', body["access_token"])
+    assert (status, transactions) == (200, [])
@@ -0,0 +1,85 @@
+import time
+
+import database
+from api.handlers.auth import handle_logout
+from api.handlers.transactions import handle_get_my_transactions
+from dsa.bloom_filter import BloomFilter
+from dsa.revocation_store import RevocationStore
+from storage.sqlite import SqliteStore
+from utils import create_jwt_token, decode_jwt_token, token_id
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_are_purged_once_their_tokens_expire():
+    clock = Clock()
+    revoked = RevocationStore(clock=clock)
+    revoked.revoke("a", 1010)
+    revoked.revoke("b", 1020)
+    revoked.revoke("a", 1030)  # revoked again by a later token: the later expiry wins
+    revoked.revoke("old", 900)
+
+    assert len(revoked) == 2
+    clock.now = 1020
+    assert not revoked.is_revoked("b")
+    assert revoked.is_revoked("a")
+    assert list(revoked.expiry) == ["a"]
+    clock.now = 1030
+    revoked.revoke("c", 1100)
+    assert list(revoked.expiry) == ["c"]
+    assert [token_id for _, token_id in revoked.heap] == ["c"]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"revoked-{i}")
+
+    assert all(f"revoked-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+    assert len(bloom.bits) * 8 < 12 * 1000
+
+
+def test_logout_revokes_the_token_id(mock_handler_factory):
+    token = create_jwt_token(1, "USER")
+    other = create_jwt_token(1, "USER")
+
+    handler = mock_handler_factory(token=token)
+    handle_logout(handler)
+
+    payload = decode_jwt_token(token)
+    assert database.revoked_tokens.expiry == {payload["jti"]: payload["exp"]}
+    for revoked, status in ((token, 401), (other, 200)):
+        handler = mock_handler_factory(token=revoked)
+        handle_get_my_transactions(handler)
+        assert handler.status_code == status
+
+
+def test_tokens_without_jti_are_revoked_by_digest():
+    payload = {"user_id": 1, "role": "USER", "exp": 2000}
+
+    assert token_id(payload, "header.payload.signature") == token_id(payload, "header.payload.signature")
+    assert token_id(payload, "header.payload.signature") != token_id(payload, "header.payload.other")
+    assert token_id({**payload, "jti": "abc"}, "header.payload.signature") == "abc"
+
+
+def test_sqlite_revocations_survive_a_restart(tmp_path):
+    path = str(tmp_path / "momo.db")
+    store = SqliteStore(path)
+    store.block_token("revoked", time.time() + 3600)
+    store.block_token("expiring", time.time() + 0.01)
+    store.close()
+
+    time.sleep(0.02)
+    store = SqliteStore(path)
+    assert store.is_token_blocked("revoked")
+    assert not store.is_token_blocked("expiring")
+    assert store.revoked_filter.count == 1
+    store.close()
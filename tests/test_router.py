@@ -0,0 +1,61 @@
+import pytest
+
+from api.router import Router
+
+
+def handler(name):
+    def handle(request, **params):
+        return name, params
+    return handle
+
+
+@pytest.fixture
+def router():
+    router = Router()
+    router.add('GET', '/transactions/', handler('list'))
+    router.add('GET', '/transactions/me', handler('mine'))
+    router.add('GET', '/transactions/{transaction_id:int}', handler('get'))
+    router.add('PUT', '/transactions/{transaction_id:int}', handler('update'))
+    router.add('GET', '/users/{name}/transactions', handler('by name'))
+    return router
+
+
+def test_parameters_are_converted_to_their_type(router):
+    handlers, params = router.match('/transactions/42')
+
+    assert sorted(handlers) == ['GET', 'PUT']
+    assert params == {'transaction_id': 42}
+    assert handlers['GET'](None, **params) == ('get', {'transaction_id': 42})
+    assert router.match('/users/alice/transactions')[1] == {'name': 'alice'}
+
+
+def test_literal_segments_win_over_parameters(router):
+    handlers, params = router.match('/transactions/me')
+
+    assert handlers['GET'](None) == ('mine', {})
+    assert params == {}
+
+
+def test_query_string_and_trailing_slash_are_ignored(router):
+    assert router.match('/transactions?limit=10')[0]['GET'](None) == ('list', {})
+    assert router.match('/transactions/7/?x=1')[1] == {'transaction_id': 7}
+
+
+@pytest.mark.parametrize('path', ['/transactions/abc', '/transactions/1/2', '/nothing', '/', '/users/alice'])
+def test_unknown_paths_do_not_match(router, path):
+    assert router.match(path) == (None, None)
+
+
+def test_conflicting_routes_are_refused(router):
+    with pytest.raises(ValueError):
+        router.add('GET', '/transactions/me', handler('again'))
+    with pytest.raises(ValueError):
+        router.add('DELETE', '/transactions/{id:int}', handler('delete'))
+
+
+def test_route_decorator_registers_the_function(router):
+    @router.route('POST', '/transactions/batch')
+    def handle_batch(request):
+        return 'batch'
+
+    assert router.match('/transactions/batch')[0] == {'POST': handle_batch}
@@ -0,0 +1,159 @@
+import http.client
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import database
+from api.models.transaction import Transaction
+from engines.threadpool import PooledHTTPServer
+from server import APIRRequestHandler
+from utils import create_jwt_token
+
+
+@pytest.fixture
+def pooled_server():
+    servers = []
+
+    def _start(**options):
+        httpd = PooledHTTPServer(('127.0.0.1', 0), APIRRequestHandler, **options)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        servers.append(httpd)
+        return httpd.server_address[1]
+
+    yield _start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture
+def token():
+    database.users[1] = {"id": 1, "name": "Sender", "email": "sender@example.com",
+                         "password": "", "role": "USER", "balance": 1000.0}
+    return create_jwt_token(1, "USER")
+
+
+def test_pooled_server_keeps_connection_alive(pooled_server, token):
+    port = pooled_server(workers=2)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+
+    for _ in range(3):
+        conn.request('GET', '/transactions/', headers={"Authorization": f"Bearer {token}"})
+        response = conn.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read()) == []
+
+    conn.close()
+
+
+def test_pooled_server_serves_concurrent_requests(pooled_server, token):
+    port = pooled_server(workers=4)
+
+    def get_transactions(_):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+        conn.request('GET', '/transactions/', headers={"Authorization": f"Bearer {token}"})
+        status = conn.getresponse().status
+        conn.close()
+        return status
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(get_transactions, range(40)))
+
+    assert statuses == [200] * 40
+
+
+def test_full_queue_is_rejected_with_503(pooled_server, token):
+    port = pooled_server(workers=1, queue_size=1)
+
+    # Occupies the only worker with an idle keep-alive connection
+    busy = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    busy.request('GET', '/transactions/', headers={"Authorization": f"Bearer {token}"})
+    busy.getresponse().read()
+
+    # Waits in the queue
+    queued = socket.create_connection(('127.0.0.1', port))
+
+    rejected = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    rejected.request('GET', '/transactions/')
+    response = rejected.getresponse()
+
+    assert response.status == 503
+    assert response.getheader('Retry-After') == '1'
+
+    busy.close()
+    queued.close()
+    rejected.close()
+
+
+def test_concurrent_transfers_keep_balances_consistent():
+    database.users[1] = {"id": 1, "name": "A", "role": "USER", "balance": 1000}
+    database.users[2] = {"id": 2, "name": "B", "role": "USER", "balance": 1000}
+
+    def transfer(i):
+        sender, receiver = (1, 2) if i % 2 else (2, 1)
+        return Transaction.create(sender, receiver, 1)[0]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(transfer, range(2000)))
+
+    assert database.users[1]['balance'] + database.users[2]['balance'] == 2000
+    assert len(set(ids)) == 2000
+    assert database.transaction_ids.next_id == 2001
+
+
+def test_query_string_is_routed(pooled_server, token):
+    port = pooled_server(workers=1)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+
+    conn.request('GET', '/transactions/?limit=10', headers={"Authorization": f"Bearer {token}"})
+    response = conn.getresponse()
+
+    assert response.status == 200
+    assert json.loads(response.read()) == []
+    conn.close()
+
+
+def test_wrong_method_gets_405_with_allow(pooled_server, token):
+    port = pooled_server(workers=1)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+
+    conn.request('PATCH', '/transactions/5', headers={"Authorization": f"Bearer {token}"})
+    response = conn.getresponse()
+    assert response.status == 405
+    assert response.getheader('Allow') == 'DELETE, GET, PUT'
+    assert json.loads(response.read()) == {"message": "Method Not Allowed"}
+
+    conn.request('GET', '/auth/login')
+    response = conn.getresponse()
+    response.read()
+    assert (response.status, response.getheader('Allow')) == (405, 'POST')
+
+    conn.request('GET', '/transactions/abc', headers={"Authorization": f"Bearer {token}"})
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 404
+    conn.close()
+
+
+def test_post_with_query_string_is_routed(pooled_server, token):
+    database.users[2] = {"id": 2, "name": "Receiver", "email": "receiver@example.com",
+                         "password": "", "role": "USER", "balance": 0.0}
+    port = pooled_server(workers=1)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    body = json.dumps({"senderId": 1, "receiverId": 2, "amount": 5})
+
+    conn.request('POST', '/transactions?source=app', body=body,
+                 headers={"Authorization": f"Bearer {token}", "Content-Length": str(len(body))})
+    response = conn.getresponse()
+
+    assert response.status == 201
+    transaction_id = json.loads(response.read())["id"]
+    conn.request('GET', f'/transactions/{transaction_id}/', headers={"Authorization": f"Bearer {token}"})
+    response = conn.getresponse()
+    assert response.status == 200
+    assert json.loads(response.read())["amount"] == 5
+    conn.close()
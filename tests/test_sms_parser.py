@@ -0,0 +1,26 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from dsa.helper import parse_sms_body, parse_sms_body_reference
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dsa", "modified_sms_v2.xml")
+
+
+def test_compiled_parser_matches_reference_on_the_backup():
+    bodies = [sms.get("body", "") for sms in ET.parse(SEED_FILE).getroot().iter("sms")]
+
+    assert [parse_sms_body(body) for body in bodies] == [parse_sms_body_reference(body) for body in bodies]
+
+
+@pytest.mark.parametrize("body", [
+    # Reworded payment: no template matches, the reference parser still handles it
+    "TxId: 123. Your payment of 1,000 RWF to Jane Smith 12845 has been completed at 2024-05-10 16:31:39 Your new balance: 0 RWF.",
+    # Payment template, but Airtime is mentioned: same fall-through as the reference parser
+    "TxId: 456. Your payment of 500 RWF to Airtime Shop has been completed at 2024-05-10 16:31:39. Your new balance: 0 RWF.",
+    "<#> Your MTN MoMo One-Time Password is :2476.",
+    "Unrelated notification",
+])
+def test_other_messages_fall_back_to_reference(body):
+    assert parse_sms_body(body) == parse_sms_body_reference(body)
@@ -0,0 +1,70 @@
+import pytest
+
+import database
+from api.handlers.metrics import handle_get_metrics
+from dsa.helper import parse_sms_body, sms_templates
+from dsa.template_registry import TemplateRegistry
+from utils import create_jwt_token
+
+
+@pytest.fixture
+def registry():
+    registry = TemplateRegistry(fallback=lambda message: "fallback", reorder_every=4, time_every=1)
+
+    @registry.template('greeting', r"Hello (?P<name>\w+)")
+    def greeting(match, message):
+        return ('greeting', match['name'])
+
+    @registry.template('farewell', r"Bye (?P<name>\w+)")
+    def farewell(match, message):
+        return None if match['name'] == 'nobody' else ('farewell', match['name'])
+
+    return registry
+
+
+def test_templates_are_reordered_by_hits(registry):
+    assert [t.name for t in registry.order] == ['greeting', 'farewell']
+
+    for message in ("Bye Ann", "Bye Bob", "Bye Cy", "Hello Di"):
+        registry.parse(message)
+
+    assert [t.name for t in registry.order] == ['farewell', 'greeting']
+    assert registry.parse("Bye Ed") == ('farewell', 'Ed')
+
+
+def test_counters_cover_hits_misses_and_fallbacks(registry):
+    assert registry.parse("Hello Ann") == ('greeting', 'Ann')
+    assert registry.parse("Bye nobody") == "fallback"
+
+    stats = registry.stats()
+    assert stats['parsed'] == 2 and stats['unmatched'] == 1
+    by_name = {row['template']: row for row in stats['templates']}
+    assert (by_name['greeting']['hits'], by_name['greeting']['misses']) == (1, 1)
+    assert (by_name['farewell']['hits'], by_name['farewell']['misses']) == (0, 1)
+    assert by_name['greeting']['mean_us'] > 0
+
+
+def test_template_names_are_unique(registry):
+    with pytest.raises(ValueError):
+        registry.template('greeting', r"Hi")(lambda match, message: None)
+
+
+def test_metrics_show_sms_template_counters(mock_handler_factory):
+    sms_templates.reset_stats()
+    parse_sms_body("*113*R*A bank deposit of 5000 RWF has been added to your mobile money account "
+                   "at 2024-05-14 09:10:29. Your NEW BALANCE :5980 RWF.")
+    database.users[1] = {"id": 1, "name": "Admin", "role": "ADMIN", "balance": 0}
+
+    handler = mock_handler_factory(token=create_jwt_token(1, "ADMIN"), path="/metrics")
+    handle_get_metrics(handler)
+
+    assert handler.status_code == 200
+    rows = handler.get_response_body()["sms_templates"]["templates"]
+    assert rows[0]["template"] == "deposit" and rows[0]["hits"] == 1
+
+
+def test_metrics_are_admin_only(mock_handler_factory):
+    handler = mock_handler_factory(token=create_jwt_token(1, "USER"), path="/metrics")
+    handle_get_metrics(handler)
+
+    assert handler.status_code == 403
@@ -0,0 +1,158 @@
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+import database
+import snapshot
+from api.models.transaction import Transaction
+from api.models.user import User
+from engines.prefork import PreforkServer
+from server import APIRRequestHandler, load_data
+from utils import create_jwt_token
+
+
+@pytest.fixture
+def store():
+    first = User.create("Alice", "alice@example.com", "hash", balance=100)
+    second = User.create("Bob", "bob@example.com", "hash", balance=0)
+    for amount in (10, 20, 30):
+        Transaction.create(first, second, amount)
+    database.block_token("revoked-token", time.time() + 3600)
+    return first, second
+
+
+def reset():
+    for name in snapshot.STATE:
+        value = getattr(database, name)
+        setattr(database, name, type(value)() if not isinstance(value, int) else 0)
+
+
+def test_snapshot_round_trip(tmp_path, store):
+    path = str(tmp_path / "momo.snapshot")
+    first, second = store
+    snapshot.save(path)
+    expected = {name: getattr(database, name) for name in ('users', 'users_by_email')}
+    next_id = database.transaction_ids.next_id
+    reset()
+
+    assert snapshot.load(path)
+
+    for name, value in expected.items():
+        assert getattr(database, name) == value
+    assert database.transaction_ids.next_id == next_id
+    assert User.get_by_email("bob@example.com").balance == 60
+    assert [t["amount"] for t in Transaction.get_by_user(first)] == [10, 20, 30]
+    page, _ = Transaction.query(limit=10, min_amount=15)
+    assert [t["amount"] for t in page] == [20, 30]
+    assert database.is_token_blocked("revoked-token")
+    # Counters carry on where they stopped
+    assert Transaction.create(first, second, 5)[0] == 4
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:-1],
+    lambda data: data[:10],
+    lambda data: data[:-1] + bytes([data[-1] ^ 0xFF]),
+    lambda data: b"NOTASNAP" + data[8:],
+    lambda data: b"",
+])
+def test_damaged_snapshot_is_ignored(tmp_path, store, damage):
+    path = tmp_path / "momo.snapshot"
+    snapshot.save(str(path))
+    path.write_bytes(damage(path.read_bytes()))
+
+    assert not snapshot.load(str(path))
+    assert len(database.transactions) == 3
+
+
+def test_startup_falls_back_to_xml_without_a_snapshot(tmp_path):
+    load_data(str(tmp_path / "missing.snapshot"))
+
+    assert len(database.transactions) == 1648
+
+
+def test_save_replaces_the_file_atomically(tmp_path, store):
+    path = tmp_path / "momo.snapshot"
+    snapshot.save(str(path))
+    snapshot.save(str(path))
+
+    assert [p.name for p in tmp_path.iterdir()] == ["momo.snapshot"]
+
+
+def test_store_keeps_working_while_a_snapshot_is_written(tmp_path, store, monkeypatch):
+    path = str(tmp_path / "momo.snapshot")
+    first, second = store
+    dump_state = snapshot.dump_state
+
+    def slow_dump_state():
+        time.sleep(0.5)
+        return dump_state()
+
+    monkeypatch.setattr(snapshot, "dump_state", slow_dump_state)
+    saving = threading.Thread(target=snapshot.save, args=(path,))
+    saving.start()
+    time.sleep(0.1)
+
+    # Pickling runs in a forked child, so the lock is free and changes go on
+    assert database.lock.acquire(timeout=0.2)
+    database.lock.release()
+    assert Transaction.create(first, second, 40)[0] == 4
+    saving.join()
+
+    reset()
+    assert snapshot.load(path)
+    assert [t["amount"] for t in Transaction.get_all()] == [10, 20, 30]
+
+
+def test_failed_snapshot_write_keeps_the_previous_one(tmp_path, store, monkeypatch):
+    path = tmp_path / "momo.snapshot"
+    snapshot.save(str(path))
+    previous = path.read_bytes()
+
+    monkeypatch.setattr(snapshot, "dump_state", lambda: 1 / 0)
+    with pytest.raises(snapshot.SnapshotError):
+        snapshot.save(str(path))
+
+    assert path.read_bytes() == previous
+
+
+def test_snapshotter_writes_on_stop(tmp_path, store):
+    path = str(tmp_path / "momo.snapshot")
+    snapshotter = snapshot.Snapshotter(path, interval=0.05)
+    snapshotter.start()
+    Transaction.create(store[0], store[1], 1)
+    snapshotter.stop()
+    reset()
+
+    assert snapshot.load(path)
+    assert len(database.transactions) == 4
+
+
+class QuietHandler(APIRRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def test_prefork_snapshot_is_taken_in_the_store_process(tmp_path, store):
+    path = str(tmp_path / "momo.snapshot")
+    httpd = PreforkServer(('127.0.0.1', 0), QuietHandler, processes=2, workers=2, keep_alive=1.0,
+                          snapshotter=snapshot.Snapshotter(path))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=10)
+    conn.request('POST', '/transactions/', body=json.dumps({"senderId": 1, "receiverId": 2, "amount": 7}),
+                 headers={"Authorization": f"Bearer {create_jwt_token(1, 'USER')}"})
+    assert conn.getresponse().status == 201
+    conn.close()
+
+    httpd.shutdown()
+    thread.join()
+    httpd.server_close()
+    reset()
+
+    assert snapshot.load(path)
+    assert [t["amount"] for t in database.transactions.values()] == [10, 20, 30, 7]
@@ -0,0 +1,62 @@
+import pickle
+import random
+
+import pytest
+
+from dsa import sorted_index
+from dsa.sorted_index import SortedIndex
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    # Small enough that a few hundred entries split and merge chunks many times
+    monkeypatch.setattr(sorted_index, "CHUNK_SIZE", 4)
+
+
+def test_matches_a_sorted_list_through_adds_and_removes():
+    rng = random.Random(7)
+    index, expected = SortedIndex(), []
+    for sequence in range(1, 400):
+        entry = (rng.randint(0, 50), sequence, sequence)
+        index.add(*entry)
+        expected.append(entry)
+        if rng.random() < 0.4:
+            victim = expected.pop(rng.randrange(len(expected)))
+            index.remove(*victim)
+    expected.sort()
+
+    assert list(index) == expected and len(index) == len(expected)
+    assert all(len(chunk) <= 8 for chunk in index.chunks)
+    assert index.maxes == [chunk[-1] for chunk in index.chunks]
+
+    for low, high in ((None, None), (10, 20), (25, None), (None, 3), (51, None)):
+        assert list(index.scan(low, high)) == [e for e in expected if (low is None or e[0] >= low)
+                                               and (high is None or e[0] <= high)]
+    for after in expected[::7]:
+        assert list(index.scan(after=after)) == expected[expected.index(after) + 1:]
+        assert list(index.scan(low=after[0], after=after)) == expected[expected.index(after) + 1:]
+
+
+def test_removing_everything_or_something_absent():
+    index = SortedIndex()
+    for sequence in range(20):
+        index.add(sequence % 3, sequence, sequence)
+
+    index.remove(99, 1, 1)
+    index.remove(0, 1, 1)
+    assert len(index) == 20
+
+    for key, sequence, item_id in list(index):
+        index.remove(key, sequence, item_id)
+    assert len(index) == 0 and not index.chunks and list(index.scan()) == []
+
+
+def test_loads_a_flat_index_from_an_older_snapshot():
+    old = SortedIndex.__new__(SortedIndex)
+    old.__dict__["entries"] = [(key, key, key) for key in range(10)]
+
+    index = pickle.loads(pickle.dumps(old))
+
+    assert list(index) == [(key, key, key) for key in range(10)]
+    index.add(4.5, 10, 10)
+    assert list(index.scan(4, 5)) == [(4, 4, 4), (4.5, 10, 10), (5, 5, 5)]
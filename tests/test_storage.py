@@ -0,0 +1,317 @@
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import database
+from api.handlers.auth import handle_register
+from api.handlers.transactions import (handle_add_transaction, handle_add_transaction_batch,
+                                       handle_get_my_transactions, handle_get_transactions)
+from api.models.transaction import INVALID_TYPE, Transaction
+from api.models.user import User
+from dsa.xml_parser import parse_xml_file
+from engines.prefork import PreforkServer
+from server import APIRRequestHandler
+from storage.base import BACKENDS
+from utils import create_jwt_token
+
+
+class QuietHandler(APIRRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+SMS_BACKUP = """<?xml version='1.0' encoding='utf-8'?>
+<smses count="3">
+  <sms body="You have received 2000 RWF from Jane Smith (*********013) on your mobile money account at 2024-05-10 16:30:51. Message from sender: . Your new balance:2000 RWF. Financial Transaction Id: 76662021700." />
+  <sms body="Your payment of 1,000 RWF to Jane Smith 12845 has been completed at 2024-05-10 16:31:39. Your new balance: 1,000 RWF. Fee was 0 RWF." />
+  <sms body="Your payment of 600 RWF to Samuel Carter 95464 has been completed at 2024-05-10 21:32:32. Your new balance: 400 RWF. Fee was 0 RWF." />
+</smses>
+"""
+
+
+@pytest.fixture(params=BACKENDS, autouse=True)
+def store(request, tmp_path):
+    """Every test in this file runs against each backend through the models' public API."""
+    store = database.open_store(request.param, str(tmp_path / "momo.db"))
+    previous = database.use_store(store)
+    yield store
+    database.use_store(previous)
+    store.close()
+
+
+@pytest.fixture
+def accounts():
+    return [User.create(f"User {i}", f"user{i}@example.com", "hash", balance=1000) for i in (1, 2, 3)]
+
+
+@pytest.fixture
+def sms_backup(tmp_path):
+    path = tmp_path / "sms.xml"
+    path.write_text(SMS_BACKUP, encoding="utf-8")
+    return str(path)
+
+
+def test_users_are_unique_by_normalised_email():
+    user_id = User.create("Alice", "Alice@Example.com", "hash", balance=12.5)
+
+    assert User.create("Other", " alice@example.COM ", "hash") is None
+    user = User.get_by_email("alice@example.com")
+    assert user.to_dict() == {"id": user_id, "name": "Alice", "email": "Alice@Example.com",
+                              "balance": 12.5, "role": "USER"}
+    assert user.password == "hash"
+    assert User.get_by_id(user_id).email == "Alice@Example.com"
+    assert User.get_by_id(user_id + 1) is None
+    assert User.get_by_email("nobody@example.com") is None
+
+
+def test_password_is_only_replaced_if_unchanged():
+    user_id = User.create("Alice", "alice@example.com", "old")
+
+    assert not User.set_password(user_id, "new", expected="stale")
+    assert User.set_password(user_id, "new", expected="old")
+    assert User.get_by_id(user_id).password == "new"
+    assert not User.set_password(user_id + 1, "new", expected="old")
+
+
+def test_transfer_moves_balances(accounts):
+    first, error = Transaction.create(accounts[0], accounts[1], 300)
+    second, _ = Transaction.create(accounts[1], accounts[2], 50.5, "payment")
+
+    assert error is None and second == first + 1
+    assert [User.get_by_id(i).balance for i in accounts] == [700, 1249.5, 1050.5]
+    assert Transaction.get_by_id(second)["amount"] == 50.5
+    assert Transaction.get_by_id(second)["type"] == "payment"
+    assert Transaction.create(accounts[0], accounts[1], 701) == (None, "Insufficient balance")
+    assert Transaction.create(accounts[0], 99, 1) == (None, "Invalid sender or receiver")
+    assert Transaction.create(accounts[0], accounts[1], 1, ["x"]) == (None, INVALID_TYPE)
+    assert [t["id"] for t in Transaction.get_all()] == [first, second]
+
+
+def test_batch_is_all_or_nothing(accounts):
+    a, b, c = accounts
+    results = Transaction.create_batch([(a, b, 600, "transfer"), (a, c, 600, "transfer"), (a, 99, 1, "transfer")])
+
+    assert results == [(None, None), (None, "Insufficient balance"), (None, "Invalid sender or receiver")]
+    assert [User.get_by_id(i).balance for i in accounts] == [1000, 1000, 1000]
+    assert Transaction.get_all() == []
+
+
+def test_batch_sees_balances_left_by_earlier_transfers(accounts):
+    a, b, c = accounts
+    results = Transaction.create_batch([(a, b, 1000, "transfer"), (b, c, 2000, "payment"), (c, a, 0.5, "transfer")])
+
+    assert [error for _, error in results] == [None, None, None]
+    assert [transaction_id for transaction_id, _ in results] == [1, 2, 3]
+    assert [User.get_by_id(i).balance for i in accounts] == [0.5, 0, 2999.5]
+    assert [t["type"] for t in Transaction.get_all()] == ["transfer", "payment", "transfer"]
+    assert Transaction.create(c, a, 1)[0] == 4
+
+
+def test_batch_per_item_results(accounts):
+    a, b, c = accounts
+    results = Transaction.create_batch([(a, b, 600, "transfer"), (a, c, 600, "transfer"), (b, c, 100, "transfer")],
+                                       atomic=False)
+
+    assert results == [(1, None), (None, "Insufficient balance"), (2, None)]
+    assert [User.get_by_id(i).balance for i in accounts] == [400, 1500, 1100]
+    assert [t["amount"] for t in Transaction.get_by_user(c)] == [100]
+
+
+def test_batch_with_an_invalid_type_changes_nothing(accounts):
+    a, b, c = accounts
+    batch = [(a, b, 10, "transfer"), (a, b, 20, {"x": 1}), (a, b, 30, "gift")]
+
+    results = Transaction.create_batch(batch)
+    assert [error is None for _, error in results] == [True, False, False]
+    assert [transaction_id for transaction_id, _ in results] == [None, None, None]
+    assert [User.get_by_id(i).balance for i in accounts] == [1000, 1000, 1000]
+    assert Transaction.get_all() == []
+
+    results = Transaction.create_batch(batch, atomic=False)
+    assert [transaction_id for transaction_id, _ in results] == [1, None, None]
+    assert results[1][1].startswith("Invalid transaction type")
+    assert [User.get_by_id(i).balance for i in accounts] == [990, 1010, 1000]
+
+
+def test_concurrent_transfers_conserve_the_total():
+    accounts = [User.create(f"User {i}", f"user{i}@example.com", "hash", balance=1000) for i in range(8)]
+
+    def transfer(i):
+        rng = random.Random(i)
+        if i % 50:
+            sender, receiver = rng.sample(accounts, 2)
+            return [Transaction.create(sender, receiver, rng.randint(1, 300))]
+        batch = [(*rng.sample(accounts, 2), rng.randint(1, 300), "transfer") for _ in range(5)]
+        return Transaction.create_batch(batch, atomic=bool(i % 100))
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = [result for results in pool.map(transfer, range(3000)) for result in results]
+
+    balances = [User.get_by_id(user_id).balance for user_id in accounts]
+    assert sum(balances) == 8000
+    assert min(balances) >= 0
+    ids = [transaction_id for transaction_id, _ in results if transaction_id]
+    assert len(ids) > 1000
+    assert sorted(ids) == list(range(1, len(ids) + 1))
+    assert sorted(t["id"] for t in Transaction.get_all()) == sorted(ids)
+
+
+def test_update_and_delete(accounts):
+    first, _ = Transaction.create(accounts[0], accounts[1], 10)
+    second, _ = Transaction.create(accounts[1], accounts[2], 20)
+
+    updated, error = Transaction.update(first, accounts[0], "ADMIN", type="payment")
+    assert error is None and updated["type"] == "payment"
+    assert Transaction.get_by_id(first)["type"] == "payment"
+    assert Transaction.update(first, accounts[0], "ADMIN", type="gift")[1].startswith("Invalid transaction type")
+    assert Transaction.update(99, accounts[0], "ADMIN", type="gift") == (None, "Transaction not found")
+    assert Transaction.update(first, accounts[0], "USER", type="payment")[0] is None
+
+    deleted, transaction = Transaction.delete(first, accounts[0], "ADMIN")
+    assert deleted and transaction["id"] == first
+    assert Transaction.get_by_id(first) is None
+    assert Transaction.delete(first, accounts[0], "ADMIN") == (False, "Transaction not found")
+    assert [t["id"] for t in Transaction.get_by_user(accounts[1])] == [second]
+
+
+def test_pages_in_every_order(accounts):
+    amounts = (50, 10, 40, 20, 30)
+    ids = [Transaction.create(accounts[i % 2], accounts[2], amount)[0] for i, amount in enumerate(amounts)]
+    Transaction.update(ids[1], accounts[0], "ADMIN", type="payment")
+    Transaction.update(ids[4], accounts[0], "ADMIN", type="payment")
+
+    def walk(**filters):
+        seen, cursor = [], None
+        while True:
+            page, cursor = Transaction.query(limit=2, cursor=cursor, **filters)
+            seen += [t["id"] for t in page]
+            if cursor is None:
+                return seen
+
+    assert walk() == ids
+    assert walk(type="payment") == [ids[1], ids[4]]
+    assert walk(min_amount=20, max_amount=40) == [ids[3], ids[4], ids[2]]
+    assert walk(min_amount=20, type="transfer") == [ids[3], ids[2], ids[0]]
+    day = Transaction.get_by_id(ids[0])["created_at"][:10]
+    assert walk(created_from=day, created_to=day) == ids
+    assert walk(created_to="2000-01-01") == []
+    assert list(Transaction.iter_all(batch_size=2)) == Transaction.get_all()
+
+
+def test_import_keeps_ids_and_matches_parties_by_name(sms_backup, accounts):
+    assert parse_xml_file(sms_backup) == 3
+    parse_xml_file(sms_backup)  # a second import replaces the first
+
+    assert [t["id"] for t in Transaction.get_all()] == [76662021700, 1, 2]
+    assert [t["id"] for t in Transaction.get_by_user(name="Jane Smith")] == [76662021700, 1]
+    assert [t["id"] for t in Transaction.get_by_user(accounts[0])] == [76662021700, 1, 2]
+    assert Transaction.get_by_user(name="Nobody") == []
+    # New transfers are numbered after the imported records
+    assert Transaction.create(accounts[0], accounts[1], 1)[0] == 3
+
+
+def test_revoked_tokens_until_they_expire():
+    database.block_token("revoked", time.time() + 3600)
+    database.block_token("expired", time.time() - 1)
+
+    assert database.is_token_blocked("revoked")
+    assert not database.is_token_blocked("expired")
+    assert not database.is_token_blocked("other")
+
+
+def test_handlers(mock_handler_factory):
+    handler = mock_handler_factory(body={"name": "Ann", "email": "ann@example.com", "password": "pw",
+                                         "balance": 100.0})
+    handle_register(handler)
+    assert handler.status_code == 201
+    ann = handler.get_response_body()["id"]
+    bob = User.create("Bob", "bob@example.com", "hash")
+    Transaction.create(ann, bob, 40.0)
+
+    token = create_jwt_token(ann, "USER")
+    handler = mock_handler_factory(token=token, path="/transactions/?limit=1")
+    handle_get_transactions(handler)
+    assert [t["amount"] for t in handler.get_response_body()] == [40.0]
+
+    handler = mock_handler_factory(token=token, path="/transactions/me")
+    handle_get_my_transactions(handler)
+    assert [t["receiver_id"] for t in handler.get_response_body()] == [bob]
+
+
+def test_add_endpoint_rejects_an_invalid_type(accounts, mock_handler_factory):
+    body = {"senderId": accounts[0], "receiverId": accounts[1], "amount": 10, "type": ["x"]}
+    handler = mock_handler_factory(body=body, token=create_jwt_token(accounts[0], "USER"))
+
+    handle_add_transaction(handler)
+
+    assert handler.status_code == 400
+    assert handler.get_response_body()["message"] == INVALID_TYPE
+    assert [User.get_by_id(i).balance for i in accounts] == [1000, 1000, 1000]
+    assert Transaction.get_all() == []
+
+
+def post_batch(mock_handler_factory, body):
+    handler = mock_handler_factory(body=body, token=create_jwt_token(1, "USER"))
+    handle_add_transaction_batch(handler)
+    return handler.status_code, handler.get_response_body()
+
+
+def test_batch_endpoint(mock_handler_factory, accounts):
+    transfers = [{"senderId": 1, "receiverId": 2, "amount": 700}, {"senderId": 1, "receiverId": 3, "amount": 700}]
+
+    status, body = post_batch(mock_handler_factory, {"transfers": transfers})
+    assert status == 400
+    assert body == {"message": "No transactions were made", "errors": [{"index": 1, "message": "Insufficient balance"}]}
+
+    status, body = post_batch(mock_handler_factory, {"transfers": transfers, "atomic": False})
+    assert status == 200
+    assert body == {"results": [{"id": 1}, {"message": "Insufficient balance"}], "successful": 1}
+
+    status, body = post_batch(mock_handler_factory, {"transfers": [{"senderId": 2, "receiverId": 3, "amount": 5,
+                                                                    "type": "payment"}] * 3})
+    assert status == 201
+    assert body == {"ids": [2, 3, 4], "message": "Transactions successful"}
+
+
+@pytest.mark.parametrize("body, message", [
+    ({}, "transfers must be a list of 1 to 10000 transfers"),
+    ({"transfers": []}, "transfers must be a list of 1 to 10000 transfers"),
+    ({"transfers": [{"senderId": 1, "receiverId": 2, "amount": 1}, 5]}, "transfers[1]: must be an object"),
+    ({"transfers": [{"senderId": "1", "receiverId": 2, "amount": 1}]},
+     "transfers[0]: senderId and receiverId must be integers"),
+    ({"transfers": [{"senderId": 1, "receiverId": 2, "amount": -5}]}, "transfers[0]: amount must be a positive number"),
+    ({"transfers": [{"senderId": 1, "receiverId": 2, "amount": 5, "type": {"x": 1}}]},
+     "transfers[0]: type must be one of: transfer, payment, withdrawal, deposit"),
+])
+def test_batch_endpoint_rejects_malformed_bodies(mock_handler_factory, accounts, body, message):
+    assert post_batch(mock_handler_factory, body) == (400, {"message": message})
+    assert Transaction.get_all() == []
+
+
+def test_prefork_store_process(store):
+    sender = User.create("Sender", "sender@example.com", "", balance=1000.0)
+    User.create("Receiver", "receiver@example.com", "", balance=0.0)
+    httpd = PreforkServer(('127.0.0.1', 0), QuietHandler, processes=2, workers=2, keep_alive=1.0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        headers = {"Authorization": f"Bearer {create_jwt_token(sender, 'USER')}"}
+        for _ in range(3):
+            conn = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+            conn.request('POST', '/transactions/', body=json.dumps({"senderId": 1, "receiverId": 2, "amount": 10}),
+                         headers=headers)
+            assert conn.getresponse().status == 201
+            conn.close()
+    finally:
+        httpd.shutdown()
+        thread.join()
+        httpd.server_close()
+
+    # The store process wrote to the shared database file; the memory store's copy was forked away
+    expected = 3 if store.name == 'sqlite' else 0
+    assert len(Transaction.get_all()) == expected
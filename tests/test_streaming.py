@@ -0,0 +1,69 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import database
+from conftest import MockHandler
+from api.handlers.transactions import handle_get_transactions
+from api.models.transaction import Transaction
+from engines.asyncio_engine import AsyncHTTPServer
+from engines.threadpool import PooledHTTPServer
+from server import APIRRequestHandler
+from utils import create_jwt_token, json_stream_response
+
+
+class QuietHandler(APIRRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def ledger():
+    database.users[1] = {"id": 1, "name": "Sender", "role": "USER", "balance": 10 ** 9}
+    database.users[2] = {"id": 2, "name": "Receiver", "role": "USER", "balance": 0}
+    for amount in range(1, 2501):
+        Transaction.create(1, 2, amount)
+    return [dict(t) for t in Transaction.get_all()]
+
+
+def test_full_listing_is_streamed_in_ledger_order(mock_handler_factory, ledger):
+    handler = mock_handler_factory(token=create_jwt_token(1, "USER"), path="/transactions/")
+
+    handle_get_transactions(handler)
+
+    assert handler.status_code == 200
+    assert handler.get_response_body() == ledger
+
+
+def test_http_1_0_clients_get_a_connection_delimited_body():
+    handler = MockHandler()
+
+    json_stream_response(handler, 200, iter([{"id": 1}, {"id": 2}]), chunk_size=4)
+
+    assert "Transfer-Encoding" not in handler.response_headers
+    assert handler.response_headers["Connection"] == "close"
+    assert handler.close_connection
+    assert handler.get_response_body() == [{"id": 1}, {"id": 2}]
+
+
+@pytest.mark.parametrize("server_class", [PooledHTTPServer, AsyncHTTPServer])
+def test_chunked_listing_over_keep_alive(server_class, ledger):
+    httpd = server_class(('127.0.0.1', 0), QuietHandler, workers=2)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    conn = http.client.HTTPConnection('127.0.0.1', httpd.server_address[1], timeout=10)
+    headers = {"Authorization": f"Bearer {create_jwt_token(1, 'USER')}"}
+    for _ in range(2):
+        conn.request('GET', '/transactions/', headers=headers)
+        response = conn.getresponse()
+        assert response.status == 200
+        assert response.getheader('Transfer-Encoding') == 'chunked'
+        assert json.loads(response.read()) == ledger
+    conn.close()
+
+    httpd.shutdown()
+    thread.join()
+    httpd.server_close()
@@ -0,0 +1,88 @@
+import database
+import utils
+from api.handlers.auth import handle_logout
+from api.handlers.metrics import handle_get_metrics
+from api.handlers.transactions import handle_get_my_transactions
+from dsa.token_cache import TokenCache
+from utils import create_jwt_token
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_are_dropped_at_exp():
+    clock = Clock()
+    cache = TokenCache(clock=clock)
+    cache.put("token", {"user_id": 1, "exp": 1060})
+
+    assert cache.get("token") == {"user_id": 1, "exp": 1060}
+    clock.now = 1060
+    assert cache.get("token") is None
+    assert "token" not in cache.entries
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TokenCache(maxsize=2)
+    cache.put("a", {"exp": None})
+    cache.put("b", {"exp": None})
+    cache.get("a")
+    cache.put("c", {"exp": None})
+
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["hit_rate"]) == (1, 1, 1, 0.5)
+
+
+def test_size_zero_disables_caching():
+    cache = TokenCache(maxsize=0)
+    cache.put("token", {"exp": None})
+
+    assert cache.get("token") is None
+
+
+def request(mock_handler_factory, handler_func, token, path="/"):
+    handler = mock_handler_factory(token=token, path=path)
+    handler_func(handler)
+    return handler
+
+
+def test_repeated_requests_decode_the_token_once(mock_handler_factory, monkeypatch):
+    database.users[1] = {"id": 1, "name": "Admin", "role": "ADMIN", "balance": 0}
+    token = create_jwt_token(1, "ADMIN")
+    decoded = []
+    decode = utils.decode_jwt_token
+    monkeypatch.setattr(utils, "decode_jwt_token", lambda token: decoded.append(token) or decode(token))
+
+    for _ in range(3):
+        assert request(mock_handler_factory, handle_get_my_transactions, token).status_code == 200
+
+    assert decoded == [token]
+    stats = request(mock_handler_factory, handle_get_metrics, token).get_response_body()["jwt_cache"]
+    assert (stats["size"], stats["hits"], stats["misses"]) == (1, 3, 1)
+
+
+def test_logout_invalidates_the_cached_token(mock_handler_factory):
+    token = create_jwt_token(1, "USER")
+    assert request(mock_handler_factory, handle_get_my_transactions, token).status_code == 200
+    assert token in utils.token_cache.entries
+
+    assert request(mock_handler_factory, handle_logout, token).status_code == 200
+
+    assert token not in utils.token_cache.entries
+    handler = request(mock_handler_factory, handle_get_my_transactions, token)
+    assert handler.status_code == 401
+    assert handler.get_response_body()["message"] == "Token has been blacklisted"
+
+
+def test_invalid_tokens_are_not_cached(mock_handler_factory):
+    handler = request(mock_handler_factory, handle_get_my_transactions, "not-a-token")
+
+    assert handler.status_code == 401
+    assert not utils.token_cache.entries
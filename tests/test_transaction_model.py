@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import database
+from api.models.transaction import Transaction
+from dsa.transaction_record import TransactionRecord
+from dsa.xml_parser import parse_xml_file
+
+SMS_BACKUP = """<?xml version='1.0' encoding='utf-8'?>
+<smses count="3">
+  <sms body="You have received 2000 RWF from Jane Smith (*********013) on your mobile money account at 2024-05-10 16:30:51. Message from sender: . Your new balance:2000 RWF. Financial Transaction Id: 76662021700." />
+  <sms body="TxId: 73214484437. Your payment of 1,000 RWF to Jane Smith 12845 has been completed at 2024-05-10 16:31:39. Your new balance: 1,000 RWF. Fee was 0 RWF." />
+  <sms body="TxId: 51732411227. Your payment of 600 RWF to Samuel Carter 95464 has been completed at 2024-05-10 21:32:32. Your new balance: 400 RWF. Fee was 0 RWF." />
+</smses>
+"""
+
+
+@pytest.fixture
+def accounts():
+    for user_id in (1, 2, 3, 4):
+        database.users[user_id] = {"id": user_id, "name": f"User {user_id}", "role": "USER", "balance": 1000}
+
+
+@pytest.fixture
+def sms_backup(tmp_path):
+    path = tmp_path / "sms.xml"
+    path.write_text(SMS_BACKUP, encoding="utf-8")
+    return str(path)
+
+
+def test_get_by_user_returns_sent_and_received_in_order(accounts):
+    first, _ = Transaction.create(1, 2, 10)
+    Transaction.create(2, 3, 20)
+    third, _ = Transaction.create(3, 1, 30)
+    fourth, _ = Transaction.create(1, 3, 40)
+
+    assert [t['id'] for t in Transaction.get_by_user(1)] == [first, third, fourth]
+
+
+def test_get_by_user_forgets_deleted_transactions(accounts):
+    first, _ = Transaction.create(1, 2, 10)
+    second, _ = Transaction.create(2, 1, 20)
+
+    Transaction.delete(first, 1, "ADMIN")
+
+    assert [t['id'] for t in Transaction.get_by_user(1)] == [second]
+    assert [t['id'] for t in Transaction.get_by_user(2)] == [second]
+    assert database.transactions_by_sender.get(1) is None
+
+
+def test_get_by_user_matches_imported_records_by_name(sms_backup):
+    parse_xml_file(sms_backup)
+
+    assert [t['id'] for t in Transaction.get_by_user()] == [76662021700, 73214484437, 51732411227]
+    assert [t['id'] for t in Transaction.get_by_user(name="Jane Smith")] == [76662021700, 73214484437]
+    assert Transaction.get_by_user(name="Nobody") == []
+
+
+def test_get_update_delete_by_id(accounts):
+    first, _ = Transaction.create(1, 2, 10)
+    second, _ = Transaction.create(2, 3, 20)
+    third, _ = Transaction.create(3, 1, 30)
+
+    assert Transaction.get_by_id(second)['amount'] == 20
+    assert Transaction.get_by_id_indexed(second) is Transaction.get_by_id(second)
+
+    updated, error = Transaction.update(second, 1, "ADMIN", type="payment")
+    assert error is None
+    assert Transaction.get_by_id(second)['type'] == "payment"
+
+    deleted, result = Transaction.delete(second, 1, "ADMIN")
+    assert deleted and result['id'] == second
+    assert Transaction.get_by_id(second) is None
+    assert Transaction.delete(second, 1, "ADMIN") == (False, "Transaction not found")
+    assert Transaction.update(second, 1, "ADMIN", type="payment") == (None, "Transaction not found")
+
+    assert [t['id'] for t in Transaction.get_all()] == [first, third]
+
+
+def test_transfers_between_other_accounts_do_not_wait(accounts):
+    pool = ThreadPoolExecutor(max_workers=2)
+    with database.locked_accounts([1, 2]):
+        waiting = pool.submit(Transaction.create, 1, 2, 10)
+        other = pool.submit(Transaction.create, 3, 4, 10)
+        assert other.result(timeout=5) == (1, None)
+        assert not waiting.done()
+    assert waiting.result(timeout=5) == (2, None)
+    pool.shutdown()
+    assert [database.users[i]["balance"] for i in (1, 2, 3, 4)] == [990, 1010, 990, 1010]
+
+
+def test_failed_indexing_takes_the_whole_batch_out_again():
+    good = TransactionRecord(id=1, amount=5, type="transfer", created_at="2024-05-10", sender_id=1, receiver_id=2)
+    bad = TransactionRecord(id=2, amount=5, type={"x": 1}, created_at="2024-05-10", sender_id=1, receiver_id=2)
+
+    with pytest.raises(TypeError):
+        database.add_transactions([good, bad])
+
+    assert database.transactions == {}
+    assert database.transactions_by_sender == {} and database.transactions_by_type == {}
+    assert len(database.transactions_by_sequence) == len(database.transactions_by_amount) == 0
+
+
+def test_a_transfer_that_cant_be_indexed_moves_nothing(accounts):
+    with pytest.raises(TypeError):
+        database.store.transfer(1, 2, 10, ["x"], "2024-05-10")
+
+    assert [database.users[i]["balance"] for i in (1, 2)] == [1000, 1000]
+    assert database.transactions == {} and database.transactions_by_sender == {}
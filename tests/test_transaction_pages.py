@@ -0,0 +1,104 @@
+import pytest
+
+import database
+from api.handlers.transactions import handle_get_transactions
+from api.models.transaction import Transaction
+from storage.base import encode_cursor
+from utils import create_jwt_token
+
+
+@pytest.fixture
+def ledger():
+    """Transfers 1..12 with amounts 10, 20, ... 120, alternating senders."""
+    for user_id in (1, 2):
+        database.users[user_id] = {"id": user_id, "name": f"User {user_id}", "role": "USER", "balance": 10000}
+    ids = []
+    for i in range(1, 13):
+        sender, receiver = (1, 2) if i % 2 else (2, 1)
+        ids.append(Transaction.create(sender, receiver, i * 10)[0])
+    return ids
+
+
+def fetch(mock_handler_factory, path):
+    handler = mock_handler_factory(token=create_jwt_token(1, "USER"), path=path)
+    handle_get_transactions(handler)
+    return handler
+
+
+def test_cursor_walks_the_ledger_in_order(mock_handler_factory, ledger):
+    seen, path = [], "/transactions/?limit=5"
+    for _ in range(3):
+        handler = fetch(mock_handler_factory, path)
+        assert handler.status_code == 200
+        seen += [t["id"] for t in handler.get_response_body()]
+        cursor = handler.response_headers.get("X-Next-Cursor")
+        path = f"/transactions/?limit=5&cursor={cursor}"
+
+    assert seen == ledger
+    assert cursor is None
+
+
+def test_amount_range_is_served_in_amount_order():
+    database.users[1] = {"id": 1, "name": "A", "role": "USER", "balance": 1000}
+    database.users[2] = {"id": 2, "name": "B", "role": "USER", "balance": 1000}
+    for amount in (50, 10, 40, 20, 30):
+        Transaction.create(1, 2, amount)
+
+    page, cursor = Transaction.query(limit=2, min_amount=20, max_amount=40)
+    assert [t["amount"] for t in page] == [20, 30]
+
+    page, cursor = Transaction.query(limit=2, min_amount=20, max_amount=40, cursor=cursor)
+    assert [t["amount"] for t in page] == [40]
+    assert cursor is None
+
+
+def test_type_filter_follows_updates(ledger):
+    Transaction.update(ledger[3], 1, "ADMIN", type="payment")
+    Transaction.update(ledger[7], 1, "ADMIN", type="payment")
+
+    page, _ = Transaction.query(limit=10, type="payment")
+    assert [t["id"] for t in page] == [ledger[3], ledger[7]]
+
+    page, _ = Transaction.query(limit=20, type="transfer")
+    assert len(page) == 10
+
+
+def test_created_at_range_is_inclusive_by_day(ledger):
+    day = database.transactions[ledger[0]]["created_at"][:10]
+
+    page, _ = Transaction.query(limit=100, created_from=day, created_to=day)
+    assert len(page) == 12
+
+    page, _ = Transaction.query(limit=100, created_to="2000-01-01")
+    assert page == []
+
+
+def test_filters_combine_with_deleted_transactions(ledger):
+    Transaction.delete(ledger[5], 1, "ADMIN")
+
+    page, _ = Transaction.query(limit=100, min_amount=50, max_amount=70)
+    assert [t["amount"] for t in page] == [50, 70]
+
+
+@pytest.mark.parametrize("query, message", [
+    ("limit=0", "limit must be between 1 and 1000"),
+    ("limit=ten", "limit must be an integer"),
+    ("min_amount=lots", "min_amount must be a number"),
+    ("cursor=not-a-cursor", "Invalid cursor"),
+    (f"min_amount=10&cursor={encode_cursor('amount', ['zzz', 1, 1])}", "Invalid cursor"),
+    (f"created_from=2024&cursor={encode_cursor('created_at', [5, 1, 1])}", "Invalid cursor"),
+    (f"cursor={encode_cursor('ledger', [1, '1', 1])}", "Invalid cursor"),
+    (f"cursor={encode_cursor('ledger', [1, 1, None])}", "Invalid cursor"),
+])
+def test_invalid_page_parameters(mock_handler_factory, ledger, query, message):
+    handler = fetch(mock_handler_factory, f"/transactions/?{query}")
+
+    assert handler.status_code == 400
+    assert handler.get_response_body()["message"] == message
+
+
+def test_cursor_from_another_ordering_is_rejected(ledger):
+    _, cursor = Transaction.query(limit=2)
+
+    with pytest.raises(ValueError):
+        Transaction.query(limit=2, min_amount=10, cursor=cursor)
@@ -0,0 +1,47 @@
+import json
+import pickle
+
+import pytest
+
+import database
+from api.models.transaction import Transaction
+from dsa.transaction_record import TransactionRecord
+from utils import encode_json
+
+
+def test_api_transfer_serialises_like_the_old_dict():
+    database.users[1] = {"id": 1, "name": "A", "role": "USER", "balance": 100}
+    database.users[2] = {"id": 2, "name": "B", "role": "USER", "balance": 0}
+    transaction_id, _ = Transaction.create(1, 2, 40)
+
+    record = database.transactions[transaction_id]
+    assert isinstance(record, TransactionRecord)
+    assert list(json.loads(encode_json(record))) == ['id', 'sender_id', 'receiver_id', 'amount', 'type', 'created_at']
+    assert "sender" not in record and record.get("sender") is None
+
+
+def test_imported_record_keeps_names_and_interns_them():
+    first = TransactionRecord(1, 10, ''.join(['pay', 'ment']), '', sender='Me', receiver=''.join(['Jane ', 'Smith']))
+    second = TransactionRecord(2, 20, 'payment', '', sender='Me', receiver='Jane Smith')
+
+    assert dict(first) == {'id': 1, 'sender': 'Me', 'receiver': 'Jane Smith',
+                           'amount': 10, 'type': 'payment', 'created_at': ''}
+    assert first['type'] is second['type']
+    assert first['receiver'] is second['receiver']
+
+
+def test_record_rejects_unknown_fields():
+    record = TransactionRecord(1, 10, 'transfer', '', sender_id=1, receiver_id=2)
+
+    with pytest.raises(KeyError):
+        record['note'] = 'x'
+    with pytest.raises(KeyError):
+        record['sender']
+
+
+def test_record_survives_pickling_with_its_sequence():
+    record = TransactionRecord(1, 10, 'transfer', '', sender_id=1, receiver_id=2)
+    record.sequence = 7
+
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy == record and copy.sequence == 7
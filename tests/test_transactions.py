@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import MagicMock
-from handlers.transactions import (
+from api.handlers.transactions import (
     handle_add_transaction,
     handle_get_transactions,
     handle_get_transaction_by_id,
@@ -10,7 +10,7 @@ from handlers.transactions import (
 )
 import database
 from utils import create_jwt_token
-from models.transaction import Transaction
+from api.models.transaction import Transaction
 
 
 @pytest.fixture
@@ -49,8 +49,8 @@ def test_add_transaction_success(mock_handler_factory, auth_setup, monkeypatch):
     assert response["id"] == 1
 
 
-def test_get_transactions_success(mock_handler_factory, auth_setup, monkeypatch):
-    database.transactions = [{"id": 1, "sender_id": 1, "amount": 100.0}]
+def test_get_transactions_success(mock_handler_factory, auth_setup):
+    transaction_id, _ = Transaction.create(1, 2, 100.0)
     handler = mock_handler_factory(
         user_id=1,
         user_role="USER",
@@ -58,15 +58,14 @@ def test_get_transactions_success(mock_handler_factory, auth_setup, monkeypatch)
         token=auth_setup
     )
 
-    monkeypatch.setattr(Transaction, "get_all", MagicMock(
-        return_value=database.transactions))
-
     handle_get_transactions(handler)
 
     assert handler.status_code == 200
     response = handler.get_response_body()
     assert len(response) == 1
-    assert response[0]["id"] == 1
+    assert response[0]["id"] == transaction_id
+    assert response[0]["sender_id"] == 1
+    assert response[0]["amount"] == 100.0
 
 
 def test_get_my_transactions_success(mock_handler_factory, auth_setup, monkeypatch):
@@ -133,7 +132,7 @@ def test_get_transaction_by_id_indexed_success(mock_handler_factory, auth_setup,
         token=auth_setup
     )
 
-    from handlers.transactions import handle_get_transaction_by_id_indexed
+    from api.handlers.transactions import handle_get_transaction_by_id_indexed
     monkeypatch.setattr(Transaction, "get_by_id_indexed",
                         MagicMock(return_value=transaction))
 
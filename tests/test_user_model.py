@@ -0,0 +1,24 @@
+import database
+from api.models.user import User
+
+
+def test_get_by_email_ignores_case_and_whitespace():
+    user_id = User.create("Jane", "Jane@Example.com", "hashed")
+
+    user = User.get_by_email("  jane@example.COM ")
+
+    assert user.id == user_id
+    assert user.email == "Jane@Example.com"
+
+
+def test_create_rejects_duplicate_email_in_any_case():
+    assert User.create("Jane", "jane@example.com", "hashed") == 1
+    assert User.create("Other Jane", "JANE@example.com", "hashed") is None
+    assert len(database.users) == 1
+
+
+def test_get_by_email_unknown_user():
+    User.create("Jane", "jane@example.com", "hashed")
+
+    assert User.get_by_email("john@example.com") is None
+    assert User.get_by_email(None) is None
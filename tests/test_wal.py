@@ -0,0 +1,157 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import database
+import server
+import snapshot
+import wal
+from api.models.transaction import Transaction
+from api.models.user import User
+
+
+def store_state():
+    return {
+        "users": {k: dict(v) for k, v in database.users.items()},
+        "users_by_email": dict(database.users_by_email),
+        "transactions": [dict(t) for t in database.transactions.values()],
+        "payments": [t["id"] for t in Transaction.query(limit=100, type="payment")[0]],
+        "revoked_tokens": dict(database.revoked_tokens.expiry),
+        "counters": (database.user_id_counter, database.transaction_ids.next_id, database.applied_lsn),
+    }
+
+
+def crash():
+    """Drop the in-memory store as a crash would"""
+    database.wal.file.close()
+    database.wal = None
+    for name in snapshot.STATE:
+        value = getattr(database, name)
+        setattr(database, name, 0 if isinstance(value, int) else type(value)())
+
+
+def crash_and_restart(wal_path, snapshot_path=None):
+    """Drop the in-memory store as a crash would, then recover it from disk"""
+    crash()
+    if snapshot_path:
+        assert snapshot.load(snapshot_path)
+    return wal.recover(wal_path)
+
+
+def make_changes(start=0):
+    alice = User.create(f"Alice {start}", f"alice{start}@example.com", "hash", balance=100)
+    bob = User.create(f"Bob {start}", f"bob{start}@example.com", "hash", balance=0)
+    ids = [Transaction.create(alice, bob, amount)[0] for amount in (10, 20, 30)]
+    Transaction.update(ids[0], alice, "ADMIN", type="payment")
+    Transaction.delete(ids[1], alice, "ADMIN")
+    database.block_token(f"token-{start}", time.time() + 3600)
+    User.set_password(alice, "rehashed", expected="hash")
+
+
+@pytest.mark.parametrize("fsync", wal.FSYNC_POLICIES)
+def test_every_change_is_replayed_after_a_crash(tmp_path, fsync):
+    path = str(tmp_path / "momo.wal")
+    wal.attach(path, fsync=fsync, interval=0.01)
+    make_changes()
+    database.wal.sync()
+    expected = store_state()
+
+    assert crash_and_restart(path) == 9
+    assert store_state() == expected
+
+
+def test_replay_starts_after_the_snapshot(tmp_path):
+    wal_path, snapshot_path = str(tmp_path / "momo.wal"), str(tmp_path / "momo.snapshot")
+    wal.attach(wal_path, fsync="always")
+    make_changes(0)
+    snapshot.save(snapshot_path)
+    assert os.path.getsize(wal_path) == 0
+
+    make_changes(1)
+    expected = store_state()
+
+    assert crash_and_restart(wal_path, snapshot_path) == 9
+    assert store_state() == expected
+
+
+def test_log_written_after_a_lost_snapshot_is_set_aside(tmp_path):
+    wal_path, snapshot_path = str(tmp_path / "momo.wal"), str(tmp_path / "momo.snapshot")
+    wal.attach(wal_path, fsync="always")
+    make_changes(0)
+    snapshot.save(snapshot_path)
+    make_changes(1)
+    os.remove(snapshot_path)
+
+    with pytest.raises(wal.LogMismatch):
+        crash_and_restart(wal_path)
+
+    assert database.users == {} and database.applied_lsn == 0
+    assert not os.path.exists(wal_path)
+    assert os.path.exists(f"{wal_path}.from-10.orphaned")
+
+
+def test_corrupt_snapshot_starts_from_the_seed_without_replaying(tmp_path):
+    wal_path, snapshot_path = str(tmp_path / "momo.wal"), str(tmp_path / "momo.snapshot")
+    wal.attach(wal_path, fsync="always")
+    make_changes(0)
+    snapshot.save(snapshot_path)
+    make_changes(1)
+    crash()
+    with open(snapshot_path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"?")
+
+    server.load_data(snapshot_path, wal_path)
+
+    assert database.transactions and not database.users
+    assert not os.path.exists(wal_path)
+
+
+def test_batch_transfers_are_replayed(tmp_path):
+    path = str(tmp_path / "momo.wal")
+    wal.attach(path, fsync="group", interval=0.01)
+    alice = User.create("Alice", "alice@example.com", "hash", balance=100)
+    bob = User.create("Bob", "bob@example.com", "hash", balance=0)
+    Transaction.create_batch([(alice, bob, 10.5, "transfer"), (bob, alice, 0.25, "payment")])
+    Transaction.create_batch([(alice, bob, 1, "transfer"), (alice, bob, 1000, "transfer")], atomic=False)
+    expected = store_state()
+
+    assert crash_and_restart(path) == 5
+    assert store_state() == expected
+
+
+def test_torn_tail_is_cut_off(tmp_path):
+    path = str(tmp_path / "momo.wal")
+    wal.attach(path, fsync="always")
+    make_changes()
+    expected = store_state()
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(wal.encode_entry(99, "revoke", ("half-written",))[:-3])
+
+    crash_and_restart(path)
+
+    assert store_state() == expected
+    assert os.path.getsize(path) == size
+
+
+def test_group_commit_shares_fsyncs(tmp_path, monkeypatch):
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(wal.os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd)))
+    wal.attach(str(tmp_path / "momo.wal"), fsync="group")
+    alice = User.create("Alice", "alice@example.com", "hash", balance=1000)
+    bob = User.create("Bob", "bob@example.com", "hash", balance=1000)
+
+    def transfer(i):
+        transaction_id, _ = Transaction.create(*((alice, bob) if i % 2 else (bob, alice)), 1)
+        # Acknowledged only once the fsync covering it is done
+        return database.wal.synced_lsn >= transaction_id + 2
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert all(pool.map(transfer, range(400)))
+
+    assert database.wal.synced_lsn == database.wal.written_lsn == 402
+    assert len(fsyncs) < 402
@@ -0,0 +1,76 @@
+import os
+import tracemalloc
+
+import database
+from dsa.xml_parser import iter_parsed, iter_sms_bodies, parse_xml_file
+
+RECEIVED = ("You have received {amount} RWF from Jane Smith (*********013) on your mobile money account "
+            "at 2024-05-10 16:30:51. Message from sender: . Your new balance:2000 RWF. "
+            "Financial Transaction Id: {tx}.")
+PAYMENT = ("TxId: {tx}. Your payment of {amount} RWF to Samuel Carter 95464 has been completed "
+           "at 2024-05-10 21:32:32. Your new balance: 400 RWF. Fee was 0 RWF.")
+AIRTIME = ("*162*TxId:{tx}*S*Your payment of {amount} RWF to Airtime with token  has been completed "
+           "at 2024-05-12 11:41:28. Fee was 0 RWF. Your new balance: 25280 RWF .*EN#")
+
+
+def write_backup(path, messages):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<?xml version='1.0' encoding='utf-8'?>\n<smses>\n")
+        for i in range(messages):
+            template = (RECEIVED, PAYMENT, AIRTIME)[i % 3]
+            body = template.format(amount=i + 1, tx=10 ** 10 + i)
+            f.write(f'  <sms protocol="0" address="M-Money" body="{body}" />\n')
+        f.write("</smses>\n")
+    return str(path)
+
+
+def test_batches_are_stored_and_reported(tmp_path):
+    path = write_backup(tmp_path / "sms.xml", 2500)
+    reports = []
+
+    count = parse_xml_file(path, batch_size=1000, progress=lambda *report: reports.append(report))
+
+    assert count == len(database.transactions) == 2500
+    assert [report[0] for report in reports] == [1000, 2000, 2500]
+    assert reports[-1][1] == reports[-1][2]
+    assert list(database.transactions)[:2] == [10 ** 10, 10 ** 10 + 1]
+
+
+def test_memory_stays_flat_while_reading(tmp_path):
+    small = write_backup(tmp_path / "small.xml", 2000)
+    large = write_backup(tmp_path / "large.xml", 40000)
+
+    def peak(path):
+        tracemalloc.start()
+        for _ in iter_sms_bodies(path):
+            pass
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak_bytes
+
+    assert peak(large) < 2 * peak(small)
+
+
+SEED_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dsa", "modified_sms_v2.xml")
+
+
+def load(path, **options):
+    database.transactions = {}
+    parse_xml_file(path, **options)
+    return [dict(t) for t in database.transactions.values()], database.transaction_ids.next_id
+
+
+def test_parallel_import_matches_serial_import():
+    serial = load(SEED_FILE)
+    parallel = load(SEED_FILE, processes=2)
+
+    assert parallel == serial
+
+
+def test_parallel_chunks_come_back_in_file_order(tmp_path):
+    path = write_backup(tmp_path / "sms.xml", 1000)
+
+    serial = list(iter_parsed(path))
+    parallel = list(iter_parsed(path, processes=2, chunk_size=64))
+
+    assert [parsed for parsed, _ in parallel] == [parsed for parsed, _ in serial]
@@ -1,33 +1,62 @@
-import json
+import urllib.parse
 import bcrypt
 import jwt
 import datetime
+import hashlib
 import os
+import secrets
+import zlib
 from dotenv import load_dotenv
 
+import json_codec
+from dsa.token_cache import TokenCache
+
 # Load environment variables from .env file
 load_dotenv()
 
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY")
 
+# Verified payloads of recently used tokens, per process
+token_cache = TokenCache()
+
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_SIZE = 1024
+COMPRESSION_LEVEL = 6
+# zlib window bits that produce each Content-Encoding's framing
+ENCODING_WBITS = {'gzip': 31, 'deflate': 15}
+
+# Differs on every start, so an ETag issued before a restart never matches
+ETAG_EPOCH = secrets.token_hex(8)
+
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def hash_password(password, rounds=12):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
 
 
 def check_password(password, hashed_password):
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
+def password_rounds(hashed_password):
+    """The bcrypt cost a hash was made with: '$2b$12$...' -> 12"""
+    return int(hashed_password.split('$')[2])
+
+
 def create_jwt_token(user_id, role):
     payload = {
         'user_id': user_id,
         'role': role,
+        'jti': secrets.token_urlsafe(12),  # what a logout revokes
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=1)
     }
     return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
 
+def token_id(payload, token):
+    """The id a token is revoked by: its jti, or a digest of the token for tokens issued without one"""
+    return payload.get('jti') or hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+
 def decode_jwt_token(token):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
@@ -38,37 +67,173 @@ def decode_jwt_token(token):
         return None  # Invalid token
 
 
+def verify_jwt_token(token):
+    """decode_jwt_token, answered from token_cache for a token verified before"""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_jwt_token(token)
+        if payload:
+            token_cache.put(token, payload)
+    return payload
+
+
 def jwt_required(handler_func):
     def wrapper(handler, *args, **kwargs):
-        from database import users, blocked_tokens
+        import database
 
         token = handler.headers.get('Authorization', '').replace('Bearer ', '')
         if not token:
             return json_response(handler, 401, {"message": "Authentication token is missing"})
 
-        if token in blocked_tokens:
-            return json_response(handler, 401, {"message": "Token has been blacklisted"})
-
-        payload = decode_jwt_token(token)
+        payload = verify_jwt_token(token)
         if not payload:
             return json_response(handler, 401, {"message": "Invalid or expired token"})
 
+        revocation_id = token_id(payload, token)
+        if database.is_token_blocked(revocation_id):
+            return json_response(handler, 401, {"message": "Token has been blacklisted"})
+
         handler.user_id = payload['user_id']
         handler.user_role = payload['role']
+        handler.token_id = revocation_id
+        handler.token_expires = payload['exp']
 
         # Get user's name for transaction display
-        user_data = users.get(payload['user_id'])
+        user_data = database.get_user(payload['user_id'])
         handler.user_name = user_data['name'] if user_data else 'Me'
 
         return handler_func(handler, *args, **kwargs)
     return wrapper
 
 
-def json_response(handler, status_code, data):
+def encode_json(data):
+    return json_codec.encode(data)
+
+
+def accepted_encoding(handler):
+    """'gzip' or 'deflate' if the client's Accept-Encoding takes it (gzip preferred), else None"""
+    accepted, refused = set(), set()
+    for item in handler.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    # Refused by name: '*' doesn't bring it back
+                    refused.add(name)
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name)
+    for encoding in ENCODING_WBITS:
+        if encoding in accepted or ('*' in accepted and encoding not in refused):
+            return encoding
+    return None
+
+
+def compressor(encoding):
+    return zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, ENCODING_WBITS[encoding])
+
+
+def etag(*parts):
+    """Weak ETag of a response that is fully determined by `parts`"""
+    digest = hashlib.sha256(repr((ETAG_EPOCH,) + parts).encode('utf-8')).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def not_modified(handler, tag):
+    """
+    If the request's If-None-Match already names `tag`, answer 304 Not Modified
+    and return True; the caller then skips building the response.
+    """
+    if_none_match = handler.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    # Weak comparison: W/ prefixes are ignored
+    tags = {candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')}
+    if '*' not in tags and tag.removeprefix('W/') not in tags:
+        return False
+    handler.send_response(304)
+    handler.send_header('ETag', tag)
+    handler.end_headers()
+    return True
+
+
+def json_response(handler, status_code, data, headers=None):
+    body = encode_json(data)
+    compressible = len(body) >= COMPRESS_MIN_SIZE
+    encoding = accepted_encoding(handler) if compressible else None
+    if encoding:
+        compress = compressor(encoding)
+        body = compress.compress(body) + compress.flush()
+    handler.send_response(status_code)
+    handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Content-Length', str(len(body)))
+    if compressible:
+        handler.send_header('Vary', 'Accept-Encoding')
+    if encoding:
+        handler.send_header('Content-Encoding', encoding)
+    for keyword, value in (headers or {}).items():
+        handler.send_header(keyword, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def json_stream_response(handler, status_code, items, chunk_size=64 * 1024, headers=None):
+    """
+    Write `items` as a JSON array, encoding one item at a time so the whole
+    body is never held in memory. HTTP/1.1 clients get a chunked response;
+    older clients get a body delimited by closing the connection. The stream
+    is compressed as it goes when the client accepts gzip or deflate.
+    """
+    chunked = (getattr(handler, 'request_version', 'HTTP/1.0') >= 'HTTP/1.1'
+               and getattr(handler, 'protocol_version', 'HTTP/1.0') >= 'HTTP/1.1')
+    encoding = accepted_encoding(handler)
+    compress = compressor(encoding) if encoding else None
+
     handler.send_response(status_code)
     handler.send_header('Content-Type', 'application/json')
+    handler.send_header('Vary', 'Accept-Encoding')
+    if encoding:
+        handler.send_header('Content-Encoding', encoding)
+    if chunked:
+        handler.send_header('Transfer-Encoding', 'chunked')
+    else:
+        handler.send_header('Connection', 'close')
+        handler.close_connection = True
+    for keyword, value in (headers or {}).items():
+        handler.send_header(keyword, value)
     handler.end_headers()
-    handler.wfile.write(json.dumps(data).encode('utf-8'))
+
+    def send(data):
+        # An empty chunk would end a chunked body early
+        if not data:
+            return
+        if chunked:
+            handler.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        else:
+            handler.wfile.write(data)
+
+    def write(data):
+        send(compress.compress(data) if compress else data)
+
+    buffer, size = [b'['], 1
+    for i, item in enumerate(items):
+        encoded = encode_json(item)
+        if i:
+            buffer.append(b',')
+        buffer.append(encoded)
+        size += len(encoded) + 1
+        if size >= chunk_size:
+            write(b''.join(buffer))
+            buffer, size = [], 0
+    buffer.append(b']')
+    write(b''.join(buffer))
+    if compress:
+        send(compress.flush())
+    if chunked:
+        handler.wfile.write(b'0\r\n\r\n')
 
 
 def read_json_body(handler):
@@ -76,4 +241,10 @@ def read_json_body(handler):
     if content_length == 0:
         return {}
     body = handler.rfile.read(content_length)
-    return json.loads(body)
+    return json_codec.loads(body)
+
+
+def parse_query(handler):
+    """Query string parameters of the request path, first value of each"""
+    query = urllib.parse.urlsplit(handler.path).query
+    return {name: values[0] for name, values in urllib.parse.parse_qs(query).items()}